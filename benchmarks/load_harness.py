@@ -0,0 +1,289 @@
+import argparse  # Module for parsing command-line options
+import itertools  # Module for cycling over the incident IDs
+import json  # Module for writing the results
+import logging  # Module for silencing the per-export logs
+import os  # Module for output directories and CPU counts
+import shutil  # Module for removing the exported files
+import sys  # Module for the import path of the repository
+import tempfile  # Module for the export directory
+import threading  # Module for the worker and sampler threads
+import time  # Module for latencies and sampling
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, REPO_ROOT)
+
+from exportExcel.batch import export_case_result
+from exportExcel.excel_styles import load_styles
+from exportExcel.memory_guard import peak_rss_bytes
+
+# Concurrency levels swept when none are given
+DEFAULT_LEVELS = (1, 2, 4, 8, 16)
+
+# A level within this fraction of the best throughput is close enough; the knee is
+# the lowest such level, beyond which more concurrency buys little.
+KNEE_FRACTION = 0.9
+
+STYLES_PATH = os.path.join(REPO_ROOT, "Config", "styles.ini")
+
+# Per-process state of the process-mode workers, see _init_worker()
+_worker = {}
+
+
+def percentile(values, fraction):
+    """
+    Return the nearest-rank percentile of a list of values, or None if it is empty.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+
+class ResourceSampler:
+    """
+    Samples CPU utilisation and RSS of the harness (and, with psutil, its worker
+    processes) at a fixed interval on a background thread.
+
+    Without psutil only the harness process itself is measured, from os.times()
+    and /proc/self/statm, which covers thread mode but not process mode.
+    """
+
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = None
+        try:
+            import psutil  # Optional dependency
+            self._process = psutil.Process()
+        except ImportError:
+            self._process = None
+
+    def _cpu_seconds_and_rss(self):
+        if self._process is not None:
+            processes = [self._process] + self._process.children(recursive=True)
+            cpu = rss = 0
+            for process in processes:
+                try:
+                    times = process.cpu_times()
+                    cpu += times.user + times.system
+                    rss += process.memory_info().rss
+                except Exception:
+                    # The process exited between listing and reading it
+                    continue
+            return cpu, rss
+        times = os.times()
+        try:
+            with open("/proc/self/statm") as statm:
+                rss = int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, AttributeError):
+            rss = peak_rss_bytes()
+        return times.user + times.system, rss
+
+    def _run(self):
+        started = time.perf_counter()
+        previous_cpu, _ = self._cpu_seconds_and_rss()
+        previous_time = started
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            cpu, rss = self._cpu_seconds_and_rss()
+            self.samples.append({
+                "seconds": round(now - started, 3),
+                # Busy fraction of all host cores
+                "cpu_utilisation": round((cpu - previous_cpu) / (now - previous_time) / (os.cpu_count() or 1), 4),
+                "rss_bytes": rss,
+            })
+            previous_cpu, previous_time = cpu, now
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, name="load-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+def _timed_export(db, incident_id, output_dir, collection_name, styles, export_options):
+    """
+    Export one case, delete its files and return (latency seconds, status).
+    """
+    started = time.perf_counter()
+    result = export_case_result(db, incident_id, output_dir, collection_name, styles, **export_options)
+    latency = time.perf_counter() - started
+    for path in (result["metrics"] or {}).get("output_files") or []:
+        if os.path.exists(path):
+            os.remove(path)
+    return latency, result["status"]
+
+
+def _init_worker(uri, db_name, output_dir, collection_name, export_options):
+    """
+    Open the MongoDB client and load the styles once per worker process.
+    """
+    from pymongo import MongoClient
+
+    logging.getLogger('excel_data_writer').setLevel(logging.CRITICAL)
+    _worker.update(
+        db=MongoClient(uri)[db_name], output_dir=output_dir, collection_name=collection_name,
+        styles=load_styles(STYLES_PATH), export_options=export_options,
+    )
+
+
+def _process_export(incident_id):
+    return _timed_export(
+        _worker["db"], incident_id, _worker["output_dir"], _worker["collection_name"], _worker["styles"],
+        _worker["export_options"]
+    )
+
+
+def run_level(concurrency, incident_ids, exports, args, db=None):
+    """
+    Run `exports` exports at the given concurrency and measure throughput, latency and resources.
+
+    Returns:
+        dict: The level's results, including the resource samples.
+    """
+    output_dir = tempfile.mkdtemp(prefix="drs_load_")
+    export_options = {"render_mode": args.render_mode}
+    ids = itertools.islice(itertools.cycle(incident_ids), exports)
+    latencies, failed = [], 0
+    try:
+        with ResourceSampler(args.sample_interval) as sampler:
+            started = time.perf_counter()
+            if args.mode == "processes":
+                executor = ProcessPoolExecutor(
+                    max_workers=concurrency, initializer=_init_worker,
+                    initargs=(args.uri, args.db, output_dir, args.collection, export_options)
+                )
+                submit = lambda incident_id: executor.submit(_process_export, incident_id)
+            else:
+                styles = load_styles(STYLES_PATH)
+                executor = ThreadPoolExecutor(max_workers=concurrency)
+                submit = lambda incident_id: executor.submit(
+                    _timed_export, db, incident_id, output_dir, args.collection, styles, export_options
+                )
+            with executor:
+                for future in as_completed([submit(incident_id) for incident_id in ids]):
+                    latency, status = future.result()
+                    latencies.append(latency)
+                    failed += status != "ok"
+            elapsed = time.perf_counter() - started
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    cpu = [sample["cpu_utilisation"] for sample in sampler.samples]
+    rss = [sample["rss_bytes"] for sample in sampler.samples if sample["rss_bytes"]]
+    return {
+        "concurrency": concurrency,
+        "exports": len(latencies),
+        "failed": failed,
+        "seconds": round(elapsed, 3),
+        "exports_per_second": round(len(latencies) / elapsed, 3),
+        "latency_p50": percentile(latencies, 0.50),
+        "latency_p95": percentile(latencies, 0.95),
+        "latency_p99": percentile(latencies, 0.99),
+        "cpu_utilisation_mean": round(sum(cpu) / len(cpu), 4) if cpu else None,
+        "rss_max_bytes": max(rss) if rss else None,
+        "samples": sampler.samples,
+    }
+
+
+def find_knee(levels):
+    """
+    Return the lowest concurrency reaching KNEE_FRACTION of the best throughput.
+    """
+    if not levels:
+        return None
+    best = max(level["exports_per_second"] for level in levels)
+    return min(level["concurrency"] for level in levels if level["exports_per_second"] >= KNEE_FRACTION * best)
+
+
+def sweep(args):
+    """
+    Run every concurrency level against the database and return the results document.
+    """
+    if args.mongomock:
+        import mongomock  # In-process stand-in for a quick local run
+        from benchmarks.synthetic_drs import generate, prepare, create_indexes
+
+        db = mongomock.MongoClient()[args.db]
+        prepare(db)
+        generate(db, args.mongomock, progress_every=0)
+        create_indexes(db)
+    else:
+        from pymongo import MongoClient
+        # Process mode only uses it to list the cases; every worker opens its own client
+        db = MongoClient(args.uri)[args.db]
+
+    incident_ids = [case["incident_id"] for case in db[args.collection].find(
+        args.filter and json.loads(args.filter) or {}, {"incident_id": 1, "_id": 0}
+    ).limit(args.cases)]
+    if not incident_ids:
+        raise SystemExit(f"No cases found in {args.db}.{args.collection}; seed it with benchmarks/synthetic_drs.py")
+
+    levels = []
+    for concurrency in args.levels:
+        exports = args.exports or max(20, 5 * concurrency)
+        level = run_level(concurrency, incident_ids, exports, args, db)
+        levels.append(level)
+        print(
+            f"concurrency {concurrency:>3}: {level['exports_per_second']:8.2f} exports/s  "
+            f"p50 {level['latency_p50']:.3f}s  p95 {level['latency_p95']:.3f}s  p99 {level['latency_p99']:.3f}s  "
+            f"cpu {level['cpu_utilisation_mean'] or 0:.0%}  rss {(level['rss_max_bytes'] or 0) / 2 ** 20:,.0f} MiB"
+            + (f"  failed {level['failed']}" if level["failed"] else "")
+        )
+
+    knee = find_knee(levels)
+    print(f"\nKnee of the throughput curve: concurrency {knee} ({args.mode}, {os.cpu_count()} CPUs)")
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "mode": args.mode,
+        "cpu_count": os.cpu_count(),
+        "cases": len(incident_ids),
+        "render_mode": args.render_mode,
+        "knee_concurrency": knee,
+        "levels": levels,
+    }
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Measure end-to-end export throughput at increasing concurrency.")
+    parser.add_argument("--uri", default="mongodb://localhost:27017/", help="MongoDB connection string.")
+    parser.add_argument("--db", default="DRS_synthetic", help="Database seeded by benchmarks/synthetic_drs.py.")
+    parser.add_argument("--collection", default="Case_details", help="Case details collection.")
+    parser.add_argument("--filter", default=None, help="JSON filter selecting the cases to export.")
+    parser.add_argument("--cases", type=int, default=1000, help="Distinct cases exported round-robin.")
+    parser.add_argument("--levels", type=int, nargs="+", default=list(DEFAULT_LEVELS),
+                        help="Concurrency levels to sweep.")
+    parser.add_argument("--exports", type=int, default=None,
+                        help="Exports per level (default: 5 per worker, at least 20).")
+    parser.add_argument("--mode", choices=("threads", "processes"), default="threads",
+                        help="Export threads in one process (as --workers does) or one process per worker.")
+    parser.add_argument("--render-mode", choices=("auto", "memory", "streaming"), default="auto",
+                        help="Render path of every export.")
+    parser.add_argument("--sample-interval", type=float, default=0.5, help="Seconds between CPU/RSS samples.")
+    parser.add_argument("--mongomock", type=int, default=0, metavar="CASES",
+                        help="Seed this many synthetic cases into an in-process mongomock database instead.")
+    parser.add_argument("--output", default=None, help="Write the results, with all samples, to this JSON file.")
+    args = parser.parse_args(argv)
+    if args.mongomock and args.mode == "processes":
+        parser.error("--mongomock only works with --mode threads")
+    return args
+
+
+def main(argv=None):
+    args = parse_arguments(argv)
+    logging.getLogger('excel_data_writer').setLevel(logging.CRITICAL)
+    results = sweep(args)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
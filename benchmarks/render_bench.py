@@ -0,0 +1,273 @@
+import argparse  # Module for parsing command-line options
+import json  # Module for writing and comparing result files
+import logging  # Module for silencing the per-table debug logs
+import os  # Module for temporary output files and file sizes
+import platform  # Module for recording the benchmark host
+import random  # Module for deterministic synthetic values
+import statistics  # Module for the median of repeated runs
+import sys  # Module for the import path of the repository
+import tempfile  # Module for the directory holding the benchmark workbooks
+import time  # Module for wall-clock timings
+import tracemalloc  # Module for the peak memory of a run
+from datetime import datetime, timedelta
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, REPO_ROOT)
+
+from exportExcel.excel_styles import load_styles
+from exportExcel.table_utils import create_table
+from exportExcel.case_contact_tables import (
+    CASE_DETAILS_HEADERS, CASE_DETAILS_BOLD_HEADERS, case_details_rows, create_case_details_table
+)
+from exportExcel.table_specs import table_spec
+from exportExcel.stream_writer import write_streaming_tables
+
+# Rows of the synthetic header-over-rows tables
+DEFAULT_ROWS = (10, 1000, 10000, 100000, 500000)
+
+# Columns of the synthetic tables: Contact Info has 4, Case Details 19
+DEFAULT_COLUMNS = (4, 19)
+
+# Case Details tables stacked on one sheet per create_case_details_table run
+DEFAULT_CASES = (1, 100, 1000)
+
+ENGINES = ("memory", "streaming")
+
+# Largest in-memory table benchmarked unless --max-memory-cells is raised; at about
+# 400 bytes per styled cell this keeps the in-memory engine under 1 GB.
+DEFAULT_MAX_MEMORY_CELLS = 2000000
+
+# Distinct rows generated per configuration; longer tables repeat them
+ROW_POOL_SIZE = 1000
+
+
+def synthetic_rows(rows, columns, seed=0):
+    """
+    Build `rows` table rows of `columns` values cycling through the value types of the exports.
+
+    A pool of ROW_POOL_SIZE distinct rows is repeated, so even 500k rows cost only
+    the list of references on top of the pool.
+    """
+    generator = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    kinds = (
+        lambda: generator.randint(1, 10 ** 6),
+        lambda: f"REF-{generator.randint(0, 10 ** 8):08d}",
+        lambda: round(generator.uniform(0, 10 ** 6), 2),
+        lambda: start + timedelta(minutes=generator.randint(0, 10 ** 6)),
+        lambda: generator.choice(("Open", "Closed", "Pending", "Write-off")),
+    )
+    pool = [
+        [kinds[column % len(kinds)]() for column in range(columns)]
+        for _ in range(min(rows, ROW_POOL_SIZE))
+    ]
+    return [pool[index % len(pool)] for index in range(rows)]
+
+
+def synthetic_case(seed=0):
+    """
+    Build a case document with every field read by the Case Details table.
+    """
+    generator = random.Random(seed)
+    return {
+        "case_id": generator.randint(1, 10 ** 6), "incident_id": generator.randint(1, 10 ** 6),
+        "account_no": f"{generator.randint(0, 10 ** 10):010d}", "customer_ref": f"CR{generator.randint(0, 10 ** 6)}",
+        "area": "Colombo", "bss_arrears_amount": generator.uniform(0, 10 ** 6),
+        "current_arrears_amount": generator.uniform(0, 10 ** 6), "action_type": "Arrears Collect",
+        "filtered_reason": None, "last_payment_date": datetime(2024, 5, 1),
+        "last_bss_reading_date": datetime(2024, 6, 1), "commission": generator.uniform(0, 10 ** 4),
+        "case_current_status": "Open", "current_arrears_band": None, "drc_commision_rule": "PEO TV",
+        "created_dtm": datetime(2024, 1, 1), "implemented_dtm": datetime(2024, 1, 2), "rtom": "CO",
+        "monitor_months": 6,
+    }
+
+
+def _render_table(engine, rows, columns, styles, path):
+    """
+    Write one synthetic table with the given engine and return the unsaved workbook.
+    """
+    headers = [f"Column {index}" for index in range(1, columns + 1)]
+    if engine == "memory":
+        from openpyxl import Workbook
+        workbook = Workbook()
+        create_table(workbook.active, 1, 1, "Benchmark", headers, rows, styles)
+        return workbook
+    spec = table_spec("create_table", "Benchmark", headers, lambda: rows, lambda: len(rows))
+    return write_streaming_tables([spec], styles, path).workbook
+
+
+def _render_case_details(engine, cases, styles, path):
+    """
+    Stack `cases` Case Details tables on one sheet with the given engine and return the unsaved workbook.
+    """
+    case_data = synthetic_case()
+    if engine == "memory":
+        from openpyxl import Workbook
+        workbook = Workbook()
+        x_pointer = 1
+        for _ in range(cases):
+            x_pointer = create_case_details_table(workbook.active, case_data, x_pointer, 1, None, styles) + 2
+        return workbook
+    specs = [
+        table_spec("create_case_details_table", "Case Details", CASE_DETAILS_HEADERS,
+              lambda: case_details_rows(case_data, None), lambda: len(CASE_DETAILS_HEADERS),
+              layout="vertical", bold_labels=CASE_DETAILS_BOLD_HEADERS)
+        for _ in range(cases)
+    ]
+    return write_streaming_tables(specs, styles, path).workbook
+
+
+def run_once(render, path, trace=False):
+    """
+    Render and save one workbook.
+
+    Returns:
+        dict: render_seconds, save_seconds, file_bytes and, with `trace`, peak_memory_bytes.
+    """
+    if trace:
+        tracemalloc.start()
+    started = time.perf_counter()
+    workbook = render(path)
+    rendered = time.perf_counter()
+    workbook.save(path)
+    saved = time.perf_counter()
+    result = {
+        "render_seconds": rendered - started,
+        "save_seconds": saved - rendered,
+        "file_bytes": os.path.getsize(path),
+    }
+    if trace:
+        result["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    os.remove(path)
+    return result
+
+
+def measure(benchmark, engine, rows, columns, render, work_dir, repeat, trace):
+    """
+    Time a configuration `repeat` times and, with `trace`, once more under tracemalloc.
+
+    Timed runs are not traced, since tracemalloc slows allocation-heavy code down
+    several times; the traced run only contributes the peak memory.
+    """
+    path = os.path.join(work_dir, f"{benchmark}_{engine}_{rows}x{columns}.xlsx")
+    runs = [run_once(render, path) for _ in range(repeat)]
+    render_seconds = [run["render_seconds"] for run in runs]
+    save_seconds = [run["save_seconds"] for run in runs]
+    best = min(render + save for render, save in zip(render_seconds, save_seconds))
+    return {
+        "benchmark": benchmark, "engine": engine, "rows": rows, "columns": columns,
+        "render_seconds": min(render_seconds), "render_seconds_median": statistics.median(render_seconds),
+        "save_seconds": min(save_seconds), "save_seconds_median": statistics.median(save_seconds),
+        "rows_per_second": round(rows / best, 1) if best > 0 else None,
+        "file_bytes": runs[0]["file_bytes"],
+        "peak_memory_bytes": run_once(render, path, trace=True)["peak_memory_bytes"] if trace else None,
+    }
+
+
+def configurations(args):
+    """
+    List the (benchmark, engine, rows, columns) combinations selected on the command line.
+    """
+    for engine in args.engines:
+        for columns in args.columns:
+            for rows in args.rows:
+                yield "create_table", engine, rows, columns
+        for cases in args.cases:
+            yield "create_case_details_table", engine, cases * len(CASE_DETAILS_HEADERS), 2
+
+
+def run_benchmarks(args):
+    """
+    Run every selected configuration and return the results document.
+    """
+    import openpyxl  # For the version recorded with the results
+
+    styles = load_styles(os.path.join(REPO_ROOT, "Config", "styles.ini"))
+    results = []
+    with tempfile.TemporaryDirectory(prefix="drs_bench_") as work_dir:
+        for benchmark, engine, rows, columns in configurations(args):
+            if engine == "memory" and rows * columns > args.max_memory_cells:
+                print(f"{benchmark:27} {engine:9} {rows:>8} x {columns:<2}  skipped (over --max-memory-cells)")
+                results.append({"benchmark": benchmark, "engine": engine, "rows": rows, "columns": columns,
+                                "skipped": "over max_memory_cells"})
+                continue
+
+            if benchmark == "create_table":
+                data = synthetic_rows(rows, columns)
+                render = lambda path: _render_table(engine, data, columns, styles, path)
+            else:
+                cases = rows // len(CASE_DETAILS_HEADERS)
+                render = lambda path: _render_case_details(engine, cases, styles, path)
+
+            result = measure(benchmark, engine, rows, columns, render, work_dir, args.repeat, not args.no_memory)
+            results.append(result)
+            peak = result["peak_memory_bytes"]
+            print(
+                f"{benchmark:27} {engine:9} {rows:>8} x {columns:<2}  "
+                f"{result['rows_per_second']:>12,.0f} rows/s  render {result['render_seconds']:.3f}s  "
+                f"save {result['save_seconds']:.3f}s  {result['file_bytes'] / 1024:,.0f} KiB"
+                + (f"  peak {peak / 2 ** 20:,.1f} MiB" if peak is not None else "")
+            )
+
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "openpyxl": openpyxl.__version__,
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "results": results,
+    }
+
+
+def compare(current, baseline_path):
+    """
+    Print the rows/sec of every configuration relative to a stored baseline run.
+    """
+    with open(baseline_path) as baseline_file:
+        baseline = json.load(baseline_file)
+    key = lambda result: (result["benchmark"], result["engine"], result["rows"], result["columns"])
+    previous = {key(result): result for result in baseline["results"] if "skipped" not in result}
+    print(f"\nCompared with {baseline_path} ({baseline['created']}):")
+    for result in current["results"]:
+        before = previous.get(key(result))
+        if "skipped" in result or before is None or not before["rows_per_second"]:
+            continue
+        change = result["rows_per_second"] / before["rows_per_second"] - 1
+        print(f"{result['benchmark']:27} {result['engine']:9} {result['rows']:>8} x {result['columns']:<2}  {change:+7.1%}")
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark table rendering and saving of the Excel export.")
+    parser.add_argument("--rows", type=int, nargs="+", default=list(DEFAULT_ROWS),
+                        help="Data rows of the create_table benchmarks.")
+    parser.add_argument("--columns", type=int, nargs="+", default=list(DEFAULT_COLUMNS),
+                        help="Columns of the create_table benchmarks.")
+    parser.add_argument("--cases", type=int, nargs="+", default=list(DEFAULT_CASES),
+                        help="Case Details tables per create_case_details_table benchmark.")
+    parser.add_argument("--engines", nargs="+", choices=ENGINES, default=list(ENGINES),
+                        help="In-memory openpyxl workbook and/or the write-only streaming writer.")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per configuration; the best is reported.")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc run measuring peak memory.")
+    parser.add_argument("--max-memory-cells", type=int, default=DEFAULT_MAX_MEMORY_CELLS,
+                        help="Largest table, in cells, rendered by the in-memory engine.")
+    parser.add_argument("--output", default=None, help="Write the results to this JSON file.")
+    parser.add_argument("--compare", default=None, help="Compare rows/sec with a previous JSON result file.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_arguments(argv)
+    # The table builders log every table at debug level
+    logging.getLogger('excel_data_writer').setLevel(logging.WARNING)
+    results = run_benchmarks(args)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=2)
+        print(f"\nResults written to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+import argparse  # Module for parsing command-line options
+import json  # Module for reading distribution profiles
+import logging  # Module for progress messages
+import math  # Module for the log-normal draws
+import os  # Module for the import path of the repository
+import random  # Module for deterministic synthetic values
+import sys  # Module for the import path of the repository
+import time  # Module for the seeding rate
+from concurrent.futures import ProcessPoolExecutor  # Seeds case ranges in parallel
+from datetime import datetime, timedelta
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, REPO_ROOT)
+
+logger = logging.getLogger('excel_data_writer')
+
+# incident_id of a synthetic case is its case_id plus this offset
+INCIDENT_ID_OFFSET = 100000
+
+# Payments per case are capped below this, so case_id * PAYMENT_ID_SPACE + n is unique
+PAYMENT_ID_SPACE = 10000
+
+# Number of array entries or documents per case. A spec is either uniform
+# {"min": a, "max": b} or log-normal {"median": m, "sigma": s, "max": b}; payments
+# are long-tailed, most cases have a few and some have thousands.
+DEFAULT_PROFILE = {
+    "contacts": {"min": 1, "max": 3},
+    "remarks": {"min": 0, "max": 10},
+    "approvals": {"min": 0, "max": 3},
+    "case_status": {"min": 1, "max": 6},
+    "abnormal_stops": {"min": 0, "max": 1},
+    "drcs": {"min": 1, "max": 3},
+    "ros_per_drc": {"min": 0, "max": 3},
+    "ro_negotiations": {"min": 0, "max": 8},
+    "ro_requests": {"min": 0, "max": 4},
+    "settlements": {"min": 0, "max": 2},
+    "plan_installments": {"min": 1, "max": 12},
+    "payments": {"median": 6, "sigma": 1.2, "max": PAYMENT_ID_SPACE - 1},
+    # Fraction of payments with a Commissions record
+    "commission_share": 0.8,
+}
+
+ARREARS_BANDS = {
+    "AB-5_10": "5000-10000", "AB-10_25": "10000-25000", "AB-25_50": "25000-50000",
+    "AB-50_100": "50000-100000", "AB-100_": "100000+",
+}
+
+AREAS = ("Colombo", "Gampaha", "Kandy", "Galle", "Jaffna", "Kurunegala", "Matara")
+RTOMS = ("CO", "GQ", "KY", "GL", "JA", "KU", "MA")
+STATUSES = ("Open", "Open with Agent", "Negotiation", "Settled", "Write-off", "Closed")
+START = datetime(2023, 1, 1)
+
+# Collections written by the generator, in insertion order
+COLLECTIONS = ("Case_details", "Case_settlements", "Case_payments", "Commissions")
+
+# Indexes behind the exporter's queries; built after the bulk load, which is faster
+INDEXES = {
+    "Case_details": [("incident_id", True), ("case_current_status", False)],
+    "Case_settlements": [("case_id", False)],
+    "Case_payments": [("case_id", False), ("money_transaction_id", False)],
+    "Commissions": [("money_transaction_id", False)],
+}
+
+
+def load_profile(path=None):
+    """
+    Return the default distribution profile, updated from a JSON file if given.
+    """
+    profile = dict(DEFAULT_PROFILE)
+    if path:
+        with open(path) as profile_file:
+            profile.update(json.load(profile_file))
+    return profile
+
+
+def _draw(generator, spec):
+    """
+    Draw a count from a uniform or log-normal spec, see DEFAULT_PROFILE.
+    """
+    if "median" in spec:
+        value = int(round(math.exp(generator.gauss(math.log(spec["median"]), spec["sigma"]))))
+        return max(0, min(value, spec["max"]))
+    return generator.randint(spec["min"], spec["max"])
+
+
+def _date(generator, days=700):
+    # random() instead of randint(): dates are most of the draws and randint() is several times slower
+    return START + timedelta(seconds=int(generator.random() * days * 86400))
+
+
+def _amount(generator, high=250000):
+    return round(generator.uniform(100, high), 2)
+
+
+def case_bundle(case_id, profile, seed=0):
+    """
+    Build one case with its settlements, payments and commissions.
+
+    The documents depend only on `case_id`, `profile` and `seed`, so any split of the
+    case range over processes produces the same dataset.
+
+    Returns:
+        dict: Documents per collection name.
+    """
+    generator = random.Random(seed * 1000003 + case_id)
+    draw = lambda name: _draw(generator, profile[name])
+    created = _date(generator)
+    drc_ids = [generator.randint(1, 40) for _ in range(draw("drcs"))]
+
+    case = {
+        "case_id": case_id,
+        "incident_id": INCIDENT_ID_OFFSET + case_id,
+        "account_no": f"{generator.randint(0, 10 ** 9):09d}",
+        "customer_ref": f"CR{generator.randint(0, 10 ** 7):07d}",
+        "area": generator.choice(AREAS),
+        "rtom": generator.choice(RTOMS),
+        "bss_arrears_amount": _amount(generator),
+        "current_arrears_amount": _amount(generator),
+        "action_type": generator.choice(("Arrears Collect", "Arrears and Collect")),
+        "filtered_reason": generator.choice((None, None, None, "Special customer")),
+        "last_payment_date": _date(generator),
+        "last_bss_reading_date": _date(generator),
+        "commission": _amount(generator, 5000),
+        "case_current_status": generator.choice(STATUSES),
+        "current_arrears_band": generator.choice(tuple(ARREARS_BANDS)),
+        "drc_commision_rule": generator.choice(("PEO TV", "BB", "VOICE")),
+        "created_dtm": created,
+        "implemented_dtm": created + timedelta(days=generator.randint(0, 30)),
+        "monitor_months": generator.randint(1, 12),
+        "contact": [{
+            "mob": f"07{generator.randint(0, 10 ** 8):08d}", "email": f"customer{case_id}.{index}@example.lk",
+            "lan": f"011{generator.randint(0, 10 ** 7):07d}", "address": f"No. {generator.randint(1, 500)}, Main Street",
+        } for index in range(draw("contacts"))],
+        "remark": [{
+            "remark": f"Remark {index} on case {case_id}", "remark_added_by": f"user{generator.randint(1, 99)}",
+            "remark_added_date": _date(generator),
+        } for index in range(draw("remarks"))],
+        "approve": [{
+            "approved_process": generator.choice(("DRC Assign", "Write-off", "Extend")),
+            "approved_by": f"manager{generator.randint(1, 9)}", "approved_on": _date(generator), "remark": "Approved",
+        } for _ in range(draw("approvals"))],
+        "case_status": [{
+            "case_status": generator.choice(STATUSES), "status_reason": "Auto", "created_dtm": _date(generator),
+            "created_by": "system", "notified_dtm": _date(generator), "expire_dtm": _date(generator, 900),
+        } for _ in range(draw("case_status"))],
+        "abnormal_stop": [{
+            "remark": "Customer complaint", "done_by": f"user{generator.randint(1, 99)}",
+            "done_on": _date(generator), "action": "Stop",
+        } for _ in range(draw("abnormal_stops"))],
+        "drc": [{
+            "order_id": index + 1, "drc_id": drc_id, "drc_name": f"DRC {drc_id}", "created_dtm": _date(generator),
+            "drc_status": generator.choice(("Active", "Removed")), "status_dtm": _date(generator),
+            "expire_dtm": _date(generator, 900), "case_removal_remark": None, "removed_by": None, "removed_dtm": None,
+            "drc_selection_logic": "Round robin", "case_distribution_batch_id": generator.randint(1, 500),
+            "recovery_officers": [{
+                "ro_id": generator.randint(1, 400), "assigned_dtm": _date(generator), "assigned_by": "system",
+                "removed_dtm": None, "case_removal_remark": None,
+            } for _ in range(draw("ros_per_drc"))],
+        } for index, drc_id in enumerate(drc_ids)],
+        "ro_negotiation": [{
+            "drc_id": generator.choice(drc_ids) if drc_ids else None, "ro_id": generator.randint(1, 400),
+            "created_dtm": _date(generator), "field_reason_id": generator.randint(1, 20),
+            "field_reason": "Agreed to pay", "remark": "Called customer",
+        } for _ in range(draw("ro_negotiations"))],
+        "ro_requests": [{
+            "drc_id": generator.choice(drc_ids) if drc_ids else None, "ro_id": generator.randint(1, 400),
+            "created_dtm": _date(generator), "ro_request_id": generator.randint(1, 20),
+            "ro_request": "Request settlement plan", "todo_on": _date(generator), "completed_on": None,
+        } for _ in range(draw("ro_requests"))],
+    }
+
+    settlements = []
+    for index in range(draw("settlements")):
+        settlement_id = case_id * 10 + index
+        installments = draw("plan_installments")
+        amount = _amount(generator)
+        settlements.append({
+            "settlement_id": settlement_id, "case_id": case_id,
+            "drc_id": generator.choice(drc_ids) if drc_ids else None, "ro_id": generator.randint(1, 400),
+            "settlement_status": generator.choice(("Open", "Active", "Completed")), "status_reason": None,
+            "status_dtm": _date(generator), "settlement_type": generator.choice(("Type A", "Type B")),
+            "settlement_amount": amount, "settlement_phase": "Negotiation", "created_by": "system",
+            "created_on": _date(generator), "last_monitoring_dtm": _date(generator), "remark": None,
+            "settlement_plan": [{
+                "installment_seq": seq + 1, "installment_settle_amount": round(amount / installments, 2),
+                "accumulated_amount": round(amount / installments * (seq + 1), 2),
+                "plan_date": created + timedelta(days=30 * (seq + 1)),
+            } for seq in range(installments)],
+        })
+
+    payments, commissions = [], []
+    settled = 0.0
+    for index in range(draw("payments")):
+        payment_id = case_id * PAYMENT_ID_SPACE + index
+        paid = _amount(generator, 20000)
+        settled += paid
+        payments.append({
+            "payment_id": payment_id, "case_id": case_id,
+            "settlement_id": settlements[0]["settlement_id"] if settlements else None,
+            "installment_seq": index + 1, "bill_payment_seq": index + 1, "bill_paid_amount": paid,
+            "bill_paid_date": _date(generator), "bill_payment_status": "Paid",
+            "bill_payment_type": generator.choice(("Cash", "Card", "Online")), "settled_balance": paid,
+            "cumulative_settled_balance": round(settled, 2), "created_dtm": _date(generator),
+            "account_no": case["account_no"], "money_transaction_Reference_type": "Bill",
+            "money_transaction_id": payment_id,
+        })
+        if generator.random() < profile["commission_share"]:
+            commissions.append({
+                "money_transaction_id": payment_id, "transaction_type": "Payment", "paid_dtm": _date(generator),
+                "arrears": case["current_arrears_amount"], "transaction": paid, "running_credit": round(settled, 2),
+                "running_debt": round(max(case["current_arrears_amount"] - settled, 0), 2),
+                "cummulative_settled_balance": round(settled, 2), "commissioned_amount": round(paid * 0.05, 2),
+            })
+
+    return {"Case_details": [case], "Case_settlements": settlements, "Case_payments": payments,
+            "Commissions": commissions}
+
+
+def generate(db, cases, profile=None, start_case_id=1, batch_size=1000, seed=0, progress_every=100000):
+    """
+    Insert `cases` synthetic cases with their related documents using bulk insert_many.
+
+    Documents are buffered per collection and flushed every `batch_size` documents
+    with unordered inserts, so the server can apply each batch in parallel.
+
+    Args:
+        db (pymongo.database.Database): Target database; a mongomock database works too.
+        cases (int): Number of cases to insert.
+        profile (dict, optional): Distribution profile; DEFAULT_PROFILE if omitted.
+        start_case_id (int): case_id of the first case.
+        batch_size (int): Documents per insert_many call.
+        seed (int): Seed of the dataset.
+        progress_every (int): Cases between progress messages.
+
+    Returns:
+        dict: Documents inserted per collection.
+    """
+    profile = profile or DEFAULT_PROFILE
+    buffers = {name: [] for name in COLLECTIONS}
+    inserted = dict.fromkeys(COLLECTIONS, 0)
+
+    def flush(name):
+        if buffers[name]:
+            db[name].insert_many(buffers[name], ordered=False)
+            inserted[name] += len(buffers[name])
+            buffers[name] = []
+
+    started = time.perf_counter()
+    for case_id in range(start_case_id, start_case_id + cases):
+        for name, documents in case_bundle(case_id, profile, seed).items():
+            buffers[name].extend(documents)
+            if len(buffers[name]) >= batch_size:
+                flush(name)
+        done = case_id - start_case_id + 1
+        if progress_every and done % progress_every == 0:
+            logger.info(f"Seeded {done} of {cases} cases ({done / (time.perf_counter() - started):,.0f} cases/s).")
+    for name in COLLECTIONS:
+        flush(name)
+    return inserted
+
+
+def prepare(db, drop=False):
+    """
+    Optionally drop the synthetic collections, and write the Arrears_bands document.
+    """
+    if drop:
+        for name in COLLECTIONS + ("Arrears_bands",):
+            db[name].drop()
+    db["Arrears_bands"].replace_one({}, dict(ARREARS_BANDS), upsert=True)
+
+
+def create_indexes(db):
+    """
+    Create the indexes the exporter's queries rely on.
+    """
+    for name, fields in INDEXES.items():
+        for field, unique in fields:
+            db[name].create_index(field, unique=unique)
+
+
+def _seed_range(uri, db_name, start_case_id, cases, profile, batch_size, seed):
+    """
+    Seed one range of case IDs from a worker process with its own client.
+    """
+    from pymongo import MongoClient
+
+    client = MongoClient(uri)
+    try:
+        return generate(client[db_name], cases, profile, start_case_id, batch_size, seed, progress_every=0)
+    finally:
+        client.close()
+
+
+def seed_database(uri, db_name, cases, profile=None, batch_size=1000, seed=0, workers=1, drop=False):
+    """
+    Seed a MongoDB database, splitting the case range over `workers` processes.
+
+    Returns:
+        dict: Documents inserted per collection.
+    """
+    from pymongo import MongoClient
+
+    profile = profile or DEFAULT_PROFILE
+    db = MongoClient(uri)[db_name]
+    prepare(db, drop)
+    started = time.perf_counter()
+    if workers <= 1:
+        inserted = generate(db, cases, profile, 1, batch_size, seed)
+    else:
+        chunk = -(-cases // workers)
+        ranges = [(1 + start, min(chunk, cases - start)) for start in range(0, cases, chunk)]
+        inserted = dict.fromkeys(COLLECTIONS, 0)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(_seed_range, uri, db_name, start, count, profile, batch_size, seed)
+                for start, count in ranges
+            ]
+            for future in futures:
+                for name, count in future.result().items():
+                    inserted[name] += count
+    elapsed = time.perf_counter() - started
+    logger.info(f"Seeded {cases} cases in {elapsed:.1f}s ({cases / elapsed:,.0f} cases/s): {inserted}")
+    create_indexes(db)
+    return inserted
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Seed a MongoDB database with synthetic DRS cases.")
+    parser.add_argument("--cases", type=int, default=10000, help="Number of cases to generate.")
+    parser.add_argument("--uri", default="mongodb://localhost:27017/", help="MongoDB connection string.")
+    parser.add_argument("--db", default="DRS_synthetic", help="Target database; never point this at production.")
+    parser.add_argument("--profile", default=None, help="JSON file overriding entries of DEFAULT_PROFILE.")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Documents per insert_many call.")
+    parser.add_argument("--workers", type=int, default=1, help="Seeding processes, each with its own case range.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the dataset.")
+    parser.add_argument("--drop", action="store_true", help="Drop the synthetic collections first.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_arguments(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    seed_database(args.uri, args.db, args.cases, load_profile(args.profile), args.batch_size, args.seed,
+                  args.workers, args.drop)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+import json  # Module for serialising the batch summary
+import logging  # Module for logging errors and debug information
+import time  # Module for polling while other nodes hold the remaining leases
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait  # Worker pool for concurrent exports
+from .single_flight import export_once
+from .metrics import ExportMetrics, MetricsAggregator
+from .sharding import DEFAULT_SHARD_SIZE, iter_shards, iter_shard_incident_ids
+from .checkpoint import DEFAULT_MAX_ATTEMPTS
+from .leases import DEFAULT_LEASE_COLLECTION, DEFAULT_LEASE_TTL, LeaseCoordinator
+
+# Initialize logger for this module
+logger = logging.getLogger('excel_data_writer')
+
+
+def export_case_result(db, incident_id, output_path, collection_name, styles, profile_settings=None,
+                       checkpoint=None, **export_options):
+    """
+    Export one case and return its result instead of raising its failure.
+
+    Concurrent requests for the same export share one run; see export_once().
+
+    With a checkpoint, a case it already holds as exported is skipped, a case that has
+    used up its attempts is reported as failed without another try, and every
+    export that does run is recorded.
+
+    Args:
+        db (pymongo.database.Database): The MongoDB database instance.
+        incident_id (int or str): The incident ID of the case to export.
+        output_path (str): The directory to save the Excel file.
+        collection_name (str): The case details collection name.
+        styles (dict): Predefined styles for formatting.
+        profile_settings (ProfileSettings, optional): Profiles the export if it is sampled.
+        checkpoint (Checkpoint, optional): Progress of the bulk run this case belongs to.
+        **export_options: Further keyword arguments of export_all_tables(), e.g. memory_budget_mb.
+
+    Returns:
+        dict: incident_id, status ('ok', 'failed' or 'skipped'), output_path, error, error_type
+        (the exception class name, e.g. 'TableError' or 'CaseNotFoundError') and the metrics
+        summary (None if the case was not exported).
+    """
+    if checkpoint is not None:
+        checkpointed_result = checkpoint.pending_result(incident_id)
+        if checkpointed_result is not None:
+            return checkpointed_result
+
+    metrics = ExportMetrics(incident_id)
+    profiler = profile_settings.profiler_for(incident_id) if profile_settings else None
+    result = {"incident_id": incident_id, "status": "ok", "output_path": None, "error": None, "error_type": None}
+    try:
+        result["output_path"] = export_once(
+            db, incident_id, output_path, collection_name, styles, metrics, profiler, **export_options
+        )
+    except Exception as failed_case_export:
+        # One bad case costs one failed entry, not the rest of the batch
+        logger.error(f"Export of Incident ID {incident_id} failed: {failed_case_export!r}")
+        result["status"] = "failed"
+        result["error"] = repr(failed_case_export)
+        result["error_type"] = type(failed_case_export).__name__
+    result["metrics"] = metrics.summary()
+    if checkpoint is not None:
+        checkpoint.record(result)
+    return result
+
+
+def export_batch(db, incident_ids, output_path, collection_name, styles, workers=1, aggregator=None,
+                 profile_settings=None, checkpoint=None, **export_options):
+    """
+    Export several cases, optionally in parallel, and aggregate their metrics.
+
+    Args:
+        db (pymongo.database.Database): The MongoDB database instance.
+        incident_ids (iterable): Incident IDs of the cases to export.
+        output_path (str): The directory to save the Excel files.
+        collection_name (str): The case details collection name.
+        styles (dict): Predefined styles for formatting.
+        workers (int): Number of export threads.
+        aggregator (MetricsAggregator, optional): Receives every export summary; one is created if omitted.
+        profile_settings (ProfileSettings, optional): Profiles a sampled fraction of the exports.
+        checkpoint (Checkpoint, optional): Records every export and skips the cases already exported.
+        **export_options: Further keyword arguments of export_all_tables(), e.g. memory_budget_mb.
+
+    Returns:
+        tuple: (list of per-case result dicts, MetricsAggregator)
+    """
+    if aggregator is None:
+        aggregator = MetricsAggregator()
+
+    def run(incident_id):
+        result = export_case_result(
+            db, incident_id, output_path, collection_name, styles, profile_settings, checkpoint,
+            **export_options
+        )
+        if result["metrics"] is not None:
+            aggregator.add(result["metrics"])
+        return result
+
+    if workers <= 1:
+        results = [run(incident_id) for incident_id in incident_ids]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(run, incident_ids))
+
+    failed = sum(1 for result in results if result["status"] == "failed")
+    skipped = sum(1 for result in results if result["status"] == "skipped")
+    logger.info(
+        f"Batch export finished: {len(results) - failed - skipped} succeeded, {failed} failed, "
+        f"{skipped} skipped as already exported."
+    )
+    logger.info(f"Batch metrics: {json.dumps(aggregator.summary(), default=str)}")
+    return results, aggregator
+
+
+def export_shard(db, query, shard, output_path, collection_name, styles, aggregator, profile_settings=None,
+                 checkpoint=None, **export_options):
+    """
+    Export every case of one shard in _id order.
+
+    Args:
+        db (pymongo.database.Database): The MongoDB database instance.
+        query (dict): Filter on the case collection.
+        shard (dict): A shard from iter_shards().
+        output_path (str): The directory to save the Excel files.
+        collection_name (str): The case details collection name.
+        styles (dict): Predefined styles for formatting.
+        aggregator (MetricsAggregator): Receives every export summary.
+        profile_settings (ProfileSettings, optional): Profiles a sampled fraction of the exports.
+        checkpoint (Checkpoint, optional): Records every export and skips the cases already exported.
+        **export_options: Further keyword arguments of export_all_tables(), e.g. memory_budget_mb.
+
+    Returns:
+        dict: shard, exported and skipped counts and the incident IDs that failed.
+    """
+    exported = 0
+    skipped = 0
+    failed_incident_ids = []
+    for incident_id in iter_shard_incident_ids(db[collection_name], query, shard):
+        result = export_case_result(
+            db, incident_id, output_path, collection_name, styles, profile_settings, checkpoint,
+            **export_options
+        )
+        if result["metrics"] is not None:
+            aggregator.add(result["metrics"])
+        if result["status"] == "ok":
+            exported += 1
+        elif result["status"] == "skipped":
+            skipped += 1
+        else:
+            failed_incident_ids.append(incident_id)
+    logger.info(
+        f"Shard {shard['index']} finished: {exported} exported, {len(failed_incident_ids)} failed, "
+        f"{skipped} skipped."
+    )
+    return {"shard": shard, "exported": exported, "skipped": skipped, "failed_incident_ids": failed_incident_ids}
+
+
+def export_filtered(db, query, output_path, collection_name, styles, workers=1, shard_size=DEFAULT_SHARD_SIZE,
+                    aggregator=None, profile_settings=None, checkpoint=None, **export_options):
+    """
+    Export every case matching a filter, sharded by _id range across the export workers.
+
+    Shards are cut from a sorted _id cursor as workers become free, and each worker
+    streams its shard's incident IDs, so neither the shard list nor the ID list is
+    held in memory; only the IDs of failed exports are kept for the report.
+
+    Args:
+        db (pymongo.database.Database): The MongoDB database instance.
+        query (dict): Filter on the case collection, e.g. {"case_current_status": "Open"}.
+        output_path (str): The directory to save the Excel files.
+        collection_name (str): The case details collection name.
+        styles (dict): Predefined styles for formatting.
+        workers (int): Number of shards exported in parallel.
+        shard_size (int): Maximum number of cases per shard.
+        aggregator (MetricsAggregator, optional): Receives every export summary; one is created if omitted.
+        profile_settings (ProfileSettings, optional): Profiles a sampled fraction of the exports.
+        checkpoint (Checkpoint, optional): Records every export and skips the cases already exported.
+        **export_options: Further keyword arguments of export_all_tables(), e.g. memory_budget_mb.
+
+    Returns:
+        tuple: (dict with shards, exported, skipped, failed and failed_incident_ids, MetricsAggregator)
+    """
+    if aggregator is None:
+        aggregator = MetricsAggregator()
+    workers = max(workers, 1)
+    report = {"shards": 0, "exported": 0, "skipped": 0, "failed": 0, "failed_incident_ids": []}
+
+    def collect(futures):
+        for future in futures:
+            shard_result = future.result()
+            report["shards"] += 1
+            report["exported"] += shard_result["exported"]
+            report["skipped"] += shard_result["skipped"]
+            report["failed"] += len(shard_result["failed_incident_ids"])
+            report["failed_incident_ids"].extend(shard_result["failed_incident_ids"])
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        for shard in iter_shards(db[collection_name], query, shard_size):
+            # Keep at most one queued shard per worker; the rest are cut when needed
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            pending.add(executor.submit(
+                export_shard, db, query, shard, output_path, collection_name, styles, aggregator,
+                profile_settings, checkpoint, **export_options
+            ))
+        collect(wait(pending).done)
+
+    logger.info(
+        f"Filtered export finished: {report['shards']} shards, {report['exported']} succeeded, "
+        f"{report['failed']} failed, {report['skipped']} skipped as already exported."
+    )
+    logger.info(f"Batch metrics: {json.dumps(aggregator.summary(), default=str)}")
+    return report, aggregator
+
+
+def export_distributed(db, run_id, query, output_path, collection_name, styles, workers=1,
+                       shard_size=DEFAULT_SHARD_SIZE, lease_ttl=DEFAULT_LEASE_TTL,
+                       lease_collection=DEFAULT_LEASE_COLLECTION, aggregator=None, profile_settings=None,
+                       max_attempts=DEFAULT_MAX_ATTEMPTS, **export_options):
+    """
+    Take part in a filtered bulk export shared by several exporter processes through leases.
+
+    Start the same run_id and filter on every host; see LeaseCoordinator for how the
+    shards are handed out and how a crashed node's shard is reclaimed. Each of the
+    `workers` threads claims shards until the whole run is done, waiting for shards
+    leased by other nodes so that it can take them over if their owner dies or hangs.
+    A lease stops being extended when its shard makes no progress for the lease TTL,
+    or for the export deadline if that is longer.
+
+    Args:
+        db (pymongo.database.Database): The MongoDB database instance.
+        run_id (str): Name of the run, identical on every participating host.
+        query (dict): Filter on the case collection.
+        output_path (str): The directory to save the Excel files.
+        collection_name (str): The case details collection name.
+        styles (dict): Predefined styles for formatting.
+        workers (int): Number of shards this process exports in parallel.
+        shard_size (int): Maximum number of cases per shard; the run's first node decides.
+        lease_ttl (float): Seconds a lease stays valid without a heartbeat.
+        lease_collection (str): Collection holding the run and lease documents.
+        aggregator (MetricsAggregator, optional): Receives this node's export summaries; one is created if omitted.
+        profile_settings (ProfileSettings, optional): Profiles a sampled fraction of the exports.
+        max_attempts (int): Leases of a shard, takeovers included, before it is given up.
+        **export_options: Further keyword arguments of export_all_tables(), e.g. memory_budget_mb.
+
+    Returns:
+        tuple: (dict with shards, exported, failed, failed_incident_ids and failed_shards over all nodes,
+        MetricsAggregator)
+    """
+    if aggregator is None:
+        aggregator = MetricsAggregator()
+    # No case may go longer than its deadline without progress
+    stall_timeout = max(lease_ttl, export_options.get("deadline_seconds") or 0)
+    coordinator = LeaseCoordinator(db, run_id, collection_name, query, shard_size, lease_ttl, lease_collection,
+                                   stall_timeout=stall_timeout, max_attempts=max_attempts)
+
+    def export_lease(lease):
+        for case in coordinator.iter_cases(lease):
+            result = export_case_result(
+                db, case.get("incident_id"), output_path, collection_name, styles, profile_settings,
+                **export_options
+            )
+            aggregator.add(result["metrics"])
+            if not coordinator.record_progress(lease, case, result["status"] == "ok"):
+                logger.warning(f"Lost the lease on shard {lease['index']}; leaving it to its new owner.")
+                return
+        coordinator.complete(lease)
+
+    def work():
+        while True:
+            lease = coordinator.claim()
+            if lease is not None:
+                export_lease(lease)
+            elif coordinator.finished():
+                return
+            else:
+                time.sleep(coordinator.poll_interval)
+
+    coordinator.join()
+    try:
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+            for future in [executor.submit(work) for _ in range(max(workers, 1))]:
+                future.result()
+    finally:
+        coordinator.close()
+
+    report = coordinator.report()
+    logger.info(
+        f"Distributed run {run_id} finished: {report['shards']} shards, {report['exported']} succeeded, "
+        f"{report['failed']} failed over all nodes."
+    )
+    if report["failed_shards"]:
+        logger.error(f"Shards given up after {max_attempts} attempts: {report['failed_shards']}")
+    logger.info(f"Batch metrics: {json.dumps(aggregator.summary(), default=str)}")
+    return report, aggregator
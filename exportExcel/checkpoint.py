@@ -0,0 +1,246 @@
+import hashlib  # Module for deriving run keys from the export arguments
+import json  # Module for storing output file lists
+import logging  # Module for logging errors and debug information
+import os  # Module for creating the checkpoint directory
+import threading  # Serialises SQLite writes from the export threads
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+
+# Initialize logger for this module
+logger = logging.getLogger('excel_data_writer')
+
+# Collection holding the checkpoint documents when none is configured
+DEFAULT_CHECKPOINT_COLLECTION = "Export_checkpoints"
+
+# Exports of one case, over all resumed runs, before the case is given up
+DEFAULT_MAX_ATTEMPTS = 3
+
+
+def run_key(collection_name, incident_ids=None, query=None):
+    """
+    Derive the checkpoint key of a bulk run from what it exports.
+
+    Rerunning the same incident IDs or the same filter yields the same key, so
+    `--resume` finds the earlier run without the user having to name it.
+
+    Args:
+        collection_name (str): The case details collection name.
+        incident_ids (iterable, optional): Incident IDs of an explicit batch.
+        query (dict, optional): Filter of a filtered export.
+
+    Returns:
+        str: A short hexadecimal key.
+    """
+    from bson import json_util  # Canonical form of the filter, shipped with pymongo
+
+    arguments = {
+        "collection": collection_name,
+        "incident_ids": sorted(incident_ids, key=str) if incident_ids is not None else None,
+        "filter": query,
+    }
+    return hashlib.sha1(json_util.dumps(arguments, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+class Checkpoint(ABC):
+    """
+    Progress of a bulk run: the status, attempts and output files of every case.
+
+    Every finished export is recorded at once, so a run that dies part-way can be
+    resumed: exported cases are skipped, and failed cases are exported again until
+    they have used up `max_attempts`. Subclasses store the entries in SQLite or MongoDB.
+    """
+
+    def __init__(self, run_id, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        """
+        Args:
+            run_id (str): Key of the run, see run_key().
+            max_attempts (int): Exports of a case before it is given up.
+        """
+        self.run_id = run_id
+        self.max_attempts = max_attempts
+
+    @abstractmethod
+    def get(self, incident_id):
+        """
+        Return the entry of a case as a dict with status, attempts, output_files and error, or None.
+        """
+
+    @abstractmethod
+    def _save(self, incident_id, entry):
+        """
+        Store the entry of a case, replacing any earlier one.
+        """
+
+    @abstractmethod
+    def reset(self):
+        """
+        Forget every entry of the run, for a fresh start without --resume.
+        """
+
+    @abstractmethod
+    def counts(self):
+        """
+        Return the number of cases per status.
+        """
+
+    def close(self):
+        """
+        Release the checkpoint store.
+        """
+
+    def pending_result(self, incident_id):
+        """
+        Decide whether a case still has to be exported.
+
+        Args:
+            incident_id (int or str): The incident ID of the case.
+
+        Returns:
+            dict: None if the case must be exported; otherwise its result ('skipped' for an
+            exported case, 'failed' for a case that has used up its attempts) in the
+            form of export_case_result(), without metrics.
+        """
+        entry = self.get(incident_id)
+        if entry is None:
+            return None
+        output_path = entry["output_files"][0] if entry["output_files"] else None
+        if entry["status"] == "ok":
+            return {"incident_id": incident_id, "status": "skipped", "output_path": output_path,
+                    "error": None, "error_type": None, "metrics": None}
+        if entry["attempts"] >= self.max_attempts:
+            return {"incident_id": incident_id, "status": "failed", "output_path": None,
+                    "error": f"Gave up after {entry['attempts']} attempts: {entry['error']}",
+                    "error_type": None, "metrics": None}
+        logger.info(f"Retrying Incident ID {incident_id} (attempt {entry['attempts'] + 1} of {self.max_attempts}).")
+        return None
+
+    def record(self, result):
+        """
+        Record the result of one export.
+
+        Args:
+            result (dict): Result of export_case_result().
+        """
+        previous = self.get(result["incident_id"])
+        output_files = (result.get("metrics") or {}).get("output_files") or (
+            [result["output_path"]] if result["output_path"] else []
+        )
+        self._save(result["incident_id"], {
+            "status": result["status"],
+            "attempts": (previous["attempts"] if previous else 0) + 1,
+            "output_files": output_files,
+            "error": result["error"],
+        })
+
+
+class SqliteCheckpoint(Checkpoint):
+    """
+    Checkpoint in a local SQLite file, for runs on a single host.
+    """
+
+    def __init__(self, path, run_id, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        """
+        Args:
+            path (str): The SQLite file; created if missing.
+            run_id (str): Key of the run, see run_key().
+            max_attempts (int): Exports of a case before it is given up.
+        """
+        import sqlite3  # Imported on demand; only used for SQLite checkpoints
+
+        super().__init__(run_id, max_attempts)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        # Shared by the export threads; every access holds the lock
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS export_checkpoints ("
+                " run_id TEXT NOT NULL, incident_id TEXT NOT NULL, status TEXT NOT NULL,"
+                " attempts INTEGER NOT NULL, output_files TEXT NOT NULL, error TEXT, updated_at TEXT NOT NULL,"
+                " PRIMARY KEY (run_id, incident_id))"
+            )
+
+    def get(self, incident_id):
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT status, attempts, output_files, error FROM export_checkpoints"
+                " WHERE run_id = ? AND incident_id = ?",
+                (self.run_id, str(incident_id))
+            ).fetchone()
+        if row is None:
+            return None
+        return {"status": row[0], "attempts": row[1], "output_files": json.loads(row[2]), "error": row[3]}
+
+    def _save(self, incident_id, entry):
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO export_checkpoints"
+                " (run_id, incident_id, status, attempts, output_files, error, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self.run_id, str(incident_id), entry["status"], entry["attempts"],
+                 json.dumps(entry["output_files"]), entry["error"], _now().isoformat())
+            )
+
+    def reset(self):
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM export_checkpoints WHERE run_id = ?", (self.run_id,))
+
+    def counts(self):
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT status, COUNT(*) FROM export_checkpoints WHERE run_id = ? GROUP BY status",
+                (self.run_id,)
+            ).fetchall()
+        return dict(rows)
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+class MongoCheckpoint(Checkpoint):
+    """
+    Checkpoint in a MongoDB collection, so a run can be resumed from another host.
+    """
+
+    def __init__(self, collection, run_id, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        """
+        Args:
+            collection (pymongo.collection.Collection): The checkpoint collection.
+            run_id (str): Key of the run, see run_key().
+            max_attempts (int): Exports of a case before it is given up.
+        """
+        super().__init__(run_id, max_attempts)
+        self.collection = collection
+
+    def _key(self, incident_id):
+        return f"{self.run_id}:{incident_id}"
+
+    def get(self, incident_id):
+        return self.collection.find_one(
+            {"_id": self._key(incident_id)}, {"status": 1, "attempts": 1, "output_files": 1, "error": 1, "_id": 0}
+        )
+
+    def _save(self, incident_id, entry):
+        self.collection.replace_one(
+            {"_id": self._key(incident_id)},
+            dict(entry, run_id=self.run_id, incident_id=incident_id, updated_at=_now()),
+            upsert=True
+        )
+
+    def reset(self):
+        self.collection.delete_many({"run_id": self.run_id})
+
+    def counts(self):
+        return {
+            group["_id"]: group["count"]
+            for group in self.collection.aggregate([
+                {"$match": {"run_id": self.run_id}},
+                {"$group": {"_id": "$status", "count": {"$sum": 1}}},
+            ])
+        }
@@ -0,0 +1,164 @@
+import logging  # Module for logging errors and debug information
+import threading  # Module for guarding the commands in flight
+from .metrics import current_metrics
+
+# Initialize logger for this module
+logger = logging.getLogger('excel_data_writer')
+
+# Round trip in milliseconds above which a command is reported as slow
+DEFAULT_SLOW_QUERY_MS = 100
+
+# Characters of a slow command's filter or pipeline kept in the report
+MAX_SHAPE_LENGTH = 500
+
+# Connection, session and cursor housekeeping, not queries of the export
+IGNORED_COMMANDS = {
+    "hello", "ismaster", "isMaster", "ping", "buildinfo", "buildInfo", "endSessions", "killCursors",
+    "saslStart", "saslContinue", "authenticate",
+}
+
+# Command fields that describe which documents a query reads
+SHAPE_FIELDS = ("filter", "query", "pipeline", "sort", "projection", "key", "limit")
+
+
+def _documents(reply):
+    """
+    Number of documents in a command reply: the cursor batch of find/aggregate/getMore, or the values of distinct.
+    """
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        return len(cursor.get("firstBatch") or cursor.get("nextBatch") or [])
+    if isinstance(reply.get("values"), list):
+        return len(reply["values"])
+    return 0
+
+
+def _shape(command):
+    """
+    The parts of a command that tell which documents it reads, as shortened text.
+    """
+    shape = repr({field: command[field] for field in SHAPE_FIELDS if field in command})
+    return shape if len(shape) <= MAX_SHAPE_LENGTH else shape[:MAX_SHAPE_LENGTH] + "..."
+
+
+class CommandMonitor:
+    """
+    Records every MongoDB command issued during an export in the export's metrics.
+
+    For each command the collection, command name, server round trip, documents returned
+    and reply size are added to ExportMetrics.add_query(); commands over `slow_query_ms`
+    are logged with their filter or pipeline. pymongo reports a command on the thread
+    that issued it, so the command belongs to the export active in that context; commands
+    issued outside an export (leases, checkpoints, snapshot refreshes) are not recorded.
+
+    Use command_listener() to get an instance pymongo accepts as an event listener.
+
+    Args:
+        slow_query_ms (float): Round trip in milliseconds above which a command is slow.
+        measure_replies (bool): Measure the BSON size of each reply (encodes the reply again).
+    """
+
+    def __init__(self, slow_query_ms=DEFAULT_SLOW_QUERY_MS, measure_replies=True):
+        self.slow_query_ms = slow_query_ms
+        self.measure_replies = measure_replies
+        self._lock = threading.Lock()
+        self._started = {}  # (connection, request id) -> (metrics, collection, shape)
+
+    def started(self, event):
+        if event.command_name in IGNORED_COMMANDS:
+            return
+        metrics = current_metrics()
+        if metrics is None:
+            return
+        command = event.command
+        # The collection is the value of the command's first field, or 'collection' for getMore
+        collection = command.get("collection") if event.command_name == "getMore" else command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = event.database_name
+        with self._lock:
+            self._started[(event.connection_id, event.request_id)] = (metrics, collection, _shape(command))
+
+    def succeeded(self, event):
+        self._finish(event, event.reply)
+
+    def failed(self, event):
+        self._finish(event, None)
+
+    def _finish(self, event, reply):
+        with self._lock:
+            started = self._started.pop((event.connection_id, event.request_id), None)
+        if started is None:
+            return
+        metrics, collection, shape = started
+        seconds = event.duration_micros / 1e6
+        documents = _documents(reply) if reply else 0
+        reply_bytes = 0
+        if reply and self.measure_replies:
+            import bson  # Loaded with pymongo, which issued the command
+            reply_bytes = len(bson.encode(reply))
+
+        name = f"{collection}.{event.command_name}"
+        slow = None
+        if self.slow_query_ms and seconds * 1000 >= self.slow_query_ms:
+            slow = {
+                "command": name, "ms": round(seconds * 1000, 1), "documents": documents,
+                "reply_bytes": reply_bytes, "shape": shape, "failed": reply is None,
+            }
+            logger.warning(
+                f"Slow query for Incident ID {metrics.incident_id}: {name} took {slow['ms']} ms, "
+                f"returned {documents} documents ({reply_bytes} bytes): {shape}"
+            )
+        metrics.add_query(name, seconds, documents, reply_bytes, slow)
+
+
+def command_listener(slow_query_ms=DEFAULT_SLOW_QUERY_MS, measure_replies=True):
+    """
+    Build a CommandMonitor that can be passed to MongoClient(event_listeners=[...]).
+
+    pymongo is imported here, on first use, to keep start-up fast.
+
+    Args:
+        slow_query_ms (float): Round trip in milliseconds above which a command is slow; 0 to flag none.
+        measure_replies (bool): Measure the BSON size of each reply.
+
+    Returns:
+        CommandMonitor: The listener.
+    """
+    from pymongo import monitoring  # Base class pymongo requires of command listeners
+
+    class CommandListener(CommandMonitor, monitoring.CommandListener):
+        pass
+
+    return CommandListener(slow_query_ms, measure_replies)
+
+
+def query_report(queries, top_n=15):
+    """
+    Render the per-collection query totals of an export or a batch as text for the log.
+
+    Args:
+        queries (dict): "queries" of ExportMetrics.summary() or MetricsAggregator.summary().
+        top_n (int): Commands listed, the most time-consuming first.
+
+    Returns:
+        str: One line per command with its count, time, documents and slow commands.
+    """
+    if not queries:
+        return "Query report: no MongoDB commands were recorded."
+    collections = {}
+    for name, query in queries.items():
+        totals = collections.setdefault(name.rsplit(".", 1)[0], [0, 0.0])
+        totals[0] += query["count"]
+        totals[1] += query["seconds"]
+    lines = ["Query report, per collection: " + ", ".join(
+        f"{collection} {count} commands in {seconds:.3f} s"
+        for collection, (count, seconds) in sorted(collections.items(), key=lambda item: -item[1][1])
+    )]
+    ranked = sorted(queries.items(), key=lambda item: -item[1]["seconds"])[:top_n]
+    for name, query in ranked:
+        per_export = f", {query['count'] / query['exports']:.1f} per export" if query.get("exports") else ""
+        lines.append(
+            f"  {name}: {query['count']} commands{per_export}, {query['seconds']:.3f} s, "
+            f"{query['documents']} documents, {query['reply_bytes']} bytes, {query['slow']} slow"
+        )
+    return "\n".join(lines)
@@ -1,6 +1,7 @@
 import configparser # Module for reading configuration files
-import sys # Module for system-specific parameters and functions
+import platform # Module for detecting the operating system
 import logging # Module for logging errors and debugging information
+from .errors import ConfigError # Raised instead of terminating the program
 
 # Set up a logger for this module
 logger = logging.getLogger('excel_data_writer')
@@ -17,11 +18,10 @@ def load_config(config_file_path):
         configparser.ConfigParser: A ConfigParser object containing the loaded configuration.
 
     Outputs:
-        - Logs an error and exits if the configuration file is empty or not found.
-        - Logs an error and exits if any exception occurs while reading the file.
+        - Logs an error if the configuration file is empty, not found or cannot be read.
 
     Exceptions:
-        - Exits the program if the configuration file is empty or cannot be read.
+        - Raises ConfigError if the configuration file is empty or cannot be read.
     """
     try:
         # Create a ConfigParser object
@@ -30,9 +30,29 @@ def load_config(config_file_path):
         # Check if the file contains any sections
         if not config.sections():
             logger.error("Configuration file is empty or not found.")
-            sys.exit(1) # Terminate the program with an error code
+            raise ConfigError(f"Configuration file is empty or not found: {config_file_path}")
         return config # Return the loaded configuration object
+    except ConfigError:
+        raise
     except Exception as failed_config_load:
-        # Log the exception and terminate the program
+        # Log the exception and report it to the caller
         logger.error(f"Failed to load configuration: {failed_config_load}")
-        sys.exit(1)
\ No newline at end of file
+        raise ConfigError(f"Failed to load configuration: {failed_config_load}") from failed_config_load
+
+def get_os_path(config, section, name, default=None):
+    """
+    Return the operating-system specific path `WIN_<name>` or `LIN_<name>` from a config section.
+
+    Args:
+        config (configparser.ConfigParser): The loaded configuration.
+        section (str): The section holding the WIN_/LIN_ path pair (e.g. 'LOG_FILE_PATHS').
+        name (str): The key suffix shared by both paths (e.g. 'LOG').
+        default (str, optional): Value returned when the section or key is missing.
+
+    Returns:
+        str: The configured path for the current operating system, or `default`.
+    """
+    prefix = "WIN" if platform.system().lower() == "windows" else "LIN"
+    if not config.has_section(section):
+        return default
+    return config[section].get(f"{prefix}_{name}", default)
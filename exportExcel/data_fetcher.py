@@ -1,8 +1,195 @@
 import logging  # Module for logging errors and debug information
+from contextvars import ContextVar
+from itertools import islice
+from contextlib import contextmanager
+from .metrics import timed  # Per-query wall time of the running export
+from .profiling import phase  # Fetch-phase attribution for profiled exports
+from .throttle import throttled  # Rate and concurrency limit toward MongoDB
+from .deadline import check_deadline, current_deadline, max_time_ms  # Time limit of the running export
+from .errors import ExportTimeoutError
 
 # Initialize logger for this module
 logger = logging.getLogger('excel_data_writer')
 
+# Fields the most recent records of each collection are found by, see _recent()
+SETTLEMENT_SORT_FIELD = "created_on"
+PAYMENT_SORT_FIELD = "created_dtm"
+COMMISSION_SORT_FIELD = "paid_dtm"
+
+# Client session of the case being exported, see case_read_session()
+_current_session = ContextVar("drs_read_session", default=None)
+
+
+def _session():
+    """
+    Return the read session of the case being exported, or None outside case_read_session().
+    """
+    return _current_session.get()
+
+
+def in_read_session():
+    """
+    Return True inside a snapshot case_read_session(); its queries must be issued from one thread.
+    """
+    return _current_session.get() is not None
+
+
+@contextmanager
+def case_read_session(db, snapshot=False):
+    """
+    Read the enclosed fetches of one case bundle from a single point in time.
+
+    With `snapshot`, every query issued through this module in the block runs in one
+    snapshot session (MongoDB 5.0+), so the case, its settlements, payments and
+    commissions are read as of the same cluster time even while the DRS application
+    keeps writing. The block must finish within the server's snapshot history window
+    (minSnapshotHistoryWindowInSeconds, 300 s by default). Without `snapshot` the
+    block is a no-op and queries use the database's own read concern.
+
+    Args:
+        db (pymongo.database.Database): The database the case is read from.
+        snapshot (bool): Read the case bundle under snapshot read concern.
+    """
+    if not snapshot:
+        yield None
+        return
+    with db.client.start_session(snapshot=True) as session:
+        token = _current_session.set(session)
+        try:
+            yield session
+        finally:
+            _current_session.reset(token)
+
+
+def query_time_limit():
+    """
+    Return the maxTimeMS option of an aggregate, distinct or count_documents command
+    within the running export's deadline; find() takes max_time_ms=max_time_ms().
+
+    Returns:
+        dict: {'maxTimeMS': <remaining ms>} under a deadline, else an empty dict,
+        to be passed as keyword arguments of the command.
+    """
+    remaining_ms = max_time_ms()
+    return {} if remaining_ms is None else {"maxTimeMS": remaining_ms}
+
+
+@contextmanager
+def query_stage(name):
+    """
+    Run a query under the installed throttle, time it as stage 'query:<name>' and
+    attribute it to the fetch phase.
+
+    The query is not started once the export's deadline has passed, and a query
+    stopped by the server at its maxTimeMS raises ExportTimeoutError.
+
+    Args:
+        name (str): The query's name, '<collection>.<command>' by convention.
+
+    Exceptions:
+        ExportTimeoutError: The export's deadline passed before or during the query.
+    """
+    with throttled(), timed(f"query:{name}"), phase("fetch"):
+        check_deadline(name)
+        try:
+            yield
+        except Exception as failed_query:
+            from pymongo.errors import ExecutionTimeout  # Loaded with the client that ran the query
+            deadline = current_deadline()
+            if deadline is not None and isinstance(failed_query, ExecutionTimeout):
+                raise ExportTimeoutError(deadline.seconds, name) from failed_query
+            raise
+
+
+def stream_cursor(cursor, name, batch_size):
+    """
+    Yield the documents of a cursor, fetching each batch as one throttled, timed query.
+
+    The cursor must have been opened with the same `batch_size`, so that every slice
+    corresponds to one round trip to the server.
+
+    Args:
+        cursor (pymongo.cursor.Cursor or CommandCursor): The open cursor.
+        name (str): The query's name, see query_stage().
+        batch_size (int): The cursor's batch size.
+
+    Yields:
+        dict: The cursor's documents, in order.
+    """
+    while True:
+        with query_stage(name):
+            batch = list(islice(cursor, batch_size))
+        yield from batch
+        if len(batch) < batch_size:
+            return
+
+
+def get_case_data(db, collection_name, incident_id):
+    """
+    Retrieve the case document for the given incident_id from the case details collection.
+
+    Args:
+        db (pymongo.database.Database): The MongoDB database instance.
+        collection_name (str): The name of the case details collection.
+        incident_id (int or str): The incident ID of the case.
+
+    Returns:
+        dict: The case document, or None if no case matches the incident_id.
+    """
+    with query_stage(f"{collection_name}.find_one"):
+        return db[collection_name].find_one({"incident_id": incident_id}, session=_session(), max_time_ms=max_time_ms())
+
+
+def get_case_preview(db, collection_name, incident_id, arrays, limit):
+    """
+    Retrieve the case document for the given incident_id with the given embedded arrays cut to their last `limit` entries on the server.
+
+    Args:
+        db (pymongo.database.Database): The MongoDB database instance.
+        collection_name (str): The name of the case details collection.
+        incident_id (int or str): The incident ID of the case.
+        arrays (iterable): Embedded arrays to cut with $slice; a missing array becomes empty.
+        limit (int): Entries kept per array, the most recent (last) ones.
+
+    Returns:
+        dict: The case document, or None if no case matches the incident_id.
+    """
+    pipeline = [
+        {"$match": {"incident_id": incident_id}},
+        {"$limit": 1},
+        {"$addFields": {array: {"$slice": [{"$ifNull": [f"${array}", []]}, -limit]} for array in arrays}},
+    ]
+    with query_stage(f"{collection_name}.aggregate"):
+        result = list(db[collection_name].aggregate(pipeline, session=_session(), **query_time_limit()))
+    return result[0] if result else None
+
+
+def _recent(collection, query, sort_field, limit, projection=None):
+    """
+    Find the `limit` most recent documents by `sort_field` (newest _id first on ties), returned oldest first.
+    """
+    cursor = collection.find(query, projection, session=_session(), max_time_ms=max_time_ms())
+    documents = list(cursor.sort([(sort_field, -1), ("_id", -1)]).limit(limit))
+    documents.reverse()
+    return documents
+
+
+def get_export_snapshot(db, collection_name, incident_id, version):
+    """
+    Retrieve the pre-joined export snapshot of the given incident_id; see snapshots.refresh_snapshots().
+
+    Args:
+        db (pymongo.database.Database): The MongoDB database instance.
+        collection_name (str): The name of the snapshot collection.
+        incident_id (int or str): The incident ID of the case.
+        version (int): Snapshot layout the caller understands; snapshots of another layout are ignored.
+
+    Returns:
+        dict: The snapshot document, or None if the case has no current snapshot.
+    """
+    with query_stage(f"{collection_name}.find_one"):
+        return db[collection_name].find_one({"_id": incident_id, "version": version}, session=_session(), max_time_ms=max_time_ms())
+
 
 def get_arrears_band_value(db, current_arrears_band):
     """
@@ -21,13 +208,15 @@ def get_arrears_band_value(db, current_arrears_band):
 
     Exceptions:
         - Returns None if an error occurs while retrieving the arrears band value.
+        - Raises ExportTimeoutError if the export's deadline passes.
     """
     try:
         # Access the 'Arrears_bands' collection in the database
         arrears_bands_collection = db["Arrears_bands"]
 
         # Retrieve a single document from the collection
-        arrears_bands_doc = arrears_bands_collection.find_one({})
+        with query_stage("Arrears_bands.find_one"):
+            arrears_bands_doc = arrears_bands_collection.find_one({}, session=_session(), max_time_ms=max_time_ms())
 
         # Return the requested arrears band value if the document exists
         if arrears_bands_doc:
@@ -35,18 +224,21 @@ def get_arrears_band_value(db, current_arrears_band):
         else:
             logger.warning("No arrears bands document found in the collection.")
             return None
+    except ExportTimeoutError:
+        raise
     except Exception as failed_arrears_band_retrieval:
         logger.error(f"Failed to retrieve arrears band value: {failed_arrears_band_retrieval}")
         return None
 
 
-def get_settlement_data(db, case_id):
+def get_settlement_data(db, case_id, limit=None):
     """
     Retrieve settlement data for the given case_id from the 'Case_settlements' collection.
 
     Args:
         db (pymongo.database.Database): The MongoDB database instance.
         case_id (int or str): The unique identifier of the case.
+        limit (int, optional): Retrieve only the most recent `limit` settlements, by created_on.
 
     Returns:
         list: A list of settlement records for the given case_id, or an empty list if none are found.
@@ -58,33 +250,42 @@ def get_settlement_data(db, case_id):
 
     Exceptions:
         - Returns an empty list if an error occurs while retrieving settlement data.
+        - Raises ExportTimeoutError if the export's deadline passes.
     """
     try:
         # Access the 'Case_settlements' collection in the database
         settlements_collection = db["Case_settlements"]
 
-        # Retrieve all settlements matching the given case_id
-        settlements = list(settlements_collection.find({"case_id": case_id}))
+        # Retrieve all settlements matching the given case_id, or the latest ones
+        with query_stage("Case_settlements.find"):
+            if limit:
+                settlements = _recent(settlements_collection, {"case_id": case_id}, SETTLEMENT_SORT_FIELD, limit)
+            else:
+                settlements = list(settlements_collection.find({"case_id": case_id}, session=_session(), max_time_ms=max_time_ms()))
 
         # Log and return results
         if settlements:
-            logger.info(f"Found {len(settlements)} settlement records for case_id: {case_id}")
+            logger.debug("Found %d settlement records for case_id: %s", len(settlements), case_id)
         else:
             logger.warning(f"No settlement records found for case_id: {case_id}")
         
         return settlements
+    except ExportTimeoutError:
+        raise
     except Exception as failed_settlement_retrieval:
         logger.error(f"Failed to retrieve settlement data: {failed_settlement_retrieval}")
         return []
 
 
-def get_settlement_plan_data(db, case_id):
+def get_settlement_plan_data(db, case_id, limit=None):
     """
     Retrieve settlement plan data for the given case_id from the 'Case_settlements' collection.
 
     Args:
         db (pymongo.database.Database): The MongoDB database instance.
         case_id (int or str): The unique identifier of the case.
+        limit (int, optional): Retrieve only the last `limit` plan entries of the most recent
+            `limit` settlements, each plan cut on the server with $slice.
 
     Returns:
         list: A list of settlement plan records, each including a settlement_id, or an empty list if none are found.
@@ -96,13 +297,19 @@ def get_settlement_plan_data(db, case_id):
 
     Exceptions:
         - Returns an empty list if an error occurs while retrieving settlement plan data.
+        - Raises ExportTimeoutError if the export's deadline passes.
     """
     try:
         # Access the 'Case_settlements' collection in the database
         settlements_collection = db["Case_settlements"]
 
-        # Retrieve all settlements matching the given case_id
-        settlements = list(settlements_collection.find({"case_id": case_id}))
+        # Retrieve all settlements matching the given case_id, or the latest ones
+        with query_stage("Case_settlements.find"):
+            if limit:
+                settlements = _recent(settlements_collection, {"case_id": case_id}, SETTLEMENT_SORT_FIELD, limit,
+                                      {"settlement_id": 1, "settlement_plan": {"$slice": -limit}})
+            else:
+                settlements = list(settlements_collection.find({"case_id": case_id}, session=_session(), max_time_ms=max_time_ms()))
 
         # Initialize a list to store extracted settlement plans
         settlement_plans = []
@@ -114,14 +321,293 @@ def get_settlement_plan_data(db, case_id):
                     # Add settlement_id to each plan for reference
                     plan["settlement_id"] = settlement.get("settlement_id")
                     settlement_plans.append(plan)
+        if limit:
+            settlement_plans = settlement_plans[-limit:]
 
         # Log and return results
         if settlement_plans:
-            logger.info(f"Found {len(settlement_plans)} settlement plan records for case_id: {case_id}")
+            logger.debug("Found %d settlement plan records for case_id: %s", len(settlement_plans), case_id)
         else:
             logger.warning(f"No settlement plan records found for case_id: {case_id}")
         
         return settlement_plans
+    except ExportTimeoutError:
+        raise
     except Exception as failed_settlement_plan_retrieval:
         logger.error(f"Failed to retrieve settlement plan data: {failed_settlement_plan_retrieval}")
         return []
+
+
+def get_payments_data(db, case_id, limit=None):
+    """
+    Retrieve payment records for the given case_id from the 'Case_payments' collection.
+
+    Args:
+        db (pymongo.database.Database): The MongoDB database instance.
+        case_id (int or str): The unique identifier of the case.
+        limit (int, optional): Retrieve only the most recent `limit` payments, by created_dtm.
+
+    Returns:
+        list: A list of payment records for the given case_id.
+    """
+    # Access the 'Case_payments' collection in the database
+    payments_collection = db["Case_payments"]
+
+    # Retrieve all payments matching the given case_id, or the latest ones
+    with query_stage("Case_payments.find"):
+        if limit:
+            return _recent(payments_collection, {"case_id": case_id}, PAYMENT_SORT_FIELD, limit)
+        return list(payments_collection.find({"case_id": case_id}, session=_session(), max_time_ms=max_time_ms()))
+
+
+def get_commissions_data(db, case_id, limit=None):
+    """
+    Retrieve commission records for the given case_id.
+
+    The money_transaction_id values of the case are read from 'Case_payments' and the
+    matching records are then fetched from the 'Commissions' collection.
+
+    Args:
+        db (pymongo.database.Database): The MongoDB database instance.
+        case_id (int or str): The unique identifier of the case.
+        limit (int, optional): Retrieve only the most recent `limit` commissions, by paid_dtm,
+            of the money transactions of the most recent `limit` payments.
+
+    Returns:
+        list: A list of commission records for the given case_id.
+    """
+    if limit:
+        with query_stage("Case_payments.find"):
+            payments = _recent(db["Case_payments"], {"case_id": case_id}, PAYMENT_SORT_FIELD, limit,
+                               {"money_transaction_id": 1})
+        money_transaction_ids = list({payment.get("money_transaction_id") for payment in payments} - {None})
+        if not money_transaction_ids:
+            return []
+        with query_stage("Commissions.find"):
+            return _recent(db["Commissions"], {"money_transaction_id": {"$in": money_transaction_ids}},
+                           COMMISSION_SORT_FIELD, limit)
+
+    # Fetch money_transaction_id(s) from Case_payments collection related to the case_id
+    payments_collection = db["Case_payments"]
+    with query_stage("Case_payments.distinct"):
+        money_transaction_ids = payments_collection.distinct("money_transaction_id", {"case_id": case_id}, session=_session(), **query_time_limit())
+
+    # Fetch commission data for each money_transaction_id from Commissions collection
+    commissions_collection = db["Commissions"]
+    commissions_data = []
+    for money_transaction_id in money_transaction_ids:
+        with query_stage("Commissions.find"):
+            transactions = list(commissions_collection.find({
+                "money_transaction_id": money_transaction_id
+            }, session=_session(), max_time_ms=max_time_ms()))
+        commissions_data.extend(transactions)
+
+    if not commissions_data:
+        logger.warning("No commission data found for the given case_id.")
+    return commissions_data
+
+
+def iter_payments(db, case_id, batch_size=1000):
+    """
+    Stream the payment records of the given case_id from the 'Case_payments' collection.
+
+    Unlike get_payments_data(), the records are not collected into a list; the
+    cursor fetches them from the server in batches of `batch_size`.
+
+    Args:
+        db (pymongo.database.Database): The MongoDB database instance.
+        case_id (int or str): The unique identifier of the case.
+        batch_size (int): Number of documents fetched per round trip.
+
+    Returns:
+        iterator: The payment records for the given case_id.
+    """
+    cursor = db["Case_payments"].find({"case_id": case_id}, batch_size=batch_size, session=_session(), max_time_ms=max_time_ms())
+    yield from stream_cursor(cursor, "Case_payments.find", batch_size)
+
+
+def iter_commissions(db, case_id, batch_size=1000):
+    """
+    Stream the commission records of the given case_id; see get_commissions_data().
+
+    Args:
+        db (pymongo.database.Database): The MongoDB database instance.
+        case_id (int or str): The unique identifier of the case.
+        batch_size (int): Number of documents fetched per round trip.
+
+    Returns:
+        iterator: The commission records for the given case_id.
+    """
+    with query_stage("Case_payments.distinct"):
+        money_transaction_ids = db["Case_payments"].distinct("money_transaction_id", {"case_id": case_id}, session=_session(), **query_time_limit())
+
+    commissions_collection = db["Commissions"]
+    for money_transaction_id in money_transaction_ids:
+        cursor = commissions_collection.find(
+            {"money_transaction_id": money_transaction_id}, batch_size=batch_size, session=_session(), max_time_ms=max_time_ms()
+        )
+        yield from stream_cursor(cursor, "Commissions.find", batch_size)
+
+
+def count_settlements(db, case_id):
+    """
+    Count the settlement records of the given case_id without fetching them.
+
+    Args:
+        db (pymongo.database.Database): The MongoDB database instance.
+        case_id (int or str): The unique identifier of the case.
+
+    Returns:
+        int: Number of 'Case_settlements' documents for the case.
+    """
+    with query_stage("Case_settlements.count_documents"):
+        return db["Case_settlements"].count_documents({"case_id": case_id}, session=_session(), **query_time_limit())
+
+
+def count_settlement_plans(db, case_id):
+    """
+    Count the settlement plan entries of the given case_id on the server with a $size projection.
+
+    Args:
+        db (pymongo.database.Database): The MongoDB database instance.
+        case_id (int or str): The unique identifier of the case.
+
+    Returns:
+        int: Total length of the settlement_plan arrays of the case's settlements.
+    """
+    pipeline = [
+        {"$match": {"case_id": case_id}},
+        {"$project": {"plans": {"$size": {"$ifNull": ["$settlement_plan", []]}}}},
+        {"$group": {"_id": None, "plans": {"$sum": "$plans"}}}
+    ]
+    with query_stage("Case_settlements.aggregate"):
+        result = list(db["Case_settlements"].aggregate(pipeline, session=_session(), **query_time_limit()))
+    return result[0]["plans"] if result else 0
+
+
+def count_payments(db, case_id):
+    """
+    Count the payment records of the given case_id without fetching them.
+
+    Args:
+        db (pymongo.database.Database): The MongoDB database instance.
+        case_id (int or str): The unique identifier of the case.
+
+    Returns:
+        int: Number of 'Case_payments' documents for the case.
+    """
+    with query_stage("Case_payments.count_documents"):
+        return db["Case_payments"].count_documents({"case_id": case_id}, session=_session(), **query_time_limit())
+
+
+def count_commissions(db, case_id):
+    """
+    Count the commission records of the given case_id without fetching them.
+
+    Args:
+        db (pymongo.database.Database): The MongoDB database instance.
+        case_id (int or str): The unique identifier of the case.
+
+    Returns:
+        int: Number of 'Commissions' documents linked to the case's money transactions.
+    """
+    with query_stage("Case_payments.distinct"):
+        money_transaction_ids = db["Case_payments"].distinct("money_transaction_id", {"case_id": case_id}, session=_session(), **query_time_limit())
+    if not money_transaction_ids:
+        return 0
+    with query_stage("Commissions.count_documents"):
+        return db["Commissions"].count_documents(
+            {"money_transaction_id": {"$in": money_transaction_ids}}, session=_session(), **query_time_limit()
+        )
+
+
+def sum_settlements(db, case_id):
+    """
+    Total the settlement amounts of the given case_id on the server with $group/$sum.
+
+    Args:
+        db (pymongo.database.Database): The MongoDB database instance.
+        case_id (int or str): The unique identifier of the case.
+
+    Returns:
+        dict: 'settlements' (count) and 'settlement_amount' (sum).
+    """
+    pipeline = [
+        {"$match": {"case_id": case_id}},
+        {"$group": {"_id": None, "settlements": {"$sum": 1}, "settlement_amount": {"$sum": "$settlement_amount"}}}
+    ]
+    with query_stage("Case_settlements.aggregate"):
+        result = list(db["Case_settlements"].aggregate(pipeline, session=_session(), **query_time_limit()))
+    return {"settlements": result[0]["settlements"] if result else 0,
+            "settlement_amount": result[0]["settlement_amount"] if result else 0}
+
+
+def sum_payments(db, case_id):
+    """
+    Total the payments of the given case_id, overall and per calendar month (UTC), on the server.
+
+    Both totals come from one $facet aggregation; only the totals are transferred,
+    however long the payment history is.
+
+    Args:
+        db (pymongo.database.Database): The MongoDB database instance.
+        case_id (int or str): The unique identifier of the case.
+
+    Returns:
+        dict: 'payments' (count), 'paid_amount' (sum of bill_paid_amount) and 'by_month',
+        a list of {'month': 'YYYY-MM' or None for undated payments, 'payments', 'paid_amount'}.
+    """
+    pipeline = [
+        {"$match": {"case_id": case_id}},
+        {"$facet": {
+            "totals": [
+                {"$group": {"_id": None, "payments": {"$sum": 1}, "paid_amount": {"$sum": "$bill_paid_amount"}}}
+            ],
+            "by_month": [
+                {"$group": {
+                    "_id": {"$dateToString": {"format": "%Y-%m", "date": "$bill_paid_date"}},
+                    "payments": {"$sum": 1}, "paid_amount": {"$sum": "$bill_paid_amount"}
+                }},
+                {"$sort": {"_id": 1}}
+            ]
+        }}
+    ]
+    with query_stage("Case_payments.aggregate"):
+        result = list(db["Case_payments"].aggregate(pipeline, session=_session(), **query_time_limit()))
+    totals = result[0]["totals"][0] if result and result[0]["totals"] else {"payments": 0, "paid_amount": 0}
+    return {
+        "payments": totals["payments"],
+        "paid_amount": totals["paid_amount"],
+        "by_month": [
+            {"month": month["_id"], "payments": month["payments"], "paid_amount": month["paid_amount"]}
+            for month in (result[0]["by_month"] if result else [])
+        ],
+    }
+
+
+def sum_commissions(db, case_id):
+    """
+    Total the commissions of the given case_id on the server, joining them through the case's payments.
+
+    Args:
+        db (pymongo.database.Database): The MongoDB database instance.
+        case_id (int or str): The unique identifier of the case.
+
+    Returns:
+        dict: 'commissions' (count) and 'commissioned_amount' (sum).
+    """
+    pipeline = [
+        {"$match": {"case_id": case_id}},
+        # Each money transaction once, as get_commissions_data() reads them
+        {"$group": {"_id": "$money_transaction_id"}},
+        {"$match": {"_id": {"$ne": None}}},
+        {"$lookup": {"from": "Commissions", "localField": "_id", "foreignField": "money_transaction_id",
+                     "as": "commissions"}},
+        {"$unwind": "$commissions"},
+        {"$group": {"_id": None, "commissions": {"$sum": 1},
+                    "commissioned_amount": {"$sum": "$commissions.commissioned_amount"}}}
+    ]
+    with query_stage("Case_payments.aggregate"):
+        result = list(db["Case_payments"].aggregate(pipeline, session=_session(), **query_time_limit()))
+    return {"commissions": result[0]["commissions"] if result else 0,
+            "commissioned_amount": result[0]["commissioned_amount"] if result else 0}
@@ -0,0 +1,87 @@
+import time  # Monotonic clock the deadlines are measured on
+from contextlib import contextmanager
+from contextvars import ContextVar
+from .errors import ExportTimeoutError
+
+# Deadline of the export running in this context, see deadline_scope()
+_current_deadline = ContextVar("export_deadline", default=None)
+
+
+class Deadline:
+    """
+    A budget of `seconds` on the monotonic clock, starting when it is created.
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        """
+        Return the seconds left, negative once the deadline has passed.
+        """
+        return self.expires_at - time.monotonic()
+
+    def check(self, stage):
+        """
+        Raise ExportTimeoutError if the deadline has passed before `stage`.
+        """
+        if self.remaining() <= 0:
+            raise ExportTimeoutError(self.seconds, stage)
+
+
+@contextmanager
+def deadline_scope(seconds):
+    """
+    Bound the export run in the enclosed block to `seconds`.
+
+    Queries issued through data_fetcher send the remaining budget as maxTimeMS (see
+    max_time_ms()), and the query and render stages call check_deadline(), so a
+    stuck export fails with ExportTimeoutError instead of holding its worker. An
+    enclosing deadline that expires earlier stays in force. Without `seconds` the
+    block is a no-op.
+
+    Args:
+        seconds (float): Seconds the export may take; None or 0 for no limit.
+    """
+    if not seconds:
+        yield None
+        return
+    deadline = Deadline(seconds)
+    enclosing = _current_deadline.get()
+    if enclosing is not None and enclosing.expires_at <= deadline.expires_at:
+        deadline = enclosing
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+def current_deadline():
+    """
+    Return the Deadline of the running export, or None if it has none.
+    """
+    return _current_deadline.get()
+
+
+def check_deadline(stage):
+    """
+    Raise ExportTimeoutError if the deadline of the running export has passed (no-op without one).
+
+    Args:
+        stage (str): The query or table about to run, named in the error.
+    """
+    deadline = _current_deadline.get()
+    if deadline is not None:
+        deadline.check(stage)
+
+
+def max_time_ms():
+    """
+    Return the remaining budget of the running export in whole milliseconds, at least 1, or None without a deadline.
+    """
+    deadline = _current_deadline.get()
+    if deadline is None:
+        return None
+    return max(1, int(deadline.remaining() * 1000))
@@ -1,83 +1,98 @@
 import logging
-import sys
 from .table_utils import create_table
+from .errors import TableError
 
 logger = logging.getLogger('excel_data_writer')
 
+DRC_HEADERS = [
+    "Order ID", "DRC ID", "DRC Name", "Created DTM", "DRC Status", "Status DTM",
+    "Expire DTM", "Case Removal Remark", "Removed By", "Removed DTM",
+    "DRC Selection Logic", "Case Distribution Batch ID"
+]
+
+RO_HEADERS = [
+    "RO ID", "Assigned DTM", "Assigned By", "Removed DTM", "Case Removal Remark", "DRC ID", "DRC Name"
+]
+
+def drc_rows(case_data):
+    """
+    Prepare the DRC table rows from the case's 'drc' array.
+    """
+    drc_data = case_data.get("drc", [])
+    return [
+        [
+            drc.get("order_id"),
+            drc.get("drc_id"),
+            drc.get("drc_name"),
+            drc.get("created_dtm"),
+            drc.get("drc_status"),
+            drc.get("status_dtm"),
+            drc.get("expire_dtm"),
+            drc.get("case_removal_remark"),
+            drc.get("removed_by"),
+            drc.get("removed_dtm"),
+            drc.get("drc_selection_logic"),
+            drc.get("case_distribution_batch_id")
+        ]
+        for drc in drc_data
+    ]
+
+def ro_rows(case_data):
+    """
+    Prepare the Recovery Officer (RO) table rows from the recovery_officers of every DRC.
+    """
+    drc_data = case_data.get("drc", [])
+    data = []
+
+    # Iterate through each DRC object to extract RO data
+    for drc in drc_data:
+        ro_data = drc.get("recovery_officers", [])
+        for ro in ro_data:
+            data.append([
+                ro.get("ro_id"),
+                ro.get("assigned_dtm"),
+                ro.get("assigned_by"),
+                ro.get("removed_dtm"),
+                ro.get("case_removal_remark"),
+                drc.get("drc_id"),  # DRC ID from the parent DRC object
+                drc.get("drc_name")  # DRC Name from the parent DRC object
+            ])
+    return data
+
 def create_drc_table(worksheet, case_data, x_pointer, y_pointer, styles):
     """
     Create the Debt Recovery Company (DRC) table in the worksheet.
     """
     try:
-        logger.info("Creating DRC table...")
-        headers = [
-            "Order ID", "DRC ID", "DRC Name", "Created DTM", "DRC Status", "Status DTM",
-            "Expire DTM", "Case Removal Remark", "Removed By", "Removed DTM",
-            "DRC Selection Logic", "Case Distribution Batch ID"
-        ]
-        
+        logger.debug("Creating DRC table...")
+
         # Prepare data for the table
-        drc_data = case_data.get("drc", [])
-        data = [
-            [
-                drc.get("order_id"),
-                drc.get("drc_id"),
-                drc.get("drc_name"),
-                drc.get("created_dtm"),
-                drc.get("drc_status"),
-                drc.get("status_dtm"),
-                drc.get("expire_dtm"),
-                drc.get("case_removal_remark"),
-                drc.get("removed_by"),
-                drc.get("removed_dtm"),
-                drc.get("drc_selection_logic"),
-                drc.get("case_distribution_batch_id")
-            ]
-            for drc in drc_data
-        ]
-        
+        data = drc_rows(case_data)
+
         # Create the table
-        next_row = create_table(worksheet, x_pointer, y_pointer, "Debt Recovery Company (DRC)", headers, data, styles)
-        
-        logger.info("DRC table created successfully.")
+        next_row = create_table(worksheet, x_pointer, y_pointer, "Debt Recovery Company (DRC)", DRC_HEADERS, data, styles)
+
+        logger.debug("DRC table created successfully.")
         return next_row
     except Exception as failed_drc_table_creation:
         logger.error(f"Failed to create DRC table: {failed_drc_table_creation}")
-        sys.exit(1)
+        raise TableError("DRC", failed_drc_table_creation) from failed_drc_table_creation
 
 def create_ro_table(worksheet, case_data, x_pointer, y_pointer, styles):
     """
     Create the Recovery Officer (RO) table in the worksheet.
     """
     try:
-        logger.info("Creating Recovery Officer (RO) table...")
-        headers = [
-            "RO ID", "Assigned DTM", "Assigned By", "Removed DTM", "Case Removal Remark", "DRC ID", "DRC Name"
-        ]
-        
+        logger.debug("Creating Recovery Officer (RO) table...")
+
         # Prepare data for the table
-        drc_data = case_data.get("drc", [])
-        data = []
-        
-        # Iterate through each DRC object to extract RO data
-        for drc in drc_data:
-            ro_data = drc.get("recovery_officers", [])
-            for ro in ro_data:
-                data.append([
-                    ro.get("ro_id"),
-                    ro.get("assigned_dtm"),
-                    ro.get("assigned_by"),
-                    ro.get("removed_dtm"),
-                    ro.get("case_removal_remark"),
-                    drc.get("drc_id"),  # DRC ID from the parent DRC object
-                    drc.get("drc_name")  # DRC Name from the parent DRC object
-                ])
-        
+        data = ro_rows(case_data)
+
         # Create the table
-        next_row = create_table(worksheet, x_pointer, y_pointer, "Recovery Officer (RO)", headers, data, styles)
-        
-        logger.info("Recovery Officer (RO) table created successfully.")
+        next_row = create_table(worksheet, x_pointer, y_pointer, "Recovery Officer (RO)", RO_HEADERS, data, styles)
+
+        logger.debug("Recovery Officer (RO) table created successfully.")
         return next_row
     except Exception as failed_ro_table_creation:
         logger.error(f"Failed to create RO table: {failed_ro_table_creation}")
-        sys.exit(1)
\ No newline at end of file
+        raise TableError("RO", failed_ro_table_creation) from failed_ro_table_creation
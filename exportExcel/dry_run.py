@@ -0,0 +1,341 @@
+import logging  # Module for logging errors and debug information
+import math  # Module for rounding up the number of split files
+import re  # Module for parsing the Prometheus textfile
+from itertools import islice
+from .table_specs import case_table_specs
+from .memory_guard import estimate_export_size, choose_render_mode
+from .stream_writer import EXCEL_MAX_ROWS
+from .summary_table import TOTALS_HEADERS, PAYMENTS_BY_MONTH_HEADERS
+from .snapshots import DEFAULT_COLLECTIONS
+from .throttle import throttled  # Rate and concurrency limit toward MongoDB
+
+# Initialize logger for this module
+logger = logging.getLogger('excel_data_writer')
+
+# Cases whose related rows are counted per aggregation
+DEFAULT_CHUNK_SIZE = 500
+
+# Fallback costs when no past run has been recorded, measured on local exports:
+# fixed time per export (case read, estimate, totals), render and save time per
+# cell, and deflated xlsx bytes per cell on top of an empty workbook
+DEFAULT_SECONDS_PER_EXPORT = 0.05
+DEFAULT_SECONDS_PER_CELL = 0.00003
+DEFAULT_XLSX_BYTES_PER_CELL = 4.0
+XLSX_BASE_BYTES = 5000
+
+# Stages whose time grows with the cells of an export; the rest of an export's
+# time is taken as its fixed cost
+RENDER_STAGES = ("render", "create_summary_sheet", "save")
+
+# Cells of the Summary sheet apart from its per-month rows
+SUMMARY_CELLS = 1 + 2 * len(TOTALS_HEADERS) + 1 + len(PAYMENTS_BY_MONTH_HEADERS)
+
+# Embedded array holding the rows of each table built from the case document
+EMBEDDED_TABLES = {
+    "create_contact_details_table": "contact",
+    "create_remarks_table": "remark",
+    "create_approve_table": "approve",
+    "create_case_status_table": "case_status",
+    "create_abnormal_stop_table": "abnormal_stop",
+    "create_drc_table": "drc",
+    "create_ro_negotiations_table": "ro_negotiation",
+    "create_ro_requests_table": "ro_requests",
+}
+
+# Tables whose rows are counted in other collections, by the key of related_counts()
+RELATED_TABLES = {
+    "create_settlement_table": "settlements",
+    "create_settlement_plan_table": "settlement_plans",
+    "create_payments_table": "payments",
+    "create_commissions_table": "commissions",
+}
+
+_PROMETHEUS_LINE = re.compile(r'^(?P<name>[a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(?P<labels>.*)\})?\s+(?P<value>\S+)$')
+_PROMETHEUS_LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+class Calibration:
+    """
+    Costs an export is estimated with: fixed seconds per export, seconds and xlsx bytes per cell.
+
+    Args:
+        seconds_per_export (float): Time of an export apart from rendering and saving its cells.
+        seconds_per_cell (float): Render and save time per cell.
+        bytes_per_cell (float): xlsx file bytes per cell on top of XLSX_BASE_BYTES per file.
+        exports (int): Past exports the costs were measured on; 0 for the defaults.
+        source (str): Where the costs come from.
+    """
+
+    def __init__(self, seconds_per_export=DEFAULT_SECONDS_PER_EXPORT, seconds_per_cell=DEFAULT_SECONDS_PER_CELL,
+                 bytes_per_cell=DEFAULT_XLSX_BYTES_PER_CELL, exports=0, source="defaults"):
+        self.seconds_per_export = seconds_per_export
+        self.seconds_per_cell = seconds_per_cell
+        self.bytes_per_cell = bytes_per_cell
+        self.exports = exports
+        self.source = source
+
+    def to_dict(self):
+        return {
+            "source": self.source,
+            "exports": self.exports,
+            "seconds_per_export": round(self.seconds_per_export, 6),
+            "seconds_per_cell": round(self.seconds_per_cell, 9),
+            "bytes_per_cell": round(self.bytes_per_cell, 3),
+        }
+
+
+def read_prometheus(textfile_path):
+    """
+    Read the samples of a Prometheus textfile written by MetricsAggregator.write_prometheus().
+
+    Args:
+        textfile_path (str): The .prom file.
+
+    Returns:
+        dict: Sample value by (metric name, tuple of sorted (label, value) pairs).
+    """
+    samples = {}
+    with open(textfile_path, encoding="utf-8") as textfile:
+        for line in textfile:
+            match = _PROMETHEUS_LINE.match(line.strip())
+            if line.startswith("#") or match is None:
+                continue
+            labels = tuple(sorted(
+                (name, value.replace('\\"', '"').replace("\\n", "\n").replace("\\\\", "\\"))
+                for name, value in _PROMETHEUS_LABEL.findall(match.group("labels") or "")
+            ))
+            samples[(match.group("name"), labels)] = float(match.group("value"))
+    return samples
+
+
+def load_calibration(textfile_path=None):
+    """
+    Calibrate the export costs from the stage metrics of the last recorded run.
+
+    The run's render, Summary sheet and save stages over the cells it wrote give the
+    time per cell; the rest of its export time, per export, gives the fixed cost. The
+    file bytes written over those cells give the bytes per cell. Runs that wrote no
+    cells, and a missing or unreadable file, leave the defaults in place.
+
+    Args:
+        textfile_path (str, optional): Prometheus textfile of the last run, see [METRICS] in Config.ini.
+
+    Returns:
+        Calibration: The calibrated or default costs.
+    """
+    if not textfile_path:
+        return Calibration()
+    try:
+        samples = read_prometheus(textfile_path)
+    except OSError as failed_calibration_read:
+        logger.warning(f"No past run to calibrate the estimate from ({failed_calibration_read}); using default costs.")
+        return Calibration()
+
+    def total(metric, label=None, values=None):
+        return sum(value for (name, labels), value in samples.items()
+                   if name == metric and (label is None or dict(labels).get(label) in values))
+
+    exports = int(total("drs_export_duration_seconds_count"))
+    cells = total("drs_export_table_cells_total")
+    if not exports or not cells:
+        logger.warning(f"{textfile_path} records no exported cells; using default costs.")
+        return Calibration()
+
+    render_seconds = total("drs_export_stage_duration_seconds_sum", "stage", RENDER_STAGES)
+    output_bytes = total("drs_export_output_bytes_total")
+    calibration = Calibration(
+        seconds_per_export=max(total("drs_export_duration_seconds_sum") - render_seconds, 0.0) / exports,
+        seconds_per_cell=render_seconds / cells if render_seconds else DEFAULT_SECONDS_PER_CELL,
+        bytes_per_cell=max(output_bytes - exports * XLSX_BASE_BYTES, 0.0) / cells
+        if output_bytes else DEFAULT_XLSX_BYTES_PER_CELL,
+        exports=exports,
+        source=textfile_path,
+    )
+    logger.debug("Calibrated export costs: %s", calibration.to_dict())
+    return calibration
+
+
+def size_projection():
+    """
+    Projection of a case document onto the sizes of its embedded arrays, computed with $size.
+
+    Returns:
+        dict: $project stage; 'recovery_officers' is the list of officer counts per DRC.
+    """
+    sizes = {array: {"$size": {"$ifNull": [f"${array}", []]}} for array in EMBEDDED_TABLES.values()}
+    sizes["recovery_officers"] = {"$map": {
+        "input": {"$ifNull": ["$drc", []]},
+        "as": "drc",
+        "in": {"$size": {"$ifNull": ["$$drc.recovery_officers", []]}},
+    }}
+    return {"$project": dict({"_id": 0, "incident_id": 1, "case_id": 1}, **sizes)}
+
+
+def related_counts(db, case_ids, collections=None):
+    """
+    Count the settlements, settlement plan entries, payments and commissions of several cases, grouped on the server.
+
+    Args:
+        db (pymongo.database.Database): The MongoDB database instance.
+        case_ids (list): case_id values of the cases.
+        collections (dict, optional): Source collection names by role, see DEFAULT_COLLECTIONS.
+
+    Returns:
+        dict: case_id -> {'settlements', 'settlement_plans', 'payments', 'commissions'}; cases without rows are left out.
+    """
+    collections = collections or DEFAULT_COLLECTIONS
+    counts = {}
+
+    def add(results, *keys):
+        for result in results:
+            case_counts = counts.setdefault(result["_id"], dict.fromkeys(RELATED_TABLES.values(), 0))
+            for key in keys:
+                case_counts[key] += result[key]
+
+    in_cases = {"case_id": {"$in": case_ids}}
+    with throttled():
+        add(db[collections["settlements"]].aggregate([
+            {"$match": in_cases},
+            {"$project": {"case_id": 1, "plans": {"$size": {"$ifNull": ["$settlement_plan", []]}}}},
+            {"$group": {"_id": "$case_id", "settlements": {"$sum": 1}, "settlement_plans": {"$sum": "$plans"}}},
+        ]), "settlements", "settlement_plans")
+    with throttled():
+        add(db[collections["payments"]].aggregate([
+            {"$match": in_cases}, {"$group": {"_id": "$case_id", "payments": {"$sum": 1}}},
+        ]), "payments")
+    # Commissions hang off the distinct money transactions of each case's payments,
+    # as in count_commissions()
+    with throttled():
+        add(db[collections["payments"]].aggregate([
+            {"$match": dict(in_cases, money_transaction_id={"$ne": None})},
+            {"$group": {"_id": {"case_id": "$case_id", "money_transaction_id": "$money_transaction_id"}}},
+            {"$lookup": {"from": collections["commissions"], "localField": "_id.money_transaction_id",
+                         "foreignField": "money_transaction_id", "as": "commissions"}},
+            {"$project": {"commissions": {"$size": "$commissions"}}},
+            {"$group": {"_id": "$_id.case_id", "commissions": {"$sum": "$commissions"}}},
+        ]), "commissions")
+    return counts
+
+
+def table_row_counts(sizes, related):
+    """
+    Rows of every table of one case, by stage name, from its array sizes and related counts.
+    """
+    rows = {name: sizes.get(array) or 0 for name, array in EMBEDDED_TABLES.items()}
+    rows["create_ro_table"] = sum(sizes.get("recovery_officers") or [])
+    rows.update({name: related.get(key, 0) for name, key in RELATED_TABLES.items()})
+    return rows
+
+
+def estimate_case(row_counts, export_options=None):
+    """
+    Estimate the layout, render path and files of one export from its table row counts.
+
+    Args:
+        row_counts (dict): Rows by table stage name, see table_row_counts().
+        export_options (dict, optional): Keyword arguments of export_all_tables() (memory budget, render mode, spill limits, Summary sheet).
+
+    Returns:
+        dict: Result of estimate_export_size() plus 'render_mode' and 'files'.
+    """
+    export_options = export_options or {}
+    specs = [
+        dict(spec, count=lambda rows=row_counts[spec["name"]]: rows) if spec["name"] in row_counts else spec
+        for spec in case_table_specs({}, None)
+    ]
+    estimate = estimate_export_size(specs)
+    if export_options.get("summary_sheet", True):
+        estimate["cells"] += SUMMARY_CELLS
+
+    memory_budget_mb = export_options.get("memory_budget_mb")
+    max_sheet_rows = export_options.get("max_sheet_rows") or EXCEL_MAX_ROWS
+    max_rows_per_file = export_options.get("max_rows_per_file")
+    estimate["render_mode"] = choose_render_mode(
+        estimate, memory_budget_mb * 1024 * 1024 if memory_budget_mb else None,
+        export_options.get("render_mode") or "auto", min(max_sheet_rows, max_rows_per_file or max_sheet_rows)
+    )
+    estimate["files"] = math.ceil(estimate["sheet_rows"] / max_rows_per_file) if max_rows_per_file else 1
+    return estimate
+
+
+def estimate_run(db, collection_name, query, calibration=None, export_options=None, collections=None,
+                 workers=1, chunk_size=DEFAULT_CHUNK_SIZE, top_n=5):
+    """
+    Estimate the rows, cells, xlsx size and runtime of exporting every case matching `query`, without exporting.
+
+    Case documents are read as the sizes of their embedded arrays ($size projection);
+    settlements, settlement plans, payments and commissions are counted by the server,
+    `chunk_size` cases per aggregation. No row is fetched and nothing is rendered.
+
+    Args:
+        db (pymongo.database.Database): The MongoDB database instance.
+        collection_name (str): The case details collection.
+        query (dict): Filter on the case collection.
+        calibration (Calibration, optional): Export costs; the defaults if omitted.
+        export_options (dict, optional): Keyword arguments of export_all_tables(), see estimate_case().
+        collections (dict, optional): Source collection names by role, see DEFAULT_COLLECTIONS.
+        workers (int): Export threads of the planned run.
+        chunk_size (int): Cases counted per aggregation.
+        top_n (int): Largest exports listed in the report.
+
+    Returns:
+        dict: Totals per table and for the run, the estimated 'xlsx_bytes', 'seconds' of
+        export work and 'wall_seconds' over `workers`, the largest exports and the calibration.
+    """
+    calibration = calibration or Calibration()
+    cursor = db[collection_name].aggregate([{"$match": query}, size_projection()], batchSize=chunk_size)
+
+    report = {"cases": 0, "rows": 0, "cells": 0, "files": 0, "streaming_cases": 0, "tables": {}}
+    largest = []
+    while True:
+        with throttled():
+            chunk = list(islice(cursor, chunk_size))
+        if not chunk:
+            break
+        related = related_counts(db, [case.get("case_id") for case in chunk], collections)
+        for case in chunk:
+            estimate = estimate_case(table_row_counts(case, related.get(case.get("case_id"), {})), export_options)
+            report["cases"] += 1
+            report["rows"] += estimate["rows"]
+            report["cells"] += estimate["cells"]
+            report["files"] += estimate["files"]
+            report["streaming_cases"] += estimate["render_mode"] == "streaming"
+            for title, table in estimate["tables"].items():
+                totals = report["tables"].setdefault(title, {"rows": 0, "cells": 0})
+                totals["rows"] += table["rows"]
+                totals["cells"] += table["cells"]
+            largest = sorted(largest + [(estimate["cells"], case.get("incident_id"))],
+                             key=lambda item: item[0], reverse=True)[:top_n]
+
+    seconds = report["cases"] * calibration.seconds_per_export + report["cells"] * calibration.seconds_per_cell
+    report.update({
+        "xlsx_bytes": int(report["files"] * XLSX_BASE_BYTES + report["cells"] * calibration.bytes_per_cell),
+        "seconds": seconds,
+        # A lower bound: rendering is CPU-bound and shares the interpreter between threads
+        "wall_seconds": seconds / max(min(workers, report["cases"]), 1),
+        "workers": workers,
+        "largest": [{"incident_id": incident_id, "cells": cells} for cells, incident_id in largest],
+        "calibration": calibration.to_dict(),
+    })
+    return report
+
+
+def format_report(report):
+    """
+    Render a dry-run report as readable text for the log.
+    """
+    lines = [
+        f"Dry run: {report['cases']} case(s), {report['rows']:,} rows, {report['cells']:,} cells in "
+        f"{report['files']} file(s), {report['streaming_cases']} streamed",
+        f"Estimated xlsx size: {report['xlsx_bytes']:,} bytes ({report['xlsx_bytes'] / 1048576:,.1f} MiB)",
+        f"Estimated runtime: {report['seconds']:,.1f} s of export work, at least "
+        f"{report['wall_seconds']:,.1f} s with {report['workers']} worker(s)",
+        f"Calibration: {report['calibration']}",
+        "Rows per table:",
+    ]
+    lines.extend(f"  {title}: {table['rows']:,} rows, {table['cells']:,} cells"
+                 for title, table in report["tables"].items())
+    if report["largest"]:
+        lines.append("Largest exports: " + ", ".join(
+            f"{case['incident_id']} ({case['cells']:,} cells)" for case in report["largest"]))
+    return "\n".join(lines)
@@ -0,0 +1,112 @@
+# What an export does when one of its tables cannot be built or written
+FAIL = "fail"  # The export fails with a TableError
+DEGRADE = "degrade"  # The export goes on; the table is written as far as it can be, or marked unavailable
+TABLE_POLICIES = (FAIL, DEGRADE)
+
+# Policy of the tables not named in the policies of an export
+DEFAULT_TABLE_POLICY = FAIL
+
+
+class ExportError(Exception):
+    """
+    An export could not be completed; raised by the library instead of terminating the process.
+
+    Args:
+        message (str): What failed.
+        incident_id (int or str, optional): The case being exported; export_all_tables() fills it in.
+    """
+
+    def __init__(self, message, incident_id=None):
+        super().__init__(message)
+        self.incident_id = incident_id
+
+
+class ConfigError(ExportError):
+    """
+    A configuration or styles file is missing, empty or invalid.
+    """
+
+
+class CaseNotFoundError(ExportError):
+    """
+    The case details collection has no case with the incident ID.
+    """
+
+    def __init__(self, incident_id):
+        super().__init__(f"No case details found for Incident ID: {incident_id}", incident_id)
+
+
+class TableError(ExportError):
+    """
+    A table could not be built or written, and its policy is to fail the export.
+
+    Args:
+        table (str): Title or stage name of the table.
+        cause (Exception): The underlying error.
+    """
+
+    def __init__(self, table, cause, incident_id=None):
+        if isinstance(cause, TableError):
+            cause = cause.cause
+        super().__init__(f"Failed to create {table} table: {cause!r}", incident_id)
+        self.table = table
+        self.cause = cause
+
+
+class ExportTimeoutError(ExportError):
+    """
+    The export did not finish within its deadline; see deadline.deadline_scope().
+
+    Args:
+        seconds (float): The deadline of the export.
+        stage (str): The query or table that found the deadline passed.
+    """
+
+    def __init__(self, seconds, stage, incident_id=None):
+        super().__init__(f"Export deadline of {seconds:g} s exceeded at {stage}", incident_id)
+        self.seconds = seconds
+        self.stage = stage
+
+
+class SaveError(ExportError):
+    """
+    The workbook could not be written to disk.
+    """
+
+
+def table_policy(policies, name):
+    """
+    Return the policy of a table: its own entry in `policies`, else the 'default' entry, else DEFAULT_TABLE_POLICY.
+
+    Args:
+        policies (dict, optional): Policy by table stage name, e.g. {"create_remarks_table": "degrade"}.
+        name (str): Stage name of the table.
+
+    Returns:
+        str: FAIL or DEGRADE.
+    """
+    policies = policies or {}
+    return policies.get(name, policies.get("default", DEFAULT_TABLE_POLICY))
+
+
+def parse_table_policies(entries):
+    """
+    Validate table policies read from a configuration section.
+
+    Args:
+        entries (dict): Policy by table stage name or 'default'.
+
+    Returns:
+        dict: The policies, lower-cased.
+
+    Exceptions:
+        - Raises ConfigError for a policy other than 'fail' or 'degrade'.
+    """
+    policies = {}
+    for name, policy in entries.items():
+        policy = policy.strip().lower()
+        if policy not in TABLE_POLICIES:
+            raise ConfigError(f"Unknown table error policy {policy!r} for {name}; expected one of {TABLE_POLICIES}")
+        policies[name] = policy
+    return policies
+
@@ -1,8 +1,7 @@
-import sys
-from openpyxl.styles import Font, PatternFill, Border, Side, Alignment  # Import styling classes from openpyxl
 import configparser  # Module for reading configuration files
 import os
 import logging  # Module for logging errors and debug information
+from .errors import ConfigError  # Raised instead of terminating the program
 
 # Initialize logger for this module
 logger = logging.getLogger('excel_data_writer')
@@ -19,13 +18,15 @@ def load_styles(styles_config_path):
         dict: A dictionary containing various styles for Excel formatting.
 
     Outputs:
-        - Logs an error and exits if the 'MAIN_HEADER_FILLS' section is missing.
-        - Logs an error and exits if any exception occurs during loading.
+        - Logs an error if the 'MAIN_HEADER_FILLS' section is missing or the styles cannot be loaded.
 
     Exceptions:
-        - Exits the program if the configuration file is invalid or missing required sections.
+        - Raises ConfigError if the configuration file is invalid or missing required sections.
     """
     try:
+        # openpyxl is imported on first use to keep start-up fast
+        from openpyxl.styles import Font, PatternFill, Border, Side, Alignment  # Import styling classes from openpyxl
+
         # Initialize the configuration parser and read the styles configuration file
         config = configparser.ConfigParser()
         config.read(styles_config_path)
@@ -33,7 +34,7 @@ def load_styles(styles_config_path):
         # Ensure that the required section exists in the configuration file
         if not config.has_section("MAIN_HEADER_FILLS"):
             logger.error("Section 'MAIN_HEADER_FILLS' not found in styles.ini.")
-            sys.exit(1)  # Exit the program if the section is missing
+            raise ConfigError(f"Section 'MAIN_HEADER_FILLS' not found in {styles_config_path}")
 
         # Create a dictionary to store various styles from the configuration file
         styles = {
@@ -73,10 +74,12 @@ def load_styles(styles_config_path):
 
         return styles  # Return the loaded styles as a dictionary
 
+    except ConfigError:
+        raise
     except Exception as styles_loading_error:
-        # Log an error message and exit if an exception occurs while loading styles
+        # Log an error message and report it to the caller
         logger.error(f"Failed to load styles: {styles_loading_error}")
-        sys.exit(1)
+        raise ConfigError(f"Failed to load styles: {styles_loading_error}") from styles_loading_error
 
 
 def format_with_thousand_separator(value):
@@ -1,127 +1,152 @@
 from datetime import datetime  # Module for handling date and time operations
 import logging  # Module for logging errors and debugging information
 import os  # Module for interacting with the operating system
-import sys  # Module for system-specific parameters and functions
-from openpyxl import Workbook  # Library for working with Excel files
-from .data_fetcher import get_settlement_data, get_settlement_plan_data 
-from .case_contact_tables import create_case_details_table, create_contact_details_table
-from .settlements_remarks import create_remarks_table, create_settlement_table, create_settlement_plan_table
-from .approve_table import create_approve_table, create_case_status_table, create_abnormal_stop_table
-from .drc_ro_tables import create_drc_table, create_ro_table
-from .payments_table import create_payments_table
-from .ro_tables import create_ro_negotiations_table, create_ro_requests_table
-from .commissions_table import create_commissions_table
+import json  # Module for serialising the per-export metrics summary
+from .data_fetcher import get_case_data, get_case_preview, get_export_snapshot, case_read_session
+from .metrics import ExportMetrics, activate, current_metrics, timed
+from .profiling import phase, profiling
+from .table_specs import case_table_specs, handle_table_error
+from .table_utils import create_table, create_vertical_table, writable_rows
+from .errors import CaseNotFoundError, ExportError, ExportTimeoutError, SaveError
+from .deadline import check_deadline, deadline_scope
+from .memory_guard import estimate_export_size, choose_render_mode, track_memory
+from .stream_writer import write_streaming_tables, EXCEL_MAX_ROWS
+from .snapshots import SNAPSHOT_VERSION
+from .summary_table import SUMMARY_SHEET_TITLE, case_totals, create_summary_sheet
+from .layout import DEFAULT_PREPARE_WORKERS, prepare_tables, plan_layout
+from .command_monitor import query_report
+from .preview import PREVIEW_ARRAYS, preview_bundle
+from .render_cache import rendered_block, replay_table, table_fingerprint
 
 logger = logging.getLogger('excel_data_writer')
 
-def create_all_tables(workBook, case_data, db, styles):
+def create_all_tables(workBook, case_data, db, styles, snapshot=None, prepare_workers=DEFAULT_PREPARE_WORKERS,
+                      preview=None, render_cache=None, table_policies=None):
     """
     Create all tables in a structured format.
     
+    The rows of all tables are prepared first, in parallel on `prepare_workers`
+    threads; their sizes fix every table's position, and the tables are then
+    written into the sheet in one sequential pass. With a `render_cache`, a table
+    whose rows have the fingerprint of its cached block is written with template
+    styles and the cached column widths instead of being styled and measured again.
+    
+    A table that cannot be built or written fails the export, or under its 'degrade'
+    policy is written as a notice (rows cannot be built) or with the values openpyxl
+    rejects written as text (a row holds such a value).
+    
     Args:
         workBook (Workbook): An openpyxl Workbook object where the sheet will be created.
         case_data (dict): Dictionary containing case-related data.
         db: Database connection object for fetching additional data.
         styles (dict): Predefined styles for formatting.
+        snapshot (dict, optional): Export snapshot of the case providing the rows instead of the database.
+        prepare_workers (int): Threads fetching and building the table rows.
+        preview (dict, optional): Preview of the case from preview_bundle(), showing only the latest entries.
+        render_cache (RenderCache, optional): Column widths of the case's tables from earlier exports.
+        table_policies (dict, optional): Error policy by table stage name; see errors.table_policy().
     
     Returns:
         worksheet: The worksheet object containing the generated tables.
     
     Outputs:
         - Logs success or failure messages while creating the sheet.
-    Create the Case Details sheet with all tables.
+    
+    Exceptions:
+        - Raises TableError for a failing table under the 'fail' policy, ExportError for other failures.
     """
     try:
-        logger.info("Creating Case Details sheet...")
+        logger.debug("Creating Case Details sheet...")
         worksheet = workBook.active
         worksheet.title = "Case Details"
         
-        # Define starting row and column for the first table
-        x_pointer, y_pointer = 1, 1
-        
-        # Create the Case Details table
-        next_row = create_case_details_table(worksheet, case_data, x_pointer, y_pointer, db, styles)
-        
-        # Add a two-row gap between the tables
-        gap_row = next_row + 1
-        
-        # Create the Contact Details table
-        next_row = create_contact_details_table(worksheet, case_data, gap_row, y_pointer, styles)
-        
-        # Add a two-row gap between the Contact Info and Remarks tables
-        gap_row = next_row + 1
-        
-        # Create the Remarks table
-        next_row = create_remarks_table(worksheet, case_data, gap_row, y_pointer, styles)
-        
-        # Add a two-row gap between the Remarks and Settlement tables
-        gap_row = next_row + 1
-        
-        # Retrieve settlement data for the case
-        case_id = case_data.get("case_id")
-        settlements = get_settlement_data(db, case_id)
-        
-        # Create the Settlement table if settlement data exists
-        if settlements:
-            next_row = create_settlement_table(worksheet, settlements, gap_row, y_pointer, styles)
-            gap_row = next_row + 1  # Add a gap after the Settlement table
-        
-        # Retrieve settlement plan data for the case
-        settlement_plans = get_settlement_plan_data(db, case_id)
-        
-        # Create the Settlement Plan table if settlement plan data exists
-        if settlement_plans:
-            next_row = create_settlement_plan_table(worksheet, settlement_plans, gap_row, y_pointer, styles)
-            gap_row = next_row + 1  # Add a gap after the Settlement Plan table
-        
-        # Create the Approve table
-        next_row = create_approve_table(worksheet, case_data, gap_row, y_pointer, styles)
-        gap_row = next_row + 1  # Add a gap after the Approve table
-        
-        # Create the Case Status table
-        next_row = create_case_status_table(worksheet, case_data, gap_row, y_pointer, styles)
-        gap_row = next_row + 1  # Add a gap after the Case Status table
-        
-        # Create the Abnormal Stop table
-        next_row = create_abnormal_stop_table(worksheet, case_data, gap_row, y_pointer, styles)
-        gap_row = next_row + 1  # Add a gap after the Abnormal Stop table
+        # Fetch and build every table's rows, then place the tables from their sizes;
+        # optional tables are left out when empty
+        with timed("prepare_tables"):
+            tables = prepare_tables(
+                case_table_specs(case_data, db, snapshot=snapshot, preview=preview), prepare_workers, table_policies
+            )
         
-        # Create the DRC table
-        next_row = create_drc_table(worksheet, case_data, gap_row, y_pointer, styles)
-        gap_row = next_row + 1  # Add a gap after the DRC table
+        # Write the tables in sheet order, starting in row 1, column 1
+        y_pointer = 1
+        replayed = []
+        for spec, data, x_pointer in plan_layout(tables):
+            check_deadline(spec["name"])
+            with timed(spec["name"]):
+                # Unchanged tables are replayed with the widths cached by an earlier export
+                if render_cache is not None:
+                    key = (case_data.get("incident_id"), spec["name"])
+                    fingerprint = table_fingerprint(spec, data)
+                    block = render_cache.get(key, fingerprint)
+                    if block is not None:
+                        replay_table(worksheet, x_pointer, y_pointer, spec, data, block, styles)
+                        replayed.append(spec["name"])
+                        continue
+                try:
+                    _write_table(worksheet, x_pointer, y_pointer, spec, data, styles)
+                except Exception as failed_table:
+                    # Degraded tables are written again over the same cells and are not cached
+                    handle_table_error(spec, failed_table, table_policies)
+                    _write_table(worksheet, x_pointer, y_pointer, spec, writable_rows(data), styles)
+                    continue
+                if render_cache is not None:
+                    render_cache.put(key, rendered_block(worksheet, spec, fingerprint, y_pointer))
         
-        # Create the Recovery Officer (RO) table
-        next_row = create_ro_table(worksheet, case_data, gap_row, y_pointer, styles)
-        gap_row = next_row + 1  # Add a gap after the RO table
+        metrics = current_metrics()
+        if render_cache is not None and metrics is not None:
+            metrics.info["replayed_tables"] = replayed
         
-        # Create the Payments table
-        next_row = create_payments_table(worksheet, db, case_id, gap_row, y_pointer, styles)
-        gap_row = next_row + 1  # Add a gap after the Payments table
-        
-        # Create the Recovery Officer Negotiations table
-        next_row = create_ro_negotiations_table(worksheet, case_data, gap_row, y_pointer, styles)
-        gap_row = next_row + 1  # Add a gap after the RO Negotiations table
-        
-        # Create the Recovery Officer Requests table
-        next_row = create_ro_requests_table(worksheet, case_data, gap_row, y_pointer, styles)
-        gap_row = next_row + 1  # Add a gap after the RO Requests table
-        
-        # Create the Commissions table
-        next_row = create_commissions_table(worksheet, db, case_id, gap_row, y_pointer, styles)
-        
-        logger.info("Case Details sheet created successfully.")
+        logger.debug("Case Details sheet created successfully.")
         return worksheet
+    except ExportError:
+        raise
     except Exception as create_all_sheet_failed:
         logger.error(f"Failed to create all tables in sheet: {create_all_sheet_failed}")
-        sys.exit(1)
+        raise ExportError(f"Failed to create all tables in sheet: {create_all_sheet_failed}") from create_all_sheet_failed
 
-def export_all_tables(db, incident_id, output_path, collection_name, styles):
+def _write_table(worksheet, x_pointer, y_pointer, spec, data, styles):
+    """
+    Write one prepared table with its builder.
+    """
+    if spec["layout"] == "vertical":
+        create_vertical_table(worksheet, x_pointer, y_pointer, spec["title"], data, styles, spec["bold_labels"])
+    else:
+        create_table(worksheet, x_pointer, y_pointer, spec["title"], spec["headers"], data, styles)
+
+def export_all_tables(db, incident_id, output_path, collection_name, styles, metrics=None, profiler=None,
+                      memory_budget_mb=None, render_mode="auto", trace_memory=False,
+                      max_sheet_rows=EXCEL_MAX_ROWS, max_rows_per_file=None, snapshot_reads=False,
+                      snapshot_collection=None, summary_sheet=True, prepare_workers=DEFAULT_PREPARE_WORKERS,
+                      preview_rows=None, render_cache=None, table_policies=None, deadline_seconds=None):
     """
     Export case details from MongoDB to an Excel file.
     
     - Fetches case data based on `incident_id`.
     - Generates tables for case details, contacts, remarks, settlements, and settlement plans.
     - Saves the Excel file with a unique name to avoid overwriting.
+    - Streams the rows into a write-only workbook when the estimated in-memory
+      workbook would exceed `memory_budget_mb`.
+    - Records stage timings, table sizes, the render decision and peak memory in
+      `metrics` and logs them as one summary line.
+    - Continues tables past `max_sheet_rows` on further sheets, and past
+      `max_rows_per_file` in further '_part<N>' files.
+    - With `snapshot_reads`, reads the whole case bundle from one snapshot.
+    - With `snapshot_collection`, reads the case's pre-joined export snapshot in one
+      query and falls back to the source collections if it has none.
+    - With `summary_sheet`, adds a Summary sheet of settlement, payment and
+      commission totals computed by MongoDB aggregations.
+    - With `preview_rows`, writes a quick 'Case_Preview' file holding only the latest
+      `preview_rows` entries of each history table, cut on the server; tables with older
+      entries left out say so in their title. Previews ignore snapshots and have no Summary sheet.
+    - With `render_cache`, restyles and measures only the tables whose rows changed since
+      the case was last exported in memory mode; the others are written with template
+      styles and their cached column widths.
+    - Raises an ExportError instead of terminating the process when the case cannot
+      be exported; tables whose `table_policies` entry is 'degrade' do not fail the
+      export but are written as far as possible and listed in metrics.info['degraded_tables'].
+    - With `deadline_seconds`, sends each query the remaining budget as maxTimeMS and
+      checks the deadline before every table, the Summary sheet and the save, raising
+      ExportTimeoutError once it has passed; metrics.info['timed_out_at'] names the stage.
     
     Args:
         db: Database connection object.
@@ -129,29 +154,114 @@ def export_all_tables(db, incident_id, output_path, collection_name, styles):
         output_path (str): The directory to save the Excel file.
         collection_name (str): The MongoDB collection name.
         styles (dict): Predefined styles for formatting.
+        metrics (ExportMetrics, optional): Collector for this export; one is created if omitted.
+        profiler (ExportProfiler, optional): Profiles the export's fetch, render and save phases.
+        memory_budget_mb (float, optional): Largest estimated in-memory workbook, in MB; no limit if omitted.
+        render_mode (str): 'auto' to decide from the budget, or 'memory'/'streaming' to force a path.
+        trace_memory (bool): Also record the tracemalloc peak of the export.
+        max_sheet_rows (int): Rows per sheet, at most Excel's 1,048,576.
+        max_rows_per_file (int, optional): Rows per file; one file if omitted.
+        snapshot_reads (bool): Read all collections of the case at one cluster time; see case_read_session().
+        snapshot_collection (str, optional): Collection of export snapshots maintained by refresh_snapshots().
+        summary_sheet (bool): Add the Summary sheet after the Case Details sheet(s).
+        prepare_workers (int): Threads preparing the table rows of in-memory exports; see prepare_tables().
+        preview_rows (int, optional): Entries per history table of a preview export; a full export if omitted.
+        render_cache (RenderCache, optional): Table column widths shared by the exports of this process.
+        table_policies (dict, optional): 'fail' or 'degrade' by table stage name, and 'default'; all fail if omitted.
+        deadline_seconds (float, optional): Seconds the export may take, fetching included; no limit if omitted.
 
     Returns:
-        None (Writes the Excel file to disk)
+        str: The path of the (first) written Excel file; all files are listed in metrics.info['output_files'].
+
+    Exceptions:
+        - Raises CaseNotFoundError if the case does not exist, TableError for a failing table,
+          SaveError if the file cannot be written, ExportTimeoutError once `deadline_seconds`
+          have passed and ExportError for any other failure;
+          each carries the incident_id.
     """
+    if metrics is None:
+        metrics = ExportMetrics(incident_id)
     try:
-        case_collection = db[collection_name]
-        case_data = case_collection.find_one({"incident_id": incident_id})
+        with activate(metrics), deadline_scope(deadline_seconds), profiling(profiler), \
+                case_read_session(db, snapshot_reads):
+            output_path = _export_case(
+                db, incident_id, output_path, collection_name, styles, metrics,
+                memory_budget_mb, render_mode, trace_memory, max_sheet_rows, max_rows_per_file, snapshot_collection,
+                summary_sheet, prepare_workers, preview_rows, render_cache, table_policies
+            )
+        metrics.info["output_path"] = output_path
+        metrics.finish("ok")
+        return output_path
+    except ExportError as failed_export:
+        if failed_export.incident_id is None:
+            failed_export.incident_id = incident_id
+        if isinstance(failed_export, ExportTimeoutError):
+            logger.error(f"Export of Incident ID {incident_id} timed out: {failed_export}")
+            metrics.info["timed_out_at"] = failed_export.stage
+        raise
+    finally:
+        if metrics.status == "running":
+            metrics.finish("failed")
+        logger.info(f"Export summary: {json.dumps(metrics.summary(), default=str)}")
+        if metrics.queries:
+            logger.debug(query_report(metrics.summary()["queries"]))
+
+def _export_case(db, incident_id, output_path, collection_name, styles, metrics,
+                 memory_budget_mb, render_mode, trace_memory, max_sheet_rows, max_rows_per_file, snapshot_collection,
+                 summary_sheet, prepare_workers, preview_rows, render_cache, table_policies):
+    """
+    Fetch, render and save one case; see export_all_tables().
+    """
+    try:
+        snapshot = None
+        preview = None
+        if snapshot_collection and not preview_rows:
+            snapshot = get_export_snapshot(db, snapshot_collection, incident_id, SNAPSHOT_VERSION)
+            if snapshot is None:
+                logger.debug("No export snapshot for Incident ID %s; reading the source collections", incident_id)
+        metrics.info["source"] = "snapshot" if snapshot else "live"
+        if snapshot:
+            metrics.info["snapshot_refreshed_at"] = snapshot.get("refreshed_at")
+            case_data = snapshot["case"]
+        elif preview_rows:
+            # One entry past the preview tells whether older entries were left out
+            case_data = get_case_preview(db, collection_name, incident_id, PREVIEW_ARRAYS.values(), preview_rows + 1)
+        else:
+            case_data = get_case_data(db, collection_name, incident_id)
         
         if not case_data:
             logger.error(f"No case details found for Incident ID: {incident_id}")
-            sys.exit(1)
+            raise CaseNotFoundError(incident_id)
+        
+        if preview_rows:
+            with timed("preview"), phase("fetch"):
+                preview = preview_bundle(db, case_data, preview_rows)
+            metrics.info["preview_rows"] = preview_rows
+            metrics.info["truncated_tables"] = sorted(preview["truncated"])
         
-        # logger.info(f"Case data found: {case_data}")
-        logger.info(f"Case data found!, Exporting case details for Incident ID: {incident_id}")
+        logger.debug("Case data found!, Exporting case details for Incident ID: %s", incident_id)
         
-        workBook = Workbook()
-        worksheet = create_all_tables(workBook, case_data, db, styles)
+        # Size the export from row counts and pick the render path within the memory budget
+        with timed("estimate"), phase("fetch"):
+            estimate = estimate_export_size(case_table_specs(case_data, db, snapshot=snapshot, preview=preview))
+        memory_budget_bytes = memory_budget_mb * 1024 * 1024 if memory_budget_mb else None
+        row_limit = min(max_sheet_rows, max_rows_per_file or max_sheet_rows)
+        render_mode = choose_render_mode(estimate, memory_budget_bytes, render_mode, row_limit)
+        metrics.info.update({
+            "render_mode": render_mode,
+            "estimated_cells": estimate["cells"],
+            "estimated_sheet_rows": estimate["sheet_rows"],
+            "estimated_bytes": estimate["bytes"],
+            "memory_budget_bytes": memory_budget_bytes,
+        })
+        logger.debug("Rendering Incident ID %s in %s mode (estimated %d cells, %d bytes)",
+                     incident_id, render_mode, estimate["cells"], estimate["bytes"])
         
         # Get the current date and time
         current_time = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
         
         # Create the base output file name with incident_id and current date/time
-        file_name = f"Case_Details_{incident_id}_{current_time}.xlsx"
+        file_name = f"{'Case_Preview' if preview else 'Case_Details'}_{incident_id}_{current_time}.xlsx"
         
         # Ensure the output path ends with the correct file name
         if not output_path.endswith('.xlsx'):
@@ -170,13 +280,61 @@ def export_all_tables(db, incident_id, output_path, collection_name, styles):
         # Create directories if they don't exist
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
         
-        # Save the workbook
-        try:
-            workBook.save(output_path)
-            logger.info(f"Case details exported to {output_path}")
-        except Exception as failed_export:
-            logger.error(f"Failed to save Excel file: {failed_export}")
-            sys.exit(1)
+        # openpyxl is imported on first use to keep start-up fast
+        from openpyxl import Workbook  # Library for working with Excel files
+
+        with track_memory(metrics, trace_memory):
+            if render_mode == "streaming":
+                # Rows go straight to the sheet's temporary file as they are read;
+                # full sheets and files spill over as they fill up
+                with timed("render"), phase("render"):
+                    sheet = write_streaming_tables(
+                        case_table_specs(case_data, db, streaming=True, snapshot=snapshot, preview=preview),
+                        styles, output_path,
+                        max_sheet_rows, max_rows_per_file, policies=table_policies
+                    )
+                workBook, output_files = sheet.workbook, sheet.output_files
+                metrics.info["sheets"] = sheet.sheet_count
+            else:
+                workBook = Workbook()
+                with timed("render"), phase("render"):
+                    # Previews are not cached: their cut tables would replace the full ones
+                    create_all_tables(workBook, case_data, db, styles, snapshot, prepare_workers, preview,
+                                      None if preview else render_cache, table_policies)
+                output_files = [output_path]
+                metrics.info["sheets"] = 1
+            metrics.info["output_files"] = output_files
+
+            # Totals are summed by the server, never from the fetched rows; split
+            # exports carry them in the last file. Previews leave them out, as their
+            # cost grows with the case's history
+            if summary_sheet and not preview:
+                check_deadline("create_summary_sheet")
+                try:
+                    with timed("summary_totals"), phase("fetch"):
+                        totals = snapshot["totals"] if snapshot else case_totals(db, case_data.get("case_id"))
+                    with timed("create_summary_sheet"), phase("render"):
+                        create_summary_sheet(workBook, totals, styles)
+                except Exception as failed_summary:
+                    # A degraded Summary sheet is left out rather than saved half written
+                    handle_table_error({"name": "create_summary_sheet", "title": SUMMARY_SHEET_TITLE},
+                                       failed_summary, table_policies)
+                    if SUMMARY_SHEET_TITLE in workBook.sheetnames:
+                        workBook.remove(workBook[SUMMARY_SHEET_TITLE])
+            
+            # Save the workbook
+            check_deadline("save")
+            try:
+                with timed("save"), phase("save"):
+                    workBook.save(output_files[-1])
+                metrics.info["output_bytes"] = sum(os.path.getsize(output_file) for output_file in output_files)
+                logger.debug("Case details exported to %s", ", ".join(output_files))
+                return output_path
+            except Exception as failed_export:
+                logger.error(f"Failed to save Excel file: {failed_export}")
+                raise SaveError(f"Failed to save Excel file: {failed_export}") from failed_export
+    except ExportError:
+        raise
     except Exception as failed_tables_all_export:
         logger.error(f"Failed to export all tables: {failed_tables_all_export}")
-        sys.exit(1)
\ No newline at end of file
+        raise ExportError(f"Failed to export all tables: {failed_tables_all_export}") from failed_tables_all_export
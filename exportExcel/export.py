@@ -1,81 +1,442 @@
+import argparse # Module for parsing command-line options
+import atexit # Module for flushing queued log records at interpreter exit
+import os # Module for interacting with the operating system
+import queue # Thread-safe queue between the QueueHandler and its listener
 import sys # Module for system-specific parameters and functions
 import logging # Module for logging errors and debugging information
 # Import custom modules for configuration loading, styling, and Excel writing
-from .config_loader import load_config
+from .config_loader import load_config, get_os_path
 from .excel_styles import load_styles
 from .excel_writer import export_all_tables
-import logging.config # Module for loading logging configurations
-from pymongo import MongoClient # MongoDB client for database interactions
+from .errors import ConfigError, ExportError, parse_table_policies
+from .batch import export_batch, export_filtered, export_distributed
+from .metrics import ExportMetrics, MetricsAggregator
+from .profiling import ProfileSettings
+from .stream_writer import EXCEL_MAX_ROWS
+from .sharding import DEFAULT_SHARD_SIZE
+from .layout import DEFAULT_PREPARE_WORKERS
+from .preview import DEFAULT_PREVIEW_ROWS
+from .render_cache import RenderCache
+from .leases import DEFAULT_LEASE_COLLECTION, DEFAULT_LEASE_TTL
+from .checkpoint import (DEFAULT_CHECKPOINT_COLLECTION, DEFAULT_MAX_ATTEMPTS, MongoCheckpoint,
+                         SqliteCheckpoint, run_key)
+from .throttle import QueryThrottle, install_throttle
+from .command_monitor import DEFAULT_SLOW_QUERY_MS, command_listener, query_report
+from .dry_run import estimate_run, format_report, load_calibration
+from .portfolio import PORTFOLIO_REPORTS, export_portfolio
+from .snapshots import (DEFAULT_CHUNK_SIZE, DEFAULT_COLLECTIONS, DEFAULT_MAX_ROWS, DEFAULT_OVERLAP_SECONDS,
+                        DEFAULT_SNAPSHOT_COLLECTION, refresh_snapshots)
 
 
 # Initialize logger for this module
 logger = logging.getLogger('excel_data_writer')
 
-def connect_db(mongo_uri, db_name):
+# Background thread running the real log handlers, see start_queue_logging()
+_queue_listener = None
+
+def connect_db(mongo_uri, db_name, event_listeners=None):
     """
     Connect to the MongoDB database using the provided URI and database name.
 
     Args:
         mongo_uri (str): The MongoDB connection string.
         db_name (str): The name of the database to connect to.
+        event_listeners (list, optional): pymongo monitoring listeners registered on the client.
 
     Returns:
         pymongo.database.Database: A MongoDB database object.
 
     Outputs:
         - Logs a success message if the connection is successful.
-        - Logs an error and exits if the connection fails.
+        - Logs an error if the connection fails.
 
     Exceptions:
-        - Exits the program if unable to establish a database connection.
+        - Raises ExportError if unable to establish a database connection.
     """
     try:
+        # pymongo is imported on first use to keep start-up fast
+        from pymongo import MongoClient # MongoDB client for database interactions
+
         # Establish a connection to MongoDB
-        client = MongoClient(mongo_uri)
+        client = MongoClient(mongo_uri, event_listeners=event_listeners or None)
         db = client[db_name]
         # Log successful connection
         logger.info("Successfully connected to the database.")
         return db
     except Exception as failed_db_connection:
-        # Log the error and exit the program
+        # Log the error and report it to the caller
         logger.error(f"Failed to connect to the database: {failed_db_connection}")
-        sys.exit(1)
+        raise ExportError(f"Failed to connect to the database: {failed_db_connection}") from failed_db_connection
 
-def setup_logger(logger_config_path):
+def setup_logger(logger_config_path, log_file_path=None):
     """
     Set up logging configuration using the specified logger config file.
 
+    The configured handlers are then moved behind a QueueHandler and run by a
+    QueueListener thread, so console and file I/O never block the export itself.
+
     Args:
         logger_config_path (str): The path to the logger configuration file.
+        log_file_path (str, optional): Log file used by the file handlers instead of the path in the config file.
 
     Returns:
         logging.Logger: Configured logger instance.
 
     Outputs:
-        - Logs an error and exits if the logger configuration file cannot be loaded.
+        - Prints an error if the logger configuration file cannot be loaded.
 
     Exceptions:
-        - Exits the program if logging setup fails.
+        - Raises ConfigError if logging setup fails.
     """
     try:
+        import logging.config # Module for loading logging configurations
+
         # Load logging configuration from the file
         logging.config.fileConfig(logger_config_path)
 
+        # Hand the configured handlers over to a background thread
+        start_queue_logging(log_file_path)
+
         # Get and return the configured logger
         logger = logging.getLogger('excel_data_writer')
         return logger
 
     except Exception as failed_logger_setup:
-        # Print the error message and exit
+        # Print the error message, as there is no logger yet, and report it to the caller
         print(f"Failed to set up logger: {failed_logger_setup}")
-        sys.exit(1)
+        raise ConfigError(f"Failed to set up logger: {failed_logger_setup}") from failed_logger_setup
+
+def start_queue_logging(log_file_path=None):
+    """
+    Replace the handlers of every configured logger with a QueueHandler and start a QueueListener.
+
+    Args:
+        log_file_path (str, optional): New file path for the configured file handlers.
+
+    Returns:
+        logging.handlers.QueueListener: The running listener.
+    """
+    import logging.handlers # Module providing QueueHandler and QueueListener
+
+    global _queue_listener
+    stop_queue_logging()
+
+    configured_loggers = [logging.getLogger()] + [
+        configured for configured in logging.Logger.manager.loggerDict.values()
+        if isinstance(configured, logging.Logger) and configured.handlers
+    ]
+
+    # Collect each handler once, even if several loggers share it
+    handlers = []
+    for configured in configured_loggers:
+        for handler in configured.handlers:
+            if handler not in handlers:
+                handlers.append(handler)
+
+    if log_file_path:
+        os.makedirs(os.path.dirname(log_file_path) or ".", exist_ok=True)
+        for handler in handlers:
+            if isinstance(handler, logging.FileHandler):
+                # The handler reopens its stream on the next record
+                handler.close()
+                handler.baseFilename = os.path.abspath(log_file_path)
+
+    log_queue = queue.Queue(-1)
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    for configured in configured_loggers:
+        if configured.handlers:
+            configured.handlers = [queue_handler]
+
+    _queue_listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _queue_listener.start()
+
+    # Drain the queue before logging shuts down at interpreter exit
+    atexit.unregister(stop_queue_logging)
+    atexit.register(stop_queue_logging)
+    return _queue_listener
+
+def stop_queue_logging():
+    """
+    Flush the queued log records and stop the QueueListener thread, if one is running.
+    """
+    global _queue_listener
+    if _queue_listener is not None:
+        _queue_listener.stop()
+        _queue_listener = None
+
+def parse_arguments(argv=None):
+    """
+    Parse the command-line options of the export process.
+
+    Args:
+        argv (list, optional): Arguments to parse; defaults to sys.argv[1:].
+
+    Returns:
+        argparse.Namespace: The parsed options.
+    """
+    parser = argparse.ArgumentParser(description="Export case details from MongoDB to Excel.")
+    parser.add_argument("--incident-id", type=int, nargs="+", default=[2025],
+                        help="Incident ID(s) of the cases to export.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of export threads when several incidents or a filter are given.")
+    parser.add_argument("--filter", dest="case_filter", default=None,
+                        help="Export every case matching this MongoDB filter (extended JSON), "
+                             "e.g. '{\"case_current_status\": \"Open\", \"rtom\": \"CO\"}'. "
+                             "Replaces --incident-id.")
+    parser.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE,
+                        help="Cases per _id-range shard handed to a worker in --filter mode.")
+    parser.add_argument("--distributed", metavar="RUN_ID", default=None,
+                        help="Share the --filter export with every process started with the same RUN_ID, "
+                             "on any host, through leases in MongoDB.")
+    parser.add_argument("--lease-ttl", type=float, default=DEFAULT_LEASE_TTL,
+                        help="Seconds before a silent node's shard is reclaimed in --distributed mode.")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue the last run with the same incident IDs or filter: skip the cases "
+                             "it exported and retry the failed ones up to [CHECKPOINT] MAX_ATTEMPTS.")
+    parser.add_argument("--max-qps", type=float, default=None,
+                        help="Average MongoDB queries per second over all export threads "
+                             "(default: [THROTTLE] QUERIES_PER_SECOND in Config.ini).")
+    parser.add_argument("--refresh-snapshots", action="store_true",
+                        help="Re-join the cases changed since the last refresh into the export snapshots "
+                             "([SNAPSHOTS] in Config.ini) and exit; the first refresh joins every case.")
+    parser.add_argument("--rebuild-snapshots", action="store_true",
+                        help="Re-join every case into the export snapshots and exit.")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Estimate the rows, cells, xlsx size and runtime of the export from row counts "
+                             "and exit, without fetching rows or writing files; runtime is calibrated from "
+                             "the last run's metrics ([METRICS] in Config.ini).")
+    parser.add_argument("--preview", type=int, nargs="?", const=DEFAULT_PREVIEW_ROWS, default=None, metavar="N",
+                        help="Write a quick preview with only the latest N entries of each history table "
+                             f"(default N: {DEFAULT_PREVIEW_ROWS}) and no Summary sheet.")
+    parser.add_argument("--portfolio", choices=PORTFOLIO_REPORTS, default=None,
+                        help="Write the portfolio report of the cases currently assigned to each DRC or "
+                             "Recovery Officer, with their arrears, settlements and collections, and exit; "
+                             "--filter limits the cases, --incident-id is ignored.")
+    parser.add_argument("--render-mode", choices=("auto", "memory", "streaming"), default=None,
+                        help="Render path of the workbook (default: [EXPORT] RENDER_MODE in Config.ini).")
+    parser.add_argument("--deadline", type=float, default=None, metavar="SECONDS",
+                        help="Seconds each export (or --portfolio report) may take before it fails with a "
+                             "timeout; every query gets the remaining time as maxTimeMS "
+                             "(default: [EXPORT] DEADLINE_SECONDS in Config.ini).")
+    parser.add_argument("--profile", action="store_true",
+                        help="Profile exports with cProfile and tracemalloc.")
+    parser.add_argument("--profile-dir", default=None,
+                        help="Directory for profile output (default: [PROFILING] in Config.ini).")
+    parser.add_argument("--profile-top", type=int, default=20,
+                        help="Number of hotspots reported per phase.")
+    parser.add_argument("--profile-sample", type=float, default=1.0,
+                        help="Fraction of exports to profile, from 0.0 to 1.0.")
+    args = parser.parse_args(argv)
+    if args.distributed and args.case_filter is None:
+        parser.error("--distributed requires --filter")
+    if args.preview is not None and args.preview < 1:
+        parser.error("--preview needs at least 1 entry per table")
+    return args
+
+def export_settings(config, render_mode=None, deadline_seconds=None):
+    """
+    Read the memory budget, render path, spill limits, Summary sheet option, row preparation threads, render cache and deadline of the exports from the [EXPORT] section, and the table error policies from [TABLE_ERRORS].
+
+    Args:
+        config (configparser.ConfigParser): The loaded configuration.
+        render_mode (str, optional): Render mode given on the command line; overrides the config.
+        deadline_seconds (float, optional): Deadline given on the command line; overrides the config.
+
+    Returns:
+        dict: Keyword arguments of export_all_tables().
+
+    Exceptions:
+        - Raises ConfigError for an unknown table error policy.
+    """
+    cache_tables = config.getint('EXPORT', 'RENDER_CACHE_TABLES', fallback=0)
+    return {
+        "memory_budget_mb": config.getfloat('EXPORT', 'MEMORY_BUDGET_MB', fallback=None),
+        "render_mode": render_mode or config.get('EXPORT', 'RENDER_MODE', fallback='auto'),
+        "trace_memory": config.getboolean('EXPORT', 'TRACE_MEMORY', fallback=False),
+        "max_sheet_rows": config.getint('EXPORT', 'MAX_SHEET_ROWS', fallback=EXCEL_MAX_ROWS),
+        "max_rows_per_file": config.getint('EXPORT', 'MAX_ROWS_PER_FILE', fallback=0) or None,
+        "summary_sheet": config.getboolean('EXPORT', 'SUMMARY_SHEET', fallback=True),
+        "prepare_workers": config.getint('EXPORT', 'PREPARE_WORKERS', fallback=DEFAULT_PREPARE_WORKERS),
+        "render_cache": RenderCache(cache_tables) if cache_tables else None,
+        "deadline_seconds": deadline_seconds or config.getfloat('EXPORT', 'DEADLINE_SECONDS', fallback=0) or None,
+        "table_policies": (
+            parse_table_policies(config['TABLE_ERRORS']) if config.has_section('TABLE_ERRORS') else None
+        ),
+    }
+
+def read_settings(db, config):
+    """
+    Apply the read preference and read concern of the [READS] section to the export's reads.
+
+    Exports are read-only and tolerate some staleness, so they can be served by
+    secondaries (e.g. READ_PREFERENCE = secondaryPreferred), bounded by
+    MAX_STALENESS_SECONDS and steered by TAG_SETS. CASE_READ_CONCERN 'majority' reads
+    only majority-committed data; 'snapshot' reads each case bundle at one cluster time.
+
+    Args:
+        db (pymongo.database.Database): The database from connect_db().
+        config (configparser.ConfigParser): The loaded configuration.
+
+    Returns:
+        tuple: (pymongo.database.Database for the export reads, bool whether case bundles are read from a snapshot)
+
+    Exceptions:
+        - Raises ValueError for an unknown read preference or read concern.
+    """
+    from bson import json_util # Extended JSON parser shipped with pymongo
+    from pymongo import read_preferences
+    from pymongo.read_concern import ReadConcern
+
+    modes = {
+        'primary': read_preferences.Primary, 'primarypreferred': read_preferences.PrimaryPreferred,
+        'secondary': read_preferences.Secondary, 'secondarypreferred': read_preferences.SecondaryPreferred,
+        'nearest': read_preferences.Nearest,
+    }
+    mode = config.get('READS', 'READ_PREFERENCE', fallback='primary')
+    if mode.lower() not in modes:
+        raise ValueError(f"Unknown read preference: {mode!r}; expected one of {sorted(modes)}")
+    read_concern = config.get('READS', 'CASE_READ_CONCERN', fallback='local').lower()
+    if read_concern not in ('local', 'majority', 'snapshot'):
+        raise ValueError(f"Unknown case read concern: {read_concern!r}; expected local, majority or snapshot")
+
+    if mode.lower() == 'primary':
+        read_preference = read_preferences.Primary()
+    else:
+        tag_sets = config.get('READS', 'TAG_SETS', fallback='').strip()
+        max_staleness = config.getint('READS', 'MAX_STALENESS_SECONDS', fallback=-1)
+        read_preference = modes[mode.lower()](
+            tag_sets=json_util.loads(tag_sets) if tag_sets else None, max_staleness=max_staleness
+        )
+
+    export_db = db.with_options(
+        read_preference=read_preference,
+        read_concern=ReadConcern('majority') if read_concern == 'majority' else None
+    )
+    logger.info(f"Export reads use {read_preference} with {read_concern} read concern.")
+    return export_db, read_concern == 'snapshot'
+
+def build_throttle(config, queries_per_second=None):
+    """
+    Build the limit on the exporter's MongoDB queries from the [THROTTLE] section.
 
-def start_process():
+    Args:
+        config (configparser.ConfigParser): The loaded configuration.
+        queries_per_second (float, optional): Query rate given on the command line; overrides the config.
+
+    Returns:
+        QueryThrottle: The throttle, or None if no limit is configured.
+    """
+    if queries_per_second is None:
+        queries_per_second = config.getfloat('THROTTLE', 'QUERIES_PER_SECOND', fallback=0)
+    max_concurrency = config.getint('THROTTLE', 'MAX_CONCURRENCY', fallback=0)
+    target_p95_ms = config.getfloat('THROTTLE', 'TARGET_P95_MS', fallback=0)
+    if not (queries_per_second or max_concurrency):
+        return None
+    return QueryThrottle(
+        queries_per_second or None,
+        config.getint('THROTTLE', 'BURST', fallback=0) or None,
+        max_concurrency or None,
+        config.getint('THROTTLE', 'MIN_CONCURRENCY', fallback=1),
+        target_p95_ms or None
+    )
+
+def monitoring_listeners(config):
+    """
+    Build the pymongo event listeners of the [MONITORING] section.
+
+    Args:
+        config (configparser.ConfigParser): The loaded configuration.
+
+    Returns:
+        list: The command listener recording each export's queries, or no listener if disabled.
+    """
+    if not config.getboolean('MONITORING', 'COMMAND_MONITORING', fallback=True):
+        return []
+    return [command_listener(
+        config.getfloat('MONITORING', 'SLOW_QUERY_MS', fallback=DEFAULT_SLOW_QUERY_MS),
+        config.getboolean('MONITORING', 'MEASURE_REPLIES', fallback=True)
+    )]
+
+def snapshot_settings(config):
+    """
+    Read the export snapshot options from the [COLLECTIONS] and [SNAPSHOTS] sections.
+
+    Args:
+        config (configparser.ConfigParser): The loaded configuration.
+
+    Returns:
+        dict: Keyword arguments of refresh_snapshots().
+    """
+    from bson import json_util # Extended JSON parser shipped with pymongo
+
+    change_fields = config.get('SNAPSHOTS', 'CHANGE_FIELDS', fallback='').strip()
+    return {
+        "snapshot_collection": config.get('COLLECTIONS', 'EXPORT_SNAPSHOTS_COLLECTION', fallback=DEFAULT_SNAPSHOT_COLLECTION),
+        "collections": {
+            "cases": config.get('COLLECTIONS', 'CASE_DETAIL_COLLECTION', fallback=DEFAULT_COLLECTIONS["cases"]),
+            "settlements": config.get('COLLECTIONS', 'CASE_SETTLEMENTS_COLLECTION', fallback=DEFAULT_COLLECTIONS["settlements"]),
+            "payments": config.get('COLLECTIONS', 'CASE_PAYMENTS_COLLECTION', fallback=DEFAULT_COLLECTIONS["payments"]),
+            "commissions": config.get('COLLECTIONS', 'CASE_COMMISSIONS_COLLECTION', fallback=DEFAULT_COLLECTIONS["commissions"]),
+        },
+        "change_fields": json_util.loads(change_fields) if change_fields else None,
+        "chunk_size": config.getint('SNAPSHOTS', 'CHUNK_SIZE', fallback=DEFAULT_CHUNK_SIZE),
+        "max_rows": config.getint('SNAPSHOTS', 'MAX_ROWS', fallback=DEFAULT_MAX_ROWS),
+        "overlap_seconds": config.getfloat('SNAPSHOTS', 'OVERLAP_SECONDS', fallback=DEFAULT_OVERLAP_SECONDS),
+    }
+
+def open_checkpoint(config, db, run_id):
+    """
+    Open the checkpoint of a bulk run in the store chosen in the [CHECKPOINT] section.
+
+    Args:
+        config (configparser.ConfigParser): The loaded configuration.
+        db (pymongo.database.Database): The MongoDB database instance, used by the 'mongo' backend.
+        run_id (str): Key of the run, see run_key().
+
+    Returns:
+        Checkpoint: A SqliteCheckpoint or MongoCheckpoint.
+
+    Exceptions:
+        - Raises ValueError for an unknown backend.
+    """
+    max_attempts = config.getint('CHECKPOINT', 'MAX_ATTEMPTS', fallback=DEFAULT_MAX_ATTEMPTS)
+    backend = config.get('CHECKPOINT', 'BACKEND', fallback='sqlite').lower()
+    if backend == 'sqlite':
+        checkpoint_path = get_os_path(config, 'CHECKPOINT', 'PATH', 'checkpoints/export_checkpoints.sqlite')
+        return SqliteCheckpoint(checkpoint_path, run_id, max_attempts)
+    if backend == 'mongo':
+        collection = config.get('COLLECTIONS', 'EXPORT_CHECKPOINTS_COLLECTION', fallback=DEFAULT_CHECKPOINT_COLLECTION)
+        return MongoCheckpoint(db[collection], run_id, max_attempts)
+    raise ValueError(f"Unknown checkpoint backend: {backend!r}; expected 'sqlite' or 'mongo'")
+
+def parse_case_filter(text):
+    """
+    Parse a case filter given as MongoDB extended JSON.
+
+    Extended JSON allows dates and ObjectIds, e.g. {"created_dtm": {"$gte": {"$date": "2025-01-01T00:00:00Z"}}}.
+
+    Args:
+        text (str): The filter document.
+
+    Returns:
+        dict: The filter.
+
+    Exceptions:
+        - Raises ValueError if the text is not a JSON object.
+    """
+    from bson import json_util # Extended JSON parser shipped with pymongo
+
+    case_filter = json_util.loads(text)
+    if not isinstance(case_filter, dict):
+        raise ValueError(f"The case filter must be a JSON object, got: {text}")
+    return case_filter
+
+def start_process(argv=None):
     """
     Main function to execute the case details export process.
 
     Args:
-        None
+        argv (list, optional): Command-line arguments; defaults to sys.argv[1:].
 
     Returns:
         None
@@ -87,27 +448,146 @@ def start_process():
     Exceptions:
         - Exits the program if an unexpected error occurs.
     """
+    args = parse_arguments(argv)
     try:
-        # Set up the logger from the configuration file
-        logger = setup_logger('Config/logger/loggers.ini')
-        logger.info("Starting case details export process...")
+        # Define necessary parameters
+        incident_ids = args.incident_id
+        case_filter = parse_case_filter(args.case_filter) if args.case_filter is not None else None
+        single_export = case_filter is None and len(incident_ids) == 1
+        metrics = ExportMetrics(incident_ids[0] if single_export else None)
 
         # Load configuration settings
-        config = load_config('Config/Config.ini')
+        with metrics.stage("config_load"):
+            config = load_config('Config/Config.ini')
+
+        # Set up the logger from the configuration file, writing to the OS-specific log path;
+        # it configures the module-level logger, which also reports errors raised before this point
+        setup_logger('Config/logger/loggers.ini', get_os_path(config, 'LOG_FILE_PATHS', 'LOG'))
+        logger.info("Starting case details export process...")
 
         # Connect to MongoDB database
-        db = connect_db(config['DATABASE']['MONGO_URI'], config['DATABASE']['DB_NAME'])
+        with metrics.stage("connect"):
+            listeners = monitoring_listeners(config)
+            db = connect_db(config['DATABASE']['MONGO_URI'], config['DATABASE']['DB_NAME'], listeners)
+
+        # Limit the load the export puts on the database, for every export thread
+        install_throttle(build_throttle(config, args.max_qps))
+
+        # The snapshot refresh writes, so it runs on the primary instead of exporting
+        snapshot_options = snapshot_settings(config)
+        if args.refresh_snapshots or args.rebuild_snapshots:
+            refresh_snapshots(db, full=args.rebuild_snapshots, **snapshot_options)
+            return
+
+        # Serve the export's reads from the configured members; coordination stays on the primary
+        export_db, snapshot_reads = read_settings(db, config)
 
         # Load styling configurations for the Excel export
-        styles = load_styles('Config/styles.ini')
+        with metrics.stage("styles_load"):
+            styles = load_styles('Config/styles.ini')
 
-        # Define necessary parameters
-        incident_id = 2025  # Replace with the actual incident ID
         export_path = config['EXCEL_EXPORT_FOLDER']['WIN_DB']
         collection_name = config['COLLECTIONS']['CASE_DETAIL_COLLECTION']
 
-        # Call function to export case details into an Excel file
-        export_all_tables(db, incident_id, export_path, collection_name, styles)
+        # Memory budget, render path and spill limits of each export
+        export_options = export_settings(config, args.render_mode, args.deadline)
+        export_options["snapshot_reads"] = snapshot_reads
+        export_options["preview_rows"] = args.preview
+        if config.getboolean('SNAPSHOTS', 'READ_EXPORTS', fallback=False):
+            export_options["snapshot_collection"] = snapshot_options["snapshot_collection"]
+
+        # Portfolio reports group every assigned case on the server and are not checkpointed
+        if args.portfolio:
+            export_portfolio(
+                export_db, collection_name, args.portfolio, export_path, styles, case_filter,
+                snapshot_options["collections"], max_sheet_rows=export_options["max_sheet_rows"],
+                max_rows_per_file=export_options["max_rows_per_file"],
+                deadline_seconds=export_options["deadline_seconds"]
+            )
+            return
+
+        # Size the run from counts only; nothing is fetched, rendered or checkpointed
+        if args.dry_run:
+            query = case_filter if case_filter is not None else {"incident_id": {"$in": incident_ids}}
+            report = estimate_run(
+                export_db, collection_name, query, load_calibration(get_os_path(config, 'METRICS', 'PROMETHEUS_TEXTFILE')),
+                export_options, snapshot_options["collections"], args.workers
+            )
+            if case_filter is None and report["cases"] < len(set(incident_ids)):
+                logger.warning(f"Only {report['cases']} of {len(set(incident_ids))} incident IDs have case details.")
+            logger.info(format_report(report))
+            return
+
+        profile_settings = None
+        if args.profile:
+            profile_dir = args.profile_dir or get_os_path(config, 'PROFILING', 'OUTPUT', 'profiles')
+            profile_settings = ProfileSettings(profile_dir, args.profile_top, args.profile_sample)
+
+        # Bulk runs record their progress so that --resume can continue them;
+        # distributed runs keep theirs in the lease documents instead
+        checkpoint = None
+        if not single_export and not args.distributed:
+            checkpoint = open_checkpoint(
+                config, db, run_key(collection_name, None if case_filter is not None else incident_ids, case_filter)
+            )
+            if args.resume:
+                logger.info(f"Resuming run {checkpoint.run_id}: {checkpoint.counts()}")
+            else:
+                checkpoint.reset()
+
+        aggregator = MetricsAggregator()
+        try:
+            if case_filter is not None:
+                logger.info(f"Setup timings: {metrics.summary()['stages']}")
+                if args.distributed:
+                    lease_collection = config.get('COLLECTIONS', 'EXPORT_LEASES_COLLECTION', fallback=DEFAULT_LEASE_COLLECTION)
+                    report, aggregator = export_distributed(
+                        export_db, args.distributed, case_filter, export_path, collection_name, styles,
+                        args.workers, args.shard_size, args.lease_ttl, lease_collection,
+                        aggregator, profile_settings,
+                        config.getint('CHECKPOINT', 'MAX_ATTEMPTS', fallback=DEFAULT_MAX_ATTEMPTS), **export_options
+                    )
+                else:
+                    report, aggregator = export_filtered(
+                        export_db, case_filter, export_path, collection_name, styles,
+                        args.workers, args.shard_size, aggregator, profile_settings, checkpoint, **export_options
+                    )
+                if report["failed"]:
+                    logger.error(f"Export failed for Incident ID(s): {report['failed_incident_ids']}")
+                    sys.exit(1)
+                # Distributed runs also report the shards they gave up
+                if report.get("failed_shards"):
+                    sys.exit(1)
+            elif single_export:
+                # Call function to export case details into an Excel file
+                profiler = profile_settings.profiler_for(incident_ids[0]) if profile_settings else None
+                try:
+                    export_all_tables(
+                        export_db, incident_ids[0], export_path, collection_name, styles, metrics, profiler,
+                        **export_options
+                    )
+                finally:
+                    aggregator.add(metrics.summary())
+            else:
+                logger.info(f"Setup timings: {metrics.summary()['stages']}")
+                results, aggregator = export_batch(
+                    export_db, incident_ids, export_path, collection_name, styles,
+                    args.workers, aggregator, profile_settings, checkpoint, **export_options
+                )
+                failed = [result["incident_id"] for result in results if result["status"] == "failed"]
+                if failed:
+                    logger.error(f"Export failed for Incident ID(s): {failed}")
+                    sys.exit(1)
+        finally:
+            if checkpoint is not None:
+                checkpoint.close()
+            # Query counts and time per collection of the whole run
+            if listeners:
+                logger.info(query_report(aggregator.summary()["queries"]))
+            # Publish the run for node_exporter's textfile collector, failed runs included
+            textfile_path = get_os_path(config, 'METRICS', 'PROMETHEUS_TEXTFILE')
+            if textfile_path:
+                aggregator.write_prometheus(textfile_path)
 
         # Log successful completion of the process
         logger.info("Case details export process completed.")
@@ -115,4 +595,4 @@ def start_process():
     except Exception as failed_process:
         # Log any unexpected errors and exit the program
         logger.error(f"An unexpected error occurred: {failed_process}")
-        sys.exit(1)
\ No newline at end of file
+        sys.exit(1)
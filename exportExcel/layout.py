@@ -0,0 +1,85 @@
+import logging  # Module for logging errors and debug information
+from concurrent.futures import ThreadPoolExecutor  # Worker pool preparing the row blocks
+from contextvars import copy_context
+from .data_fetcher import in_read_session
+from .metrics import timed
+from .profiling import current_profiler
+from .table_specs import handle_table_error, table_rows, unavailable_spec
+
+# Initialize logger for this module
+logger = logging.getLogger('excel_data_writer')
+
+# Threads preparing the tables of one export
+DEFAULT_PREPARE_WORKERS = 4
+
+# Blank rows between two tables of the Case Details sheet
+TABLE_GAP_ROWS = 2
+
+
+def _prepare(spec, policies=None):
+    """
+    Build the rows of one table, timed under the table's stage.
+
+    A table whose rows cannot be built fails the export or, under the 'degrade'
+    policy, is replaced by its unavailable_spec() notice.
+    """
+    with timed(spec["name"]):
+        try:
+            rows = spec["rows"]()
+            return spec, rows if isinstance(rows, list) else list(rows)
+        except Exception as failed_rows:
+            handle_table_error(spec, failed_rows, policies)
+            spec = unavailable_spec(spec, failed_rows)
+            return spec, spec["rows"]()
+
+
+def prepare_tables(specs, workers=DEFAULT_PREPARE_WORKERS, policies=None):
+    """
+    Fetch and build the rows of every table, in parallel when `workers` allows.
+
+    The tables are independent, so their queries and value conversion can overlap;
+    most of the gain is the round trips to MongoDB, which release the GIL. Each task
+    runs in a copy of the caller's context, so its queries and stages are recorded
+    for the running export. Profiled exports and exports reading from a snapshot
+    session prepare the tables one by one: cProfile and client sessions must stay
+    on a single thread.
+
+    Args:
+        specs (list): Table specs from case_table_specs().
+        workers (int): Threads preparing tables at once; 1 prepares them in the calling thread.
+        policies (dict, optional): Error policy by table stage name; see errors.table_policy().
+
+    Returns:
+        list: (spec, rows) pairs in sheet order, without the empty optional tables.
+
+    Exceptions:
+        - Raises TableError for a table that cannot be built under the 'fail' policy.
+    """
+    if workers > 1 and (current_profiler() is not None or in_read_session()):
+        workers = 1
+    if workers <= 1 or len(specs) <= 1:
+        blocks = [_prepare(spec, policies) for spec in specs]
+    else:
+        with ThreadPoolExecutor(max_workers=min(workers, len(specs)), thread_name_prefix="prepare") as executor:
+            futures = [executor.submit(copy_context().run, _prepare, spec, policies) for spec in specs]
+            blocks = [future.result() for future in futures]
+    return [(spec, rows) for spec, rows in blocks if rows or not spec["optional"]]
+
+
+def plan_layout(tables, first_row=1):
+    """
+    Place the prepared tables on the sheet: each starts two blank rows below the previous one.
+
+    Args:
+        tables (list): (spec, rows) pairs from prepare_tables().
+        first_row (int): Row of the first table's main header.
+
+    Returns:
+        list: (spec, rows, start_row) triples in sheet order.
+    """
+    plan = []
+    row = first_row
+    for spec, rows in tables:
+        plan.append((spec, rows, row))
+        row += table_rows(spec, len(rows)) + TABLE_GAP_ROWS
+    return plan
@@ -0,0 +1,351 @@
+import logging  # Module for logging errors and debug information
+import os  # Module for the process ID in node names
+import socket  # Module for the host name in node names
+import threading  # Background heartbeat thread
+import uuid  # Module for unique node names
+from datetime import datetime, timedelta, timezone
+from .checkpoint import DEFAULT_MAX_ATTEMPTS
+from .sharding import DEFAULT_SHARD_SIZE, shard_filter
+
+# Initialize logger for this module
+logger = logging.getLogger('excel_data_writer')
+
+# Collection holding the run and lease documents when none is configured
+DEFAULT_LEASE_COLLECTION = "Export_leases"
+
+# Seconds a lease stays valid without a heartbeat
+DEFAULT_LEASE_TTL = 60.0
+
+
+def _now():
+    """
+    Current UTC time; lease expiry assumes the hosts' clocks are kept in sync (e.g. NTP).
+    """
+    return datetime.now(timezone.utc)
+
+
+def default_node_id():
+    """
+    Return a name for this exporter process that is unique across hosts and restarts.
+    """
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class LeaseCoordinator:
+    """
+    Splits one filtered bulk export between exporter processes on any number of hosts.
+
+    All processes of a run share a run document and one lease document per _id-range
+    shard in the lease collection:
+
+    - A shard is claimed by inserting its lease document '<run_id>:<index>'; the unique
+      _id makes the insert atomic, so every shard has exactly one first owner. The run
+      document only caches the next shard's lower bound and is repaired by whichever
+      node finds it behind.
+    - Owners record the last exported _id after every case, and a heartbeat extends
+      the leases that recorded progress within the last `stall_timeout` seconds. A lease
+      whose heartbeat stops (crashed node) or whose progress stalls (hung node) expires
+      and is taken over by another node, which continues after the recorded _id.
+    - An owner that finds its lease taken over stops working on that shard, so at most
+      the case in flight at expiry is exported twice.
+    - A shard is leased at most `max_attempts` times. A shard that keeps killing its
+      owners is then given up and reported as failed, so the run still finishes.
+    """
+
+    def __init__(self, db, run_id, collection_name, query, shard_size=DEFAULT_SHARD_SIZE,
+                 lease_ttl=DEFAULT_LEASE_TTL, lease_collection=DEFAULT_LEASE_COLLECTION, node_id=None,
+                 stall_timeout=None, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        """
+        Args:
+            db (pymongo.database.Database): The MongoDB database instance.
+            run_id (str): Name of the run, identical on every participating host.
+            collection_name (str): The case details collection name.
+            query (dict): Filter on the case collection.
+            shard_size (int): Maximum number of cases per shard; the run's first node decides.
+            lease_ttl (float): Seconds a lease stays valid without a heartbeat.
+            lease_collection (str): Collection holding the run and lease documents.
+            node_id (str, optional): Name of this process; see default_node_id().
+            stall_timeout (float, optional): Seconds without progress after which a lease is no
+                longer extended; `lease_ttl` if omitted. Must cover the longest export of one case.
+            max_attempts (int): Leases of a shard, takeovers included, before it is given up.
+        """
+        from pymongo import ReadPreference
+
+        self.db = db
+        self.run_id = run_id
+        self.collection_name = collection_name
+        self.cases = db[collection_name]
+        # Lease state is read where it is written, whatever the export's read preference
+        self.leases = db[lease_collection].with_options(read_preference=ReadPreference.PRIMARY)
+        self.query = query
+        self.shard_size = shard_size
+        self.lease_ttl = lease_ttl
+        self.stall_timeout = stall_timeout or lease_ttl
+        self.max_attempts = max_attempts
+        self.node_id = node_id or default_node_id()
+        self.poll_interval = max(lease_ttl / 4, 0.1)
+        self._heartbeat_stop = threading.Event()
+        self._heartbeat_thread = None
+
+    def _key(self, suffix):
+        return f"{self.run_id}:{suffix}"
+
+    def _expiry(self):
+        return _now() + timedelta(seconds=self.lease_ttl)
+
+    def join(self):
+        """
+        Create the run document, or join the existing run, and start the heartbeat.
+
+        Exceptions:
+            - Raises ValueError if the run exists with a different collection or filter.
+        """
+        from bson import json_util  # Canonical form of the filter, shipped with pymongo
+        from pymongo.errors import DuplicateKeyError
+
+        query_json = json_util.dumps(self.query, sort_keys=True)
+        try:
+            self.leases.insert_one({
+                "_id": self._key("run"), "kind": "run", "run_id": self.run_id,
+                "collection": self.collection_name, "query": query_json, "shard_size": self.shard_size,
+                "next_index": 0, "next_lower": None, "cut_complete": False, "created_at": _now(),
+            })
+            logger.info(f"Started distributed run {self.run_id} as node {self.node_id}.")
+        except DuplicateKeyError:
+            run = self.leases.find_one({"_id": self._key("run")})
+            if run["collection"] != self.collection_name or run["query"] != query_json:
+                raise ValueError(f"Run {self.run_id} already exists with a different collection or filter.")
+            self.shard_size = run["shard_size"]
+            logger.info(f"Joined distributed run {self.run_id} as node {self.node_id}.")
+
+        self._heartbeat_stop.clear()
+        self._heartbeat_thread = threading.Thread(
+            target=self._heartbeat, name=f"lease-heartbeat-{self.run_id}", daemon=True
+        )
+        self._heartbeat_thread.start()
+
+    def close(self):
+        """
+        Stop the heartbeat and release this node's unfinished leases for immediate takeover.
+        """
+        self._heartbeat_stop.set()
+        if self._heartbeat_thread is not None:
+            self._heartbeat_thread.join()
+            self._heartbeat_thread = None
+        self.leases.update_many(
+            {"kind": "lease", "run_id": self.run_id, "owner": self.node_id, "status": "leased"},
+            {"$set": {"expires_at": _now()}}
+        )
+
+    def _heartbeat(self):
+        """
+        Extend this node's leases every third of the lease TTL until close() is called.
+        """
+        while not self._heartbeat_stop.wait(self.lease_ttl / 3):
+            try:
+                self.renew()
+            except Exception as failed_heartbeat:
+                logger.error(f"Lease heartbeat failed for node {self.node_id}: {failed_heartbeat}")
+
+    def renew(self):
+        """
+        Extend this node's leases that recorded progress within the last `stall_timeout` seconds.
+
+        A lease stuck on one case is left to expire, so that another node can take it over.
+
+        Returns:
+            int: The number of leases extended.
+        """
+        now = _now()
+        return self.leases.update_many(
+            {"kind": "lease", "run_id": self.run_id, "owner": self.node_id, "status": "leased",
+             "progress_at": {"$gte": now - timedelta(seconds=self.stall_timeout)}},
+            {"$set": {"expires_at": self._expiry()}}
+        ).matched_count
+
+    def claim(self):
+        """
+        Take over an expired lease, or cut and lease the next shard.
+
+        Returns:
+            dict: The claimed lease document, or None if no work is available right now.
+        """
+        lease = self._reclaim_expired()
+        if lease is None:
+            lease = self._cut_next()
+        return lease
+
+    def _reclaim_expired(self):
+        """
+        Take over one expired lease, after giving up the expired leases that used all their attempts.
+        """
+        from pymongo import ReturnDocument
+
+        now = _now()
+        expired = {"kind": "lease", "run_id": self.run_id, "status": "leased", "expires_at": {"$lt": now}}
+        given_up = self.leases.update_many(
+            dict(expired, attempts={"$gte": self.max_attempts}),
+            {"$set": {"status": "failed", "finished_at": now}}
+        )
+        if given_up.modified_count:
+            logger.error(
+                f"Gave up {given_up.modified_count} shard(s) of run {self.run_id} "
+                f"after {self.max_attempts} attempts each."
+            )
+
+        lease = self.leases.find_one_and_update(
+            dict(expired, attempts={"$lt": self.max_attempts}),
+            {"$set": {"owner": self.node_id, "expires_at": self._expiry(), "progress_at": now},
+             "$inc": {"attempts": 1}},
+            return_document=ReturnDocument.BEFORE
+        )
+        if lease is None:
+            return None
+        logger.warning(
+            f"Node {self.node_id} reclaimed shard {lease['index']} of run {self.run_id} from {lease['owner']} "
+            f"(attempt {lease['attempts'] + 1} of {self.max_attempts})."
+        )
+        lease.update(owner=self.node_id, attempts=lease["attempts"] + 1, progress_at=now)
+        return lease
+
+    def _cut_next(self):
+        """
+        Cut the next _id range after the run's last shard and lease it to this node.
+        """
+        from pymongo.errors import DuplicateKeyError
+
+        while True:
+            run = self.leases.find_one({"_id": self._key("run")})
+            if run["cut_complete"]:
+                return None
+
+            index, lower = run["next_index"], run["next_lower"]
+            remaining = shard_filter(self.query, lower)
+            boundary = list(
+                self.cases.find(remaining, {"_id": 1}).sort("_id", 1).skip(self.shard_size - 1).limit(1)
+            )
+            if boundary:
+                upper, last = boundary[0]["_id"], False
+            elif self.cases.find_one(remaining, {"_id": 1}) is not None:
+                upper, last = None, True
+            else:
+                # Nothing left after the previous shard
+                self.leases.update_one(
+                    {"_id": self._key("run"), "next_index": index}, {"$set": {"cut_complete": True}}
+                )
+                continue
+
+            lease = {
+                "_id": self._key(index), "kind": "lease", "run_id": self.run_id, "index": index,
+                "lower": lower, "upper": upper, "last": last, "status": "leased",
+                "owner": self.node_id, "expires_at": self._expiry(), "progress_at": _now(), "attempts": 1,
+                "last_id": None, "exported": 0, "failed_incident_ids": [], "created_at": _now(),
+            }
+            try:
+                self.leases.insert_one(lease)
+            except DuplicateKeyError:
+                # Another node leased this shard first; bring the run document up to date with it
+                lease = self.leases.find_one({"_id": self._key(index)})
+                self._advance_run(index, lease["upper"], lease["last"])
+                continue
+            self._advance_run(index, upper, last)
+            logger.debug("Node %s leased shard %d of run %s.", self.node_id, index, self.run_id)
+            return lease
+
+    def _advance_run(self, index, upper, last):
+        """
+        Move the run document past shard `index`, unless another node already did.
+        """
+        self.leases.update_one(
+            {"_id": self._key("run"), "next_index": index},
+            {"$set": {"next_lower": upper, "cut_complete": last}, "$inc": {"next_index": 1}}
+        )
+
+    def iter_cases(self, lease, batch_size=DEFAULT_SHARD_SIZE):
+        """
+        Stream the _id and incident_id of the lease's cases that are not exported yet.
+
+        Args:
+            lease (dict): A lease from claim().
+            batch_size (int): Number of cases fetched per round trip.
+
+        Returns:
+            iterator: Case documents with '_id' and 'incident_id', in _id order.
+        """
+        lower = lease["last_id"] if lease["last_id"] is not None else lease["lower"]
+        return self.cases.find(
+            shard_filter(self.query, lower, lease["upper"]), {"_id": 1, "incident_id": 1}
+        ).sort("_id", 1).batch_size(batch_size)
+
+    def record_progress(self, lease, case, succeeded):
+        """
+        Record one exported case on the lease and extend it.
+
+        Args:
+            lease (dict): A lease from claim().
+            case (dict): The case from iter_cases().
+            succeeded (bool): Whether the export succeeded.
+
+        Returns:
+            bool: False if the lease has been taken over and this node must stop working on it.
+        """
+        update = {"$set": {"last_id": case["_id"], "expires_at": self._expiry(), "progress_at": _now()}}
+        if succeeded:
+            update["$inc"] = {"exported": 1}
+        else:
+            update["$push"] = {"failed_incident_ids": case.get("incident_id")}
+        result = self.leases.update_one(
+            {"_id": lease["_id"], "owner": self.node_id, "status": "leased"}, update
+        )
+        return result.matched_count == 1
+
+    def complete(self, lease):
+        """
+        Mark the lease's shard as done.
+
+        Returns:
+            bool: False if the lease had been taken over.
+        """
+        result = self.leases.update_one(
+            {"_id": lease["_id"], "owner": self.node_id, "status": "leased"},
+            {"$set": {"status": "done", "finished_at": _now()}}
+        )
+        return result.matched_count == 1
+
+    def finished(self):
+        """
+        Return True once every shard of the run has been cut and completed or given up.
+        """
+        run = self.leases.find_one({"_id": self._key("run")})
+        if not run["cut_complete"]:
+            return False
+        return self.leases.count_documents(
+            {"kind": "lease", "run_id": self.run_id, "status": {"$nin": ["done", "failed"]}}
+        ) == 0
+
+    def report(self):
+        """
+        Summarise the run over all nodes.
+
+        Returns:
+            dict: shards, exported, failed and failed_incident_ids of the completed and given-up
+            shards, and failed_shards, the index and unexported _id range (last_id, upper]
+            of every shard given up after `max_attempts`.
+        """
+        report = {"shards": 0, "exported": 0, "failed": 0, "failed_incident_ids": [], "failed_shards": []}
+        for lease in self.leases.find(
+            {"kind": "lease", "run_id": self.run_id, "status": {"$in": ["done", "failed"]}},
+            {"index": 1, "status": 1, "lower": 1, "upper": 1, "last_id": 1, "exported": 1, "failed_incident_ids": 1}
+        ):
+            report["shards"] += 1
+            report["exported"] += lease["exported"]
+            report["failed"] += len(lease["failed_incident_ids"])
+            report["failed_incident_ids"].extend(lease["failed_incident_ids"])
+            if lease["status"] == "failed":
+                report["failed_shards"].append({
+                    "index": lease["index"],
+                    "last_id": lease["last_id"] if lease["last_id"] is not None else lease["lower"],
+                    "upper": lease["upper"],
+                })
+        report["failed_shards"].sort(key=lambda shard: shard["index"])
+        return report
@@ -0,0 +1,174 @@
+import logging  # Module for logging errors and debug information
+import os  # Module for reading the resident set size on Linux
+import sys  # Module for platform checks of the RSS units
+import threading  # Serialises the process-wide memory tracing of concurrent exports
+from contextlib import contextmanager
+from .table_specs import table_cells, table_rows
+from .stream_writer import EXCEL_MAX_ROWS
+
+# Initialize logger for this module
+logger = logging.getLogger('excel_data_writer')
+
+# Memory held per styled cell of an in-memory openpyxl worksheet, measured with
+# tracemalloc (~370 bytes) and rounded up for the row/column bookkeeping.
+BYTES_PER_CELL = 400
+
+# Render modes accepted by choose_render_mode()
+RENDER_MODES = ("auto", "memory", "streaming")
+
+# Exports inside track_memory() and whether the running trace saw more than one of them
+_tracking_lock = threading.Lock()
+_tracking = {"exports": 0, "shared": False}
+
+
+def estimate_export_size(specs):
+    """
+    Estimate the size of an export from row counts, before any row is fetched.
+
+    Embedded arrays are measured on the case document already in hand; rows held in
+    other collections are counted on the server (count_documents, $size projections).
+
+    Args:
+        specs (list): Table specs from case_table_specs().
+
+    Returns:
+        dict: rows, cells and bytes of the whole export, the rows of the stacked
+        Case Details layout (sheet_rows), plus rows and cells per table title.
+    """
+    tables = {}
+    for spec in specs:
+        rows = spec["count"]()
+        if spec["optional"] and not rows:
+            continue
+        tables[spec["title"]] = {"rows": rows, "cells": table_cells(spec, rows), "sheet_rows": table_rows(spec, rows)}
+
+    cells = sum(table["cells"] for table in tables.values())
+    # Two blank rows between consecutive tables
+    sheet_rows = sum(table["sheet_rows"] for table in tables.values()) + 2 * max(len(tables) - 1, 0)
+    return {
+        "rows": sum(table["rows"] for table in tables.values()),
+        "sheet_rows": sheet_rows,
+        "cells": cells,
+        "bytes": cells * BYTES_PER_CELL,
+        "tables": tables,
+    }
+
+
+def choose_render_mode(estimate, memory_budget_bytes=None, render_mode="auto", max_sheet_rows=EXCEL_MAX_ROWS):
+    """
+    Pick the in-memory or the streaming render path for an export.
+
+    Only the streaming path can spill onto further sheets and files, so an export
+    whose layout does not fit in `max_sheet_rows` is always streamed.
+
+    Args:
+        estimate (dict): Result of estimate_export_size().
+        memory_budget_bytes (int, optional): Largest estimated in-memory workbook; no limit if omitted.
+        render_mode (str): 'auto' to decide from the budget, or 'memory'/'streaming' to force a path.
+        max_sheet_rows (int): Rows that fit on one sheet (or in one file, if that is smaller).
+
+    Returns:
+        str: 'memory' or 'streaming'.
+
+    Exceptions:
+        - Raises ValueError for an unknown render mode.
+    """
+    if render_mode not in RENDER_MODES:
+        raise ValueError(f"Unknown render mode: {render_mode!r}; expected one of {RENDER_MODES}")
+    if estimate["sheet_rows"] > max_sheet_rows:
+        if render_mode == "memory":
+            logger.warning(f"{estimate['sheet_rows']} rows do not fit on one sheet; streaming instead of rendering in memory.")
+        return "streaming"
+    if render_mode != "auto":
+        return render_mode
+    if memory_budget_bytes and estimate["bytes"] > memory_budget_bytes:
+        return "streaming"
+    return "memory"
+
+
+def peak_rss_bytes():
+    """
+    Return the process's peak resident set size in bytes, or None if it cannot be read.
+
+    This is the high-water mark over the whole life of the process, not of one export.
+    Uses getrusage() where available and falls back to psutil (e.g. on Windows).
+    """
+    try:
+        import resource  # Unix only
+    except ImportError:
+        resource = None
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+        return peak if sys.platform == "darwin" else peak * 1024
+
+    try:
+        import psutil  # Optional dependency
+    except ImportError:
+        return None
+    memory = psutil.Process().memory_info()
+    return getattr(memory, "peak_wset", memory.rss)
+
+
+def current_rss_bytes():
+    """
+    Return the process's current resident set size in bytes, or None if it cannot be read.
+
+    Reads /proc/self/statm on Linux and falls back to psutil elsewhere.
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil  # Optional dependency
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().rss
+
+
+@contextmanager
+def track_memory(metrics, trace=False):
+    """
+    Record the memory used by the enclosed block in `metrics.info`.
+
+    'rss_growth_bytes' is the change of the resident set size over the block and
+    'process_peak_rss_bytes' the process's high-water mark so far, which in a batch
+    stays at the largest export seen. Both are process-wide, so concurrent exports
+    add to each other's growth.
+
+    With `trace`, 'peak_traced_bytes' is the tracemalloc peak of the block. tracemalloc
+    is process-wide too, so the block is only traced while it is the only export
+    in track_memory(); if another export starts during the trace, or tracemalloc is
+    already running (e.g. under the profiler), no traced peak is recorded.
+
+    Args:
+        metrics (ExportMetrics): Collector of the running export.
+        trace (bool): Measure the block's Python allocations with tracemalloc.
+    """
+    import tracemalloc  # Standard library; only started when tracing
+
+    traced = False
+    with _tracking_lock:
+        _tracking["exports"] += 1
+        if _tracking["exports"] > 1:
+            _tracking["shared"] = True
+        elif trace and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracking["shared"] = False
+            traced = True
+    rss_before = current_rss_bytes()
+    try:
+        yield
+    finally:
+        rss_after = current_rss_bytes()
+        with _tracking_lock:
+            _tracking["exports"] -= 1
+            if traced:
+                if not _tracking["shared"]:
+                    metrics.info["peak_traced_bytes"] = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+        if rss_before is not None and rss_after is not None:
+            metrics.info["rss_growth_bytes"] = rss_after - rss_before
+        metrics.info["process_peak_rss_bytes"] = peak_rss_bytes()
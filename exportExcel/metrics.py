@@ -0,0 +1,360 @@
+import logging  # Module for logging errors and debug information
+import os  # Module for interacting with the operating system
+import threading  # Module for guarding shared counters between worker threads
+import time  # Module for wall-clock timing
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Initialize logger for this module
+logger = logging.getLogger('excel_data_writer')
+
+# Upper bounds (seconds) of the histogram buckets used for batch aggregation
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Slow queries kept with the details of their command, per export
+MAX_SLOW_QUERIES = 20
+
+# Metrics object of the export running in the current thread or context
+_current_metrics = ContextVar("export_metrics", default=None)
+
+
+class ExportMetrics:
+    """
+    Collects stage wall times and per-table row and cell counts for a single export.
+
+    Stages may repeat (for example one query per money transaction), so every stage
+    keeps a call count next to its accumulated seconds.
+    """
+
+    def __init__(self, incident_id=None):
+        self.incident_id = incident_id
+        self.status = "running"
+        self.stages = {}  # stage name -> [count, seconds]
+        self.tables = {}  # table name -> {"rows": int, "cells": int}
+        self.info = {}  # free-form facts about the export (output path, render mode, ...)
+        self.queries = {}  # "<collection>.<command>" -> server-side totals, see add_query()
+        self.slow_queries = []  # details of the first MAX_SLOW_QUERIES slow queries
+        self._started = time.perf_counter()
+        self._total_seconds = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Time the enclosed block and add it to the named stage.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage(name, time.perf_counter() - start)
+
+    def add_stage(self, name, seconds):
+        with self._lock:
+            entry = self.stages.setdefault(name, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    def add_table(self, name, rows, cells):
+        with self._lock:
+            entry = self.tables.setdefault(name, {"rows": 0, "cells": 0})
+            entry["rows"] += rows
+            entry["cells"] += cells
+
+    def add_query(self, name, seconds, documents, reply_bytes, slow=None):
+        """
+        Add one MongoDB command reported by the command listener.
+
+        Args:
+            name (str): "<collection>.<command>", e.g. "Case_payments.find".
+            seconds (float): Server round trip of the command.
+            documents (int): Documents returned.
+            reply_bytes (int): Size of the reply.
+            slow (dict, optional): Details of the command if it was over the slow-query threshold.
+        """
+        with self._lock:
+            entry = self.queries.setdefault(
+                name, {"count": 0, "seconds": 0.0, "documents": 0, "reply_bytes": 0, "slow": 0}
+            )
+            entry["count"] += 1
+            entry["seconds"] += seconds
+            entry["documents"] += documents
+            entry["reply_bytes"] += reply_bytes
+            if slow is not None:
+                entry["slow"] += 1
+                if len(self.slow_queries) < MAX_SLOW_QUERIES:
+                    self.slow_queries.append(slow)
+
+    def finish(self, status="ok"):
+        """
+        Freeze the total export time and record the final status.
+        """
+        self.status = status
+        self._total_seconds = time.perf_counter() - self._started
+
+    @property
+    def total_seconds(self):
+        if self._total_seconds is not None:
+            return self._total_seconds
+        return time.perf_counter() - self._started
+
+    def summary(self):
+        """
+        Return the structured per-export summary.
+
+        Returns:
+            dict: Status, total time, throughput, stage timings and table sizes.
+        """
+        with self._lock:
+            total = self.total_seconds
+            rows = sum(table["rows"] for table in self.tables.values())
+            cells = sum(table["cells"] for table in self.tables.values())
+            return {
+                "incident_id": self.incident_id,
+                "status": self.status,
+                "total_seconds": round(total, 6),
+                "rows": rows,
+                "cells": cells,
+                "rows_per_second": round(rows / total, 1) if total > 0 else 0.0,
+                "cells_per_second": round(cells / total, 1) if total > 0 else 0.0,
+                "stages": {
+                    name: {"count": count, "seconds": round(seconds, 6)}
+                    for name, (count, seconds) in self.stages.items()
+                },
+                "tables": {name: dict(table) for name, table in self.tables.items()},
+                "queries": {
+                    name: dict(query, seconds=round(query["seconds"], 6)) for name, query in self.queries.items()
+                },
+                "slow_queries": list(self.slow_queries),
+                **self.info
+            }
+
+
+@contextmanager
+def activate(metrics):
+    """
+    Make `metrics` the collector used by timed() and record_table() in the enclosed block.
+    """
+    token = _current_metrics.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current_metrics.reset(token)
+
+
+def current_metrics():
+    """
+    Return the ExportMetrics of the running export, or None outside of an export.
+    """
+    return _current_metrics.get()
+
+
+@contextmanager
+def timed(name):
+    """
+    Time the enclosed block as stage `name` of the running export (no-op if none).
+    """
+    metrics = _current_metrics.get()
+    if metrics is None:
+        yield
+        return
+    with metrics.stage(name):
+        yield
+
+
+def record_table(name, rows, cells):
+    """
+    Record the data rows and cells written for a table of the running export (no-op if none).
+    """
+    metrics = _current_metrics.get()
+    if metrics is not None:
+        metrics.add_table(name, rows, cells)
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram in the Prometheus layout.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for index, upper_bound in enumerate(self.buckets):
+            if value <= upper_bound:
+                self.counts[index] += 1
+
+    def quantile(self, q):
+        """
+        Estimate a quantile as the upper bound of the bucket that contains it.
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        for upper_bound, cumulative in zip(self.buckets, self.counts):
+            if cumulative >= rank:
+                return upper_bound
+        return float("inf")
+
+    def to_dict(self, include_buckets=False):
+        histogram = {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99)
+        }
+        if include_buckets:
+            histogram["buckets"] = dict(zip(self.buckets, self.counts))
+        return histogram
+
+
+class MetricsAggregator:
+    """
+    Aggregates per-export summaries of a batch run into histograms and counters.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.exports = {}  # status -> count
+        self.duration = Histogram(self.buckets)
+        self.stages = {}  # stage name -> Histogram of per-export seconds
+        self.table_rows = {}  # table name -> total rows
+        self.table_cells = {}  # table name -> total cells
+        self.output_bytes = 0  # size of the written xlsx files
+        self.queries = {}  # "<collection>.<command>" -> totals over all exports
+        self._lock = threading.Lock()
+
+    def add(self, summary):
+        """
+        Add one per-export summary as returned by ExportMetrics.summary().
+        """
+        with self._lock:
+            status = summary.get("status", "ok")
+            self.exports[status] = self.exports.get(status, 0) + 1
+            self.duration.observe(summary.get("total_seconds", 0.0))
+            for name, stage in summary.get("stages", {}).items():
+                self.stages.setdefault(name, Histogram(self.buckets)).observe(stage["seconds"])
+            for name, table in summary.get("tables", {}).items():
+                self.table_rows[name] = self.table_rows.get(name, 0) + table["rows"]
+                self.table_cells[name] = self.table_cells.get(name, 0) + table["cells"]
+            self.output_bytes += summary.get("output_bytes") or 0
+            for name, query in (summary.get("queries") or {}).items():
+                totals = self.queries.setdefault(name, {"count": 0, "seconds": 0.0, "documents": 0,
+                                                        "reply_bytes": 0, "slow": 0, "exports": 0})
+                for key in ("count", "seconds", "documents", "reply_bytes", "slow"):
+                    totals[key] += query[key]
+                totals["exports"] += 1
+
+    def summary(self, include_buckets=False):
+        """
+        Return the aggregated batch summary as a dictionary.
+
+        Args:
+            include_buckets (bool): Also return the raw bucket counts of every histogram.
+        """
+        with self._lock:
+            return {
+                "exports": dict(self.exports),
+                "duration_seconds": self.duration.to_dict(include_buckets),
+                "stages": {name: histogram.to_dict(include_buckets) for name, histogram in self.stages.items()},
+                "table_rows": dict(self.table_rows),
+                "table_cells": dict(self.table_cells),
+                "output_bytes": self.output_bytes,
+                "queries": {name: dict(query, seconds=round(query["seconds"], 6))
+                            for name, query in self.queries.items()}
+            }
+
+    def to_prometheus(self):
+        """
+        Render the aggregated metrics in the Prometheus text exposition format.
+        """
+        with self._lock:
+            lines = []
+            lines.append("# HELP drs_exports_total Case exports by final status.")
+            lines.append("# TYPE drs_exports_total counter")
+            for status, count in sorted(self.exports.items()):
+                lines.append(f'drs_exports_total{{status="{_escape_label(status)}"}} {count}')
+
+            lines.append("# HELP drs_export_duration_seconds Wall time of a whole case export.")
+            lines.append("# TYPE drs_export_duration_seconds histogram")
+            lines.extend(_histogram_lines("drs_export_duration_seconds", "", self.duration))
+
+            lines.append("# HELP drs_export_stage_duration_seconds Wall time of each export stage.")
+            lines.append("# TYPE drs_export_stage_duration_seconds histogram")
+            for name, histogram in sorted(self.stages.items()):
+                labels = f'stage="{_escape_label(name)}"'
+                lines.extend(_histogram_lines("drs_export_stage_duration_seconds", labels, histogram))
+
+            lines.append("# HELP drs_export_table_rows_total Data rows written per table.")
+            lines.append("# TYPE drs_export_table_rows_total counter")
+            for name, rows in sorted(self.table_rows.items()):
+                lines.append(f'drs_export_table_rows_total{{table="{_escape_label(name)}"}} {rows}')
+
+            lines.append("# HELP drs_export_table_cells_total Cells written per table.")
+            lines.append("# TYPE drs_export_table_cells_total counter")
+            for name, cells in sorted(self.table_cells.items()):
+                lines.append(f'drs_export_table_cells_total{{table="{_escape_label(name)}"}} {cells}')
+
+            lines.append("# HELP drs_export_output_bytes_total Size of the written xlsx files.")
+            lines.append("# TYPE drs_export_output_bytes_total counter")
+            lines.append(f"drs_export_output_bytes_total {self.output_bytes}")
+
+            lines.append("# HELP drs_export_mongo_commands_total MongoDB commands issued by exports.")
+            lines.append("# TYPE drs_export_mongo_commands_total counter")
+            for name, query in sorted(self.queries.items()):
+                lines.append(f'drs_export_mongo_commands_total{{command="{_escape_label(name)}"}} {query["count"]}')
+            lines.append("# HELP drs_export_mongo_command_seconds_total Round-trip time of the MongoDB commands of exports.")
+            lines.append("# TYPE drs_export_mongo_command_seconds_total counter")
+            for name, query in sorted(self.queries.items()):
+                lines.append(f'drs_export_mongo_command_seconds_total{{command="{_escape_label(name)}"}} {query["seconds"]:.6f}')
+            lines.append("# HELP drs_export_mongo_slow_commands_total MongoDB commands of exports over the slow-query threshold.")
+            lines.append("# TYPE drs_export_mongo_slow_commands_total counter")
+            for name, query in sorted(self.queries.items()):
+                lines.append(f'drs_export_mongo_slow_commands_total{{command="{_escape_label(name)}"}} {query["slow"]}')
+
+            lines.append("# HELP drs_export_last_run_timestamp_seconds Time the metrics file was written.")
+            lines.append("# TYPE drs_export_last_run_timestamp_seconds gauge")
+            lines.append(f"drs_export_last_run_timestamp_seconds {time.time():.3f}")
+            return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, textfile_path):
+        """
+        Write the metrics to a node_exporter textfile collector file.
+
+        The file is written next to its final name and then renamed, so the
+        collector never reads a partially written file.
+
+        Args:
+            textfile_path (str): Target .prom file path.
+        """
+        try:
+            os.makedirs(os.path.dirname(textfile_path) or ".", exist_ok=True)
+            temp_path = f"{textfile_path}.{os.getpid()}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as textfile:
+                textfile.write(self.to_prometheus())
+            os.replace(temp_path, textfile_path)
+            logger.info(f"Export metrics written to {textfile_path}")
+        except Exception as failed_metrics_write:
+            logger.error(f"Failed to write export metrics: {failed_metrics_write}")
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _histogram_lines(metric_name, labels, histogram):
+    separator = "," if labels else ""
+    lines = []
+    for upper_bound, cumulative in zip(histogram.buckets, histogram.counts):
+        lines.append(f'{metric_name}_bucket{{{labels}{separator}le="{upper_bound}"}} {cumulative}')
+    lines.append(f'{metric_name}_bucket{{{labels}{separator}le="+Inf"}} {histogram.count}')
+    suffix = f"{{{labels}}}" if labels else ""
+    lines.append(f"{metric_name}_sum{suffix} {histogram.sum:.6f}")
+    lines.append(f"{metric_name}_count{suffix} {histogram.count}")
+    return lines
@@ -0,0 +1,307 @@
+import json  # Module for logging the report summary as one line
+import logging  # Module for logging errors and debug information
+import os  # Module for building the output file name
+from datetime import datetime
+from .data_fetcher import query_stage, query_time_limit, stream_cursor
+from .deadline import deadline_scope
+from .metrics import ExportMetrics, activate, timed
+from .profiling import phase
+from .snapshots import DEFAULT_COLLECTIONS
+from .stream_writer import EXCEL_MAX_ROWS, write_streaming_tables
+from .summary_table import excel_number
+from .table_specs import table_spec
+
+# Initialize logger for this module
+logger = logging.getLogger('excel_data_writer')
+
+# Portfolio reports, by the assignment they group the cases on
+PORTFOLIO_REPORTS = ("drc", "ro")
+
+# Documents fetched per round trip of the case rows
+DEFAULT_BATCH_SIZE = 1000
+
+# Key fields of one assignment, by report
+GROUP_KEYS = {
+    "drc": ("drc_id",),
+    "ro": ("ro_id", "drc_id"),
+}
+
+SHEET_TITLES = {
+    "drc": "DRC Portfolio",
+    "ro": "RO Portfolio",
+}
+
+TOTALS_HEADERS = [
+    "Cases", "Arrears Amount", "Cases with Settlement", "Settlement Amount", "Collected Amount"
+]
+
+CASE_HEADERS = [
+    "Case ID", "Incident ID", "Account No", "Case Status", "Assigned DTM", "Arrears Amount",
+    "Settlement Status", "Settlement Amount", "Collected Amount"
+]
+
+ASSIGNMENT_HEADERS = {
+    "drc": ["DRC ID", "DRC Name"],
+    "ro": ["RO ID", "DRC ID", "DRC Name"],
+}
+
+
+def assignment_pipeline(report, query=None, collections=None):
+    """
+    Pipeline turning case documents into one row per case and current assignment.
+
+    The `drc` array is unwound to the case's current DRC assignments, those without a
+    removed_dtm; for the RO report `drc.recovery_officers` is unwound and filtered the
+    same way. (The DRC and RO tables of a case export, drc_rows() and ro_rows(), list
+    removed assignments too.) Each row carries the case's arrears, the status of its
+    latest settlement by created_on, the settled amount and the amount collected by
+    its payments. The settlements and payments of a case are summed inside their
+    $lookup, so a case with many payments joins one small document instead of every
+    payment, and never reaches the 16 MB document limit.
+
+    Args:
+        report (str): 'drc' or 'ro'.
+        query (dict, optional): Filter on the case documents; every case if omitted.
+        collections (dict, optional): Source collection names by role; see snapshots.DEFAULT_COLLECTIONS.
+
+    Returns:
+        list: The aggregation pipeline.
+    """
+    collections = {**DEFAULT_COLLECTIONS, **(collections or {})}
+    pipeline = [
+        {"$match": dict(query or {})},
+        {"$project": {
+            "case_id": 1, "incident_id": 1, "account_no": 1, "case_current_status": 1,
+            "current_arrears_amount": 1, "drc": 1,
+        }},
+        {"$unwind": "$drc"},
+        {"$match": {"drc.removed_dtm": None}},
+    ]
+    assigned_dtm = "$drc.created_dtm"
+    if report == "ro":
+        pipeline += [
+            {"$unwind": "$drc.recovery_officers"},
+            {"$match": {"drc.recovery_officers.removed_dtm": None}},
+        ]
+        assigned_dtm = "$drc.recovery_officers.assigned_dtm"
+
+    # Joined after the unwind so that only cases with a current assignment are looked up;
+    # each lookup yields at most one document of totals
+    same_case = {"$match": {"$expr": {"$eq": ["$case_id", "$$case_id"]}}}
+    pipeline += [
+        {"$lookup": {
+            "from": collections["settlements"], "let": {"case_id": "$case_id"},
+            "pipeline": [
+                same_case,
+                {"$sort": {"created_on": 1, "_id": 1}},
+                {"$group": {
+                    "_id": None,
+                    "count": {"$sum": 1},
+                    "amount": {"$sum": "$settlement_amount"},
+                    "latest_status": {"$last": "$settlement_status"},
+                }},
+            ],
+            "as": "settlements",
+        }},
+        {"$lookup": {
+            "from": collections["payments"], "let": {"case_id": "$case_id"},
+            "pipeline": [
+                same_case,
+                {"$group": {"_id": None, "amount": {"$sum": "$bill_paid_amount"}}},
+            ],
+            "as": "payments",
+        }},
+        {"$project": {
+            "_id": 0,
+            "drc_id": "$drc.drc_id",
+            "drc_name": "$drc.drc_name",
+            **({"ro_id": "$drc.recovery_officers.ro_id"} if report == "ro" else {}),
+            "case_id": 1, "incident_id": 1, "account_no": 1, "case_current_status": 1,
+            "assigned_dtm": assigned_dtm,
+            "arrears_amount": "$current_arrears_amount",
+            "settlements": {"$sum": "$settlements.count"},
+            "settlement_status": {"$arrayElemAt": ["$settlements.latest_status", 0]},
+            "settlement_amount": {"$sum": "$settlements.amount"},
+            "collected_amount": {"$sum": "$payments.amount"},
+        }},
+    ]
+    return pipeline
+
+
+def totals_pipeline(report, query=None, collections=None):
+    """
+    Pipeline of the case, arrears, settlement and collection totals per DRC or RO.
+
+    Args:
+        report (str): 'drc' or 'ro'.
+        query (dict, optional): Filter on the case documents.
+        collections (dict, optional): Source collection names by role.
+
+    Returns:
+        list: The aggregation pipeline; assignment_pipeline() grouped on GROUP_KEYS.
+    """
+    return assignment_pipeline(report, query, collections) + [
+        {"$group": {
+            "_id": {key: f"${key}" for key in GROUP_KEYS[report]},
+            "drc_name": {"$first": "$drc_name"},
+            "cases": {"$sum": 1},
+            "arrears_amount": {"$sum": "$arrears_amount"},
+            "settled_cases": {"$sum": {"$cond": [{"$gt": ["$settlements", 0]}, 1, 0]}},
+            "settlement_amount": {"$sum": "$settlement_amount"},
+            "collected_amount": {"$sum": "$collected_amount"},
+        }},
+        {"$sort": {f"_id.{key}": 1 for key in GROUP_KEYS[report]}},
+    ]
+
+
+def cases_pipeline(report, query=None, collections=None):
+    """
+    Pipeline of the case rows ordered by DRC or RO, then case.
+
+    Args:
+        report (str): 'drc' or 'ro'.
+        query (dict, optional): Filter on the case documents.
+        collections (dict, optional): Source collection names by role.
+
+    Returns:
+        list: The aggregation pipeline; assignment_pipeline() sorted for the report.
+    """
+    order = {key: 1 for key in GROUP_KEYS[report]}
+    order["case_id"] = 1
+    return assignment_pipeline(report, query, collections) + [{"$sort": order}]
+
+
+def totals_row(report, total):
+    """
+    Prepare one totals row from a document of totals_pipeline().
+    """
+    key = total["_id"]
+    assignment = [key.get("ro_id"), key.get("drc_id")] if report == "ro" else [key.get("drc_id")]
+    return assignment + [
+        total.get("drc_name"), total.get("cases"), excel_number(total.get("arrears_amount")),
+        total.get("settled_cases"), excel_number(total.get("settlement_amount")), excel_number(total.get("collected_amount")),
+    ]
+
+
+def case_row(report, case):
+    """
+    Prepare one case row from a document of cases_pipeline().
+    """
+    assignment = [case.get("ro_id"), case.get("drc_id")] if report == "ro" else [case.get("drc_id")]
+    return assignment + [
+        case.get("drc_name"), case.get("case_id"), case.get("incident_id"), case.get("account_no"),
+        case.get("case_current_status"), case.get("assigned_dtm"), excel_number(case.get("arrears_amount")),
+        case.get("settlement_status"), excel_number(case.get("settlement_amount")), excel_number(case.get("collected_amount")),
+    ]
+
+
+def _aggregate(db, collection_name, pipeline, name, batch_size):
+    """
+    Stream the results of a pipeline allowed to spill its sort and group stages to disk.
+    """
+    with query_stage(name):
+        cursor = db[collection_name].aggregate(pipeline, allowDiskUse=True, batchSize=batch_size, **query_time_limit())
+    yield from stream_cursor(cursor, name, batch_size)
+
+
+def portfolio_specs(db, collection_name, report, query=None, collections=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Describe the two tables of a portfolio report: totals per DRC or RO, and their cases.
+
+    Args:
+        db (pymongo.database.Database): The MongoDB database instance.
+        collection_name (str): The case details collection name.
+        report (str): 'drc' or 'ro'.
+        query (dict, optional): Filter on the case documents.
+        collections (dict, optional): Source collection names by role.
+        batch_size (int): Documents fetched per round trip.
+
+    Returns:
+        list: Table specs for write_streaming_tables(); their rows are lazy cursors.
+    """
+    label = report.upper()
+    headers = ASSIGNMENT_HEADERS[report]
+
+    def totals():
+        documents = _aggregate(db, collection_name, totals_pipeline(report, query, collections),
+                               f"{collection_name}.aggregate:{report}_totals", batch_size)
+        return (totals_row(report, total) for total in documents)
+
+    def cases():
+        documents = _aggregate(db, collection_name, cases_pipeline(report, query, collections),
+                               f"{collection_name}.aggregate:{report}_cases", batch_size)
+        return (case_row(report, case) for case in documents)
+
+    return [
+        table_spec(f"{report}_totals", f"Portfolio by {label}", headers + TOTALS_HEADERS, totals, None),
+        table_spec(f"{report}_cases", f"Cases by {label}", headers + CASE_HEADERS, cases, None),
+    ]
+
+
+def export_portfolio(db, collection_name, report, output_path, styles, query=None, collections=None,
+                     metrics=None, batch_size=DEFAULT_BATCH_SIZE, max_sheet_rows=EXCEL_MAX_ROWS,
+                     max_rows_per_file=None, deadline_seconds=None):
+    """
+    Export the cases currently assigned to each DRC or Recovery Officer to an Excel file.
+
+    - Unwinds the `drc` (and `drc.recovery_officers`) assignments of every matching case
+      and groups them on the server, with allowDiskUse so that the sort and group stages
+      of a portfolio over millions of cases spill to disk instead of failing.
+    - Streams the totals per DRC or RO and then every assigned case, ordered by DRC or RO,
+      into a write-only workbook, so memory stays bounded however many cases match.
+    - Continues past `max_sheet_rows` on further sheets, and past `max_rows_per_file`
+      in further '_part<N>' files, as case exports do.
+
+    Args:
+        db (pymongo.database.Database): The MongoDB database instance.
+        collection_name (str): The case details collection name.
+        report (str): 'drc' or 'ro'.
+        output_path (str): The directory to save the Excel file.
+        styles (dict): Predefined styles for formatting.
+        query (dict, optional): Filter on the case documents, e.g. from --filter; every case if omitted.
+        collections (dict, optional): Source collection names by role; see snapshots.DEFAULT_COLLECTIONS.
+        metrics (ExportMetrics, optional): Collector for the report; one is created if omitted.
+        batch_size (int): Documents fetched per round trip.
+        max_sheet_rows (int): Rows per sheet, at most Excel's 1,048,576.
+        max_rows_per_file (int, optional): Rows per file; one file if omitted.
+        deadline_seconds (float, optional): Seconds the report may take; see export_all_tables().
+
+    Returns:
+        str: The path of the (first) written Excel file; all files are listed in metrics.info['output_files'].
+
+    Exceptions:
+        - Raises ValueError for an unknown report.
+        - Raises ExportTimeoutError once `deadline_seconds` have passed.
+    """
+    if report not in PORTFOLIO_REPORTS:
+        raise ValueError(f"Unknown portfolio report: {report!r}; expected one of {PORTFOLIO_REPORTS}")
+    if metrics is None:
+        metrics = ExportMetrics()
+    try:
+        with activate(metrics), deadline_scope(deadline_seconds):
+            current_time = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+            output_path = os.path.join(output_path, f"Portfolio_{report.upper()}_{current_time}.xlsx")
+            if os.path.exists(output_path):
+                base, extension = os.path.splitext(output_path)
+                counter = 1
+                while os.path.exists(f"{base}_{counter}{extension}"):
+                    counter += 1
+                output_path = f"{base}_{counter}{extension}"
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+            with timed("render"), phase("render"):
+                sheet = write_streaming_tables(
+                    portfolio_specs(db, collection_name, report, query, collections, batch_size), styles,
+                    output_path, max_sheet_rows, max_rows_per_file, SHEET_TITLES[report]
+                )
+            with timed("save"), phase("save"):
+                sheet.workbook.save(sheet.output_files[-1])
+
+        metrics.info.update({"report": report, "output_path": output_path, "output_files": sheet.output_files})
+        metrics.finish("ok")
+        logger.info(f"{SHEET_TITLES[report]} report saved to {output_path}")
+        return output_path
+    finally:
+        if metrics.status == "running":
+            metrics.finish("failed")
+        logger.info(f"Portfolio summary: {json.dumps(metrics.summary(), default=str)}")
@@ -0,0 +1,96 @@
+import logging  # Module for logging errors and debug information
+from .data_fetcher import get_settlement_data, get_settlement_plan_data, get_payments_data, get_commissions_data
+from .settlements_remarks import settlement_row, settlement_plan_row
+from .payments_table import payment_row
+from .commissions_table import commission_row
+
+# Initialize logger for this module
+logger = logging.getLogger('excel_data_writer')
+
+# Entries per table of a preview export when none is given
+DEFAULT_PREVIEW_ROWS = 20
+
+# History arrays of the case document cut to their latest entries, by the stage name of their table
+PREVIEW_ARRAYS = {
+    "create_remarks_table": "remark",
+    "create_approve_table": "approve",
+    "create_case_status_table": "case_status",
+    "create_abnormal_stop_table": "abnormal_stop",
+    "create_ro_negotiations_table": "ro_negotiation",
+    "create_ro_requests_table": "ro_requests",
+}
+
+
+def preview_title(title, limit):
+    """
+    Main header of a table cut to its latest `limit` entries.
+    """
+    return f"{title} (latest {limit} only)"
+
+
+def _latest(rows, limit):
+    """
+    Keep the last `limit` of `limit + 1` fetched rows; the extra row tells whether older rows exist.
+    """
+    return rows[-limit:], len(rows) > limit
+
+
+def trim_case_arrays(case_data, limit):
+    """
+    Cut the history arrays of a case fetched with `limit + 1` entries each to `limit`, in place.
+
+    Returns:
+        set: Stage names of the tables that lost older entries.
+    """
+    truncated = set()
+    for name, array in PREVIEW_ARRAYS.items():
+        case_data[array], cut = _latest(case_data.get(array) or [], limit)
+        if cut:
+            truncated.add(name)
+    return truncated
+
+
+def preview_bundle(db, case_data, limit=DEFAULT_PREVIEW_ROWS):
+    """
+    Prepare a preview of a case: the latest `limit` entries of every history table.
+
+    The case must have been read with get_case_preview() at `limit + 1` entries per
+    history array; they are cut here. The Settlement, Settlement Plan, Payments and
+    Commissions rows are read newest first with sort and limit, so the cost of a
+    preview does not grow with the age of the case. One extra entry is read per table
+    to tell whether older entries were left out.
+
+    Args:
+        db (pymongo.database.Database): The MongoDB database instance.
+        case_data (dict): The case document from get_case_preview().
+        limit (int): Entries shown per table.
+
+    Returns:
+        dict: 'limit', the table 'rows' in the layout of an export snapshot, and the
+        stage names of the 'truncated' tables.
+    """
+    case_id = case_data.get("case_id")
+    truncated = trim_case_arrays(case_data, limit)
+
+    settlements, settlements_cut = _latest(get_settlement_data(db, case_id, limit + 1), limit)
+    plans, plans_cut = _latest(get_settlement_plan_data(db, case_id, limit + 1), limit)
+    payments, payments_cut = _latest(get_payments_data(db, case_id, limit + 1), limit)
+    commissions, commissions_cut = _latest(get_commissions_data(db, case_id, limit + 1), limit)
+    # Plans and commissions are read from the latest settlements and payments only
+    for name, cut in (("create_settlement_table", settlements_cut),
+                      ("create_settlement_plan_table", plans_cut or settlements_cut),
+                      ("create_payments_table", payments_cut),
+                      ("create_commissions_table", commissions_cut or payments_cut)):
+        if cut:
+            truncated.add(name)
+
+    return {
+        "limit": limit,
+        "rows": {
+            "settlements": [settlement_row(settlement) for settlement in settlements],
+            "settlement_plans": [settlement_plan_row(plan) for plan in plans],
+            "payments": [payment_row(payment) for payment in payments],
+            "commissions": [commission_row(transaction) for transaction in commissions],
+        },
+        "truncated": truncated,
+    }
@@ -0,0 +1,243 @@
+import io  # In-memory text stream for the hotspot report
+import logging  # Module for logging errors and debug information
+import os  # Module for interacting with the operating system
+import random  # Module for sampling which exports are profiled
+import threading  # Module for allowing only one profiled export at a time
+import tracemalloc  # Module for tracking memory allocations
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+
+# Initialize logger for this module
+logger = logging.getLogger('excel_data_writer')
+
+# Phases every export is split into; nested phases take over from the enclosing one
+PHASES = ("fetch", "render", "save")
+
+# Profiler of the export running in the current thread or context
+_current_profiler = ContextVar("export_profiler", default=None)
+
+# cProfile and tracemalloc are process-wide, so only one export is profiled at a time
+_profiling_lock = threading.Lock()
+
+# Deepest call stack written to the collapsed-stack files
+MAX_STACK_DEPTH = 100
+
+
+class ExportProfiler:
+    """
+    Profiles one export with one cProfile.Profile per phase and optional tracemalloc tracking.
+
+    Only the innermost active phase is profiled, so a query issued while rendering
+    is attributed to 'fetch' and not counted again under 'render'.
+    """
+
+    def __init__(self, incident_id, output_dir, top_n=20, trace_memory=True):
+        # Imported here so that importing the exporter does not pay for the profiler
+        import cProfile  # Deterministic profiler for the export phases
+
+        self.incident_id = incident_id
+        self.output_dir = output_dir
+        self.top_n = top_n
+        self.trace_memory = trace_memory
+        self.profiles = {name: cProfile.Profile() for name in PHASES}
+        self.peak_memory = None
+        self._phase_stack = []
+        self._memory_snapshot = None
+        self._started_tracemalloc = False
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Profile the enclosed block as `name`, pausing the enclosing phase meanwhile.
+        """
+        if self._phase_stack:
+            self.profiles[self._phase_stack[-1]].disable()
+        self._phase_stack.append(name)
+        self.profiles[name].enable()
+        try:
+            yield
+        finally:
+            self.profiles[name].disable()
+            self._phase_stack.pop()
+            if self._phase_stack:
+                self.profiles[self._phase_stack[-1]].enable()
+
+    def start(self):
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+
+    def stop(self):
+        if tracemalloc.is_tracing():
+            self.peak_memory = tracemalloc.get_traced_memory()[1]
+            if self.trace_memory:
+                self._memory_snapshot = tracemalloc.take_snapshot()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def report(self):
+        """
+        Write one .pstats and one .collapsed file per phase plus a text report with the top-N hotspots.
+
+        The .collapsed files hold one 'caller;...;callee microseconds' line per call
+        stack, as read by flamegraph.pl and speedscope.
+
+        Returns:
+            str: The hotspot report, split into fetch, render and save sections.
+        """
+        import pstats  # Module for reading and sorting profiler statistics
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        current_time = datetime.now().strftime("%Y-%m-%d_%H-%M-%S_%f")
+        base_path = os.path.join(self.output_dir, f"profile_{self.incident_id}_{current_time}")
+
+        report = io.StringIO()
+        report.write(f"Profile of export for Incident ID: {self.incident_id}\n")
+        for name in PHASES:
+            profile = self.profiles[name]
+            report.write(f"\n===== {name} phase: top {self.top_n} by own time =====\n")
+            if not profile.getstats():
+                report.write("(no calls recorded)\n")
+                continue
+            profile.dump_stats(f"{base_path}_{name}.pstats")
+            stats = pstats.Stats(profile, stream=report)
+            with open(f"{base_path}_{name}.collapsed", "w", encoding="utf-8") as collapsed_file:
+                collapsed_file.writelines(f"{stack} {microseconds}\n"
+                                          for stack, microseconds in collapsed_stacks(stats.stats))
+            stats.sort_stats(pstats.SortKey.TIME).print_stats(self.top_n)
+
+        if self.peak_memory is not None:
+            report.write(f"\n===== memory: peak traced {self.peak_memory / 1048576:.1f} MiB =====\n")
+        if self._memory_snapshot is not None:
+            for statistic in self._memory_snapshot.statistics("lineno")[:self.top_n]:
+                report.write(f"{statistic}\n")
+
+        report_text = report.getvalue()
+        with open(f"{base_path}.txt", "w", encoding="utf-8") as report_file:
+            report_file.write(report_text)
+        return report_text
+
+
+def _frame_name(function):
+    """
+    Name a profiled function as 'file:line(name)', without the ';' that separates stack frames.
+    """
+    file_name, line, name = function
+    return f"{os.path.basename(file_name)}:{line}({name})".replace(";", ",")
+
+
+def collapsed_stacks(stats):
+    """
+    Rebuild the call stacks of a profile from its caller/callee edges.
+
+    cProfile records calls per caller, not whole stacks, so a function's time is
+    split over its callers in proportion to the cumulative time of each call edge.
+
+    Args:
+        stats (dict): The `stats` of a pstats.Stats object.
+
+    Returns:
+        list: (stack, own microseconds) pairs, the stack as 'root;...;function'.
+    """
+    callees = {}
+    for function, (_, _, _, _, callers) in stats.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((function, edge[3]))
+
+    stacks = {}
+
+    def walk(function, path, share):
+        own_seconds, cumulative_seconds = stats[function][2], stats[function][3]
+        stack = f"{path};{_frame_name(function)}" if path else _frame_name(function)
+        stacks[stack] = stacks.get(stack, 0.0) + own_seconds * share
+        if stack.count(";") >= MAX_STACK_DEPTH:
+            return
+        for callee, edge_seconds in callees.get(function, ()):
+            callee_seconds = stats[callee][3]
+            if _frame_name(callee) in stack.split(";") or not callee_seconds:
+                continue
+            walk(callee, stack, share * min(edge_seconds / callee_seconds, 1.0))
+
+    for function, (_, _, _, _, callers) in stats.items():
+        if not callers:
+            walk(function, "", 1.0)
+    return [(stack, round(seconds * 1e6)) for stack, seconds in stacks.items() if round(seconds * 1e6) > 0]
+
+
+class ProfileSettings:
+    """
+    Decides which exports are profiled and how.
+
+    Args:
+        output_dir (str): Directory for the .pstats and .collapsed files and hotspot reports.
+        top_n (int): Number of hotspots listed per phase.
+        sample_rate (float): Fraction of exports to profile, from 0.0 to 1.0.
+        trace_memory (bool): Track allocations with tracemalloc as well.
+    """
+
+    def __init__(self, output_dir, top_n=20, sample_rate=1.0, trace_memory=True):
+        self.output_dir = output_dir
+        self.top_n = top_n
+        self.sample_rate = sample_rate
+        self.trace_memory = trace_memory
+
+    def profiler_for(self, incident_id):
+        """
+        Return an ExportProfiler for this export if it is sampled, otherwise None.
+        """
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return None
+        return ExportProfiler(incident_id, self.output_dir, self.top_n, self.trace_memory)
+
+
+@contextmanager
+def profiling(profiler):
+    """
+    Run the enclosed export under `profiler` and log its hotspot report afterwards.
+
+    Does nothing if `profiler` is None, or if another export is already being
+    profiled in this process (a warning is logged and the export runs normally).
+    """
+    if profiler is None:
+        yield
+        return
+    if not _profiling_lock.acquire(blocking=False):
+        logger.warning(f"Another export is being profiled; Incident ID {profiler.incident_id} runs unprofiled.")
+        yield
+        return
+    token = _current_profiler.set(profiler)
+    profiler.start()
+    try:
+        yield
+    finally:
+        profiler.stop()
+        _current_profiler.reset(token)
+        _profiling_lock.release()
+        try:
+            logger.info(profiler.report())
+        except Exception as failed_profile_report:
+            logger.error(f"Failed to write profile report: {failed_profile_report}")
+
+
+def current_profiler():
+    """
+    Return the ExportProfiler of the running export, or None if it is not profiled.
+    """
+    return _current_profiler.get()
+
+
+@contextmanager
+def phase(name):
+    """
+    Attribute the enclosed block to phase `name` of the running profiled export (no-op if none).
+    """
+    profiler = _current_profiler.get()
+    if profiler is None:
+        yield
+        return
+    with profiler.phase(name):
+        yield
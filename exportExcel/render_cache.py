@@ -0,0 +1,163 @@
+import hashlib  # Module for fingerprinting the rows of a table
+import logging  # Module for logging errors and debug information
+import threading  # Module for guarding the cache shared by the export threads
+from collections import OrderedDict
+from copy import copy
+from .metrics import record_table
+from .stream_writer import _style_templates
+from .table_specs import table_cells
+
+# Initialize logger for this module
+logger = logging.getLogger('excel_data_writer')
+
+# Tables whose column widths are kept; each entry is a fingerprint and a few widths
+DEFAULT_MAX_ENTRIES = 10000
+
+
+def table_fingerprint(spec, rows):
+    """
+    Fingerprint of everything a table's column widths depend on: its layout, title, headers and rows.
+
+    Args:
+        spec (dict): The table spec.
+        rows (list): The table's prepared rows.
+
+    Returns:
+        str: Hex digest; equal for equal tables.
+    """
+    content = (spec["layout"], spec["title"], list(spec["headers"]), sorted(spec["bold_labels"]), rows)
+    return hashlib.blake2b(repr(content).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _columns(spec, y_pointer):
+    """
+    Letters of the columns a table occupies, as create_table() and create_vertical_table() name them.
+    """
+    width = 2 if spec["layout"] == "vertical" else len(spec["headers"])
+    return [chr(64 + column) for column in range(y_pointer, y_pointer + width)]
+
+
+def rendered_block(worksheet, spec, fingerprint, y_pointer):
+    """
+    Record the column widths of a table just rendered into the worksheet, for replay_table().
+
+    Only the widths are kept: replay_table() writes the values and styles again from
+    the table's freshly prepared rows.
+
+    Args:
+        worksheet (Worksheet): The sheet holding the table.
+        spec (dict): The table spec.
+        fingerprint (str): table_fingerprint() of the rows the table was rendered from.
+        y_pointer (int): First column of the table.
+
+    Returns:
+        dict: The table's 'fingerprint' and the 'widths' its builder computed, by column letter.
+    """
+    return {
+        "fingerprint": fingerprint,
+        "widths": {letter: worksheet.column_dimensions[letter].width for letter in _columns(spec, y_pointer)},
+    }
+
+
+def replay_table(worksheet, x_pointer, y_pointer, spec, rows, block, styles):
+    """
+    Write a table whose rows match a cached block, as create_table() or create_vertical_table() would.
+
+    Every cell is written again; what a cache hit saves is the styling and measuring.
+    Each cell gets a copy of a style array resolved once for the sheet instead of font,
+    fill and border objects assigned one by one, and the column widths come from the
+    block instead of a second pass over the written cells.
+
+    Args:
+        worksheet (Worksheet): The sheet to write to.
+        x_pointer (int): Row of the table's main header.
+        y_pointer (int): First column of the table.
+        spec (dict): The table spec.
+        rows (list): The table's rows; their fingerprint matches the block's.
+        block (dict): The cached block from rendered_block().
+        styles (dict): Predefined styles for formatting.
+
+    Returns:
+        int: The row after the table, as returned by its builder.
+    """
+    templates = _style_templates(worksheet, styles)
+
+    def place(row, column, value, style):
+        cell = worksheet.cell(row=row, column=column)
+        cell._style = copy(templates[style])
+        # Bound after the style so dates still get their number format
+        cell.value = value
+
+    vertical = spec["layout"] == "vertical"
+    last_column = y_pointer + (1 if vertical else len(spec["headers"]) - 1)
+    worksheet.merge_cells(start_row=x_pointer, start_column=y_pointer, end_row=x_pointer, end_column=last_column)
+    place(x_pointer, y_pointer, spec["title"], "title")
+
+    if vertical:
+        for index, (label, value) in enumerate(rows, start=1):
+            place(x_pointer + index, y_pointer, label, "header")
+            place(x_pointer + index, y_pointer + 1, value, "bold" if label in spec["bold_labels"] else "data")
+        next_row = x_pointer + len(rows) + 2
+    else:
+        for index, header in enumerate(spec["headers"]):
+            place(x_pointer + 1, y_pointer + index, header, "header")
+        for row_index, row_data in enumerate(rows, start=x_pointer + 2):
+            for col_index, value in enumerate(row_data, start=y_pointer):
+                place(row_index, col_index, value, "data")
+        next_row = x_pointer + len(rows) + 3
+
+    for letter, width in block["widths"].items():
+        worksheet.column_dimensions[letter].width = width
+
+    record_table(spec["title"], len(rows), table_cells(spec, len(rows)))
+    logger.debug("Table '%s' replayed from the render cache.", spec["title"])
+    return next_row
+
+
+class RenderCache:
+    """
+    Column widths of recently exported tables, so a re-export restyles and measures only the tables that changed.
+
+    Entries are keyed by incident ID and table and hold the fingerprint of the rows
+    the widths were measured on; a table is replayed with them only when its freshly
+    prepared rows have the same fingerprint, so a stale entry costs a rebuild, never
+    a wrongly sized table. The least recently
+    used entries are dropped past `max_entries`. Safe to share between export threads.
+
+    Args:
+        max_entries (int): Tables kept.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._blocks = OrderedDict()  # (incident ID, table name) -> block
+
+    def get(self, key, fingerprint):
+        """
+        Return the block cached under `key` if it was rendered from rows with this fingerprint, else None.
+        """
+        with self._lock:
+            block = self._blocks.get(key)
+            if block is None or block["fingerprint"] != fingerprint:
+                self.misses += 1
+                return None
+            self._blocks.move_to_end(key)
+            self.hits += 1
+            return block
+
+    def put(self, key, block):
+        """
+        Cache the block of a freshly rendered table.
+        """
+        with self._lock:
+            self._blocks[key] = block
+            self._blocks.move_to_end(key)
+            while len(self._blocks) > self.max_entries:
+                self._blocks.popitem(last=False)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._blocks)
@@ -1,91 +1,105 @@
 import logging
-import sys
-from openpyxl import Workbook
 from exportExcel.table_utils import create_table
 from .data_fetcher import get_settlement_data, get_settlement_plan_data
 from .excel_styles import format_with_thousand_separator
+from .errors import TableError
 
 logger = logging.getLogger('excel_data_writer')
 
+REMARKS_HEADERS = ["Remark", "Remark Added by", "Remark Added Date"]
+
+SETTLEMENT_HEADERS = [
+    "Settlement ID", "Case ID", "DRC Name", "RO Name", "Status", "Status reason",
+    "Status DTM", "Settlement Type", "Settlement Amount", "Settlement Phase",
+    "Settlement Created by", "Settlement Created DTM", "Last Monitoring DTM", "Remark"
+]
+
+SETTLEMENT_PLAN_HEADERS = [
+    "Settlement ID", "Installment Sequence", "Installment Settle Amount",
+    "Accumulated Amount", "Plan Date and Time"
+]
+
+def remarks_rows(case_data):
+    """
+    Prepare the Remarks table rows from the case's 'remark' array.
+    """
+    remarks = case_data.get("remark", [])
+    return [[remark.get("remark"), remark.get("remark_added_by"), remark.get("remark_added_date")] for remark in remarks]
+
+def settlement_row(settlement):
+    """
+    Prepare one Settlement table row from a Case_settlements document.
+    """
+    return [
+        settlement.get("settlement_id"), settlement.get("case_id"), settlement.get("drc_id"),
+        settlement.get("ro_id"), settlement.get("settlement_status"), settlement.get("status_reason"),
+        settlement.get("status_dtm"), settlement.get("settlement_type"), settlement.get("settlement_amount"),
+        settlement.get("settlement_phase"), settlement.get("created_by"), settlement.get("created_on"),
+        settlement.get("last_monitoring_dtm"), settlement.get("remark")
+    ]
+
+def settlement_plan_row(plan):
+    """
+    Prepare one Settlement Plan table row from a settlement_plan entry tagged with its settlement_id.
+    """
+    return [
+        plan.get("settlement_id"), plan.get("installment_seq"), plan.get("installment_settle_amount"),
+        plan.get("accumulated_amount"), plan.get("plan_date")
+    ]
+
 def create_remarks_table(worksheet, case_data, x_pointer, y_pointer, styles):
     """
     Create the Remarks table in the worksheet.
     """
     try:
-        logger.info("Creating Remarks table...")
-        headers = ["Remark", "Remark Added by", "Remark Added Date"]
-        
+        logger.debug("Creating Remarks table...")
+
         # Prepare data for the table
-        remarks = case_data.get("remark", [])
-        data = [[remark.get("remark"), remark.get("remark_added_by"), remark.get("remark_added_date")] for remark in remarks]
-        
+        data = remarks_rows(case_data)
+
         # Create the table
-        next_row = create_table(worksheet, x_pointer, y_pointer, "Remarks", headers, data, styles)
-        
-        logger.info("Remarks table created successfully.")
+        next_row = create_table(worksheet, x_pointer, y_pointer, "Remarks", REMARKS_HEADERS, data, styles)
+
+        logger.debug("Remarks table created successfully.")
         return next_row
     except Exception as failed_remarks_table_creation:
         logger.error(f"Failed to create Remarks table: {failed_remarks_table_creation}")
-        sys.exit(1)
+        raise TableError("Remarks", failed_remarks_table_creation) from failed_remarks_table_creation
 
 def create_settlement_table(worksheet, settlements, x_pointer, y_pointer, styles):
     """
     Create the Settlement table in the worksheet.
     """
     try:
-        logger.info("Creating Settlement table...")
-        headers = [
-            "Settlement ID", "Case ID", "DRC Name", "RO Name", "Status", "Status reason",
-            "Status DTM", "Settlement Type", "Settlement Amount", "Settlement Phase",
-            "Settlement Created by", "Settlement Created DTM", "Last Monitoring DTM", "Remark"
-        ]
-        
+        logger.debug("Creating Settlement table...")
+
         # Prepare data for the table
-        data = [
-            [
-                settlement.get("settlement_id"), settlement.get("case_id"), settlement.get("drc_id"),
-                settlement.get("ro_id"), settlement.get("settlement_status"), settlement.get("status_reason"),
-                settlement.get("status_dtm"), settlement.get("settlement_type"), settlement.get("settlement_amount"),
-                settlement.get("settlement_phase"), settlement.get("created_by"), settlement.get("created_on"),
-                settlement.get("last_monitoring_dtm"), settlement.get("remark")
-            ]
-            for settlement in settlements
-        ]
-        
+        data = [settlement_row(settlement) for settlement in settlements]
+
         # Create the table
-        next_row = create_table(worksheet, x_pointer, y_pointer, "Settlement Details", headers, data, styles)
-        
-        logger.info("Settlement table created successfully.")
+        next_row = create_table(worksheet, x_pointer, y_pointer, "Settlement Details", SETTLEMENT_HEADERS, data, styles)
+
+        logger.debug("Settlement table created successfully.")
         return next_row
     except Exception as failed_settlement_table_creation:
         logger.error(f"Failed to create Settlement table: {failed_settlement_table_creation}")
-        sys.exit(1)
+        raise TableError("Settlement", failed_settlement_table_creation) from failed_settlement_table_creation
 
 def create_settlement_plan_table(worksheet, settlement_plans, x_pointer, y_pointer, styles):
     """
     Create the Settlement Plan table in the worksheet.
     """
     try:
-        logger.info("Creating Settlement Plan table...")
-        headers = [
-            "Settlement ID", "Installment Sequence", "Installment Settle Amount",
-            "Accumulated Amount", "Plan Date and Time"
-        ]
-        
+        logger.debug("Creating Settlement Plan table...")
+
         # Prepare data for the table
-        data = [
-            [
-                plan.get("settlement_id"), plan.get("installment_seq"), plan.get("installment_settle_amount"),
-                plan.get("accumulated_amount"), plan.get("plan_date")
-            ]
-            for plan in settlement_plans
-        ]
-        
+        data = [settlement_plan_row(plan) for plan in settlement_plans]
+
         # Create the table
-        next_row = create_table(worksheet, x_pointer, y_pointer, "Settlement Plan", headers, data, styles)
-        
-        logger.info("Settlement Plan table created successfully.")
+        next_row = create_table(worksheet, x_pointer, y_pointer, "Settlement Plan", SETTLEMENT_PLAN_HEADERS, data, styles)
+
+        logger.debug("Settlement Plan table created successfully.")
         return next_row
     except Exception as failed_settlement_plan_table_creation:
         logger.error(f"Failed to create Settlement Plan table: {failed_settlement_plan_table_creation}")
-        sys.exit(1)
\ No newline at end of file
+        raise TableError("Settlement Plan", failed_settlement_plan_table_creation) from failed_settlement_plan_table_creation
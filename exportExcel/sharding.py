@@ -0,0 +1,89 @@
+# Cases per shard when none is given
+DEFAULT_SHARD_SIZE = 1000
+
+
+def shard_filter(query, lower=None, upper=None):
+    """
+    Restrict a case filter to the _id range (lower, upper].
+
+    Args:
+        query (dict): Filter on the case collection.
+        lower (any, optional): Exclusive lower _id bound; unbounded if None.
+        upper (any, optional): Inclusive upper _id bound; unbounded if None.
+
+    Returns:
+        dict: The combined filter.
+    """
+    id_range = {}
+    if lower is not None:
+        id_range["$gt"] = lower
+    if upper is not None:
+        id_range["$lte"] = upper
+    if not id_range:
+        return dict(query)
+    if not query:
+        return {"_id": id_range}
+    return {"$and": [query, {"_id": id_range}]}
+
+
+def iter_shards(collection, query, shard_size=DEFAULT_SHARD_SIZE):
+    """
+    Split the cases matching `query` into consecutive _id ranges of at most `shard_size` cases.
+
+    Each boundary is found by skipping `shard_size - 1` index entries past the previous
+    one, so a single _id travels over the wire per shard and no list of matching IDs is
+    ever built, however many cases match. Shards are produced lazily as they are consumed.
+
+    Args:
+        collection (pymongo.collection.Collection): The case details collection.
+        query (dict): Filter on the case collection.
+        shard_size (int): Maximum number of cases per shard.
+
+    Returns:
+        iterator: Shards as dicts with 'index', 'lower' (exclusive) and 'upper' (inclusive,
+        None for the open-ended last shard).
+
+    Exceptions:
+        - Raises ValueError if shard_size is less than 1.
+    """
+    if shard_size < 1:
+        raise ValueError("shard_size must be at least 1")
+
+    lower = None
+    index = 0
+    while True:
+        remaining = shard_filter(query, lower)
+        boundary = list(
+            collection.find(remaining, {"_id": 1}).sort("_id", 1).skip(shard_size - 1).limit(1)
+        )
+        if boundary:
+            upper = boundary[0]["_id"]
+            yield {"index": index, "lower": lower, "upper": upper}
+            lower = upper
+            index += 1
+            continue
+
+        # Fewer than shard_size cases are left; they form the last, open-ended shard
+        if collection.find_one(remaining, {"_id": 1}) is not None:
+            yield {"index": index, "lower": lower, "upper": None}
+        return
+
+
+def iter_shard_incident_ids(collection, query, shard, batch_size=DEFAULT_SHARD_SIZE):
+    """
+    Stream the incident IDs of the cases in one shard, in _id order.
+
+    Args:
+        collection (pymongo.collection.Collection): The case details collection.
+        query (dict): Filter on the case collection.
+        shard (dict): A shard from iter_shards().
+        batch_size (int): Number of IDs fetched per round trip.
+
+    Returns:
+        iterator: The incident_id of every case in the shard.
+    """
+    cursor = collection.find(
+        shard_filter(query, shard["lower"], shard["upper"]), {"incident_id": 1, "_id": 0}
+    ).sort("_id", 1).batch_size(batch_size)
+    for case in cursor:
+        yield case.get("incident_id")
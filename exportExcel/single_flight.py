@@ -0,0 +1,163 @@
+import logging  # Module for logging errors and debug information
+import threading  # Module for handing one export's result to every waiting caller
+import time  # Module for timing the wait of shared callers
+from .excel_writer import export_all_tables
+from .metrics import ExportMetrics
+
+# Initialize logger for this module
+logger = logging.getLogger('excel_data_writer')
+
+# Format of the files written by export_all_tables()
+EXPORT_FORMAT = "xlsx"
+
+
+class _Call:
+    """
+    One call in flight: its waiters block on `done` and then read `result` or `error`.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Runs one call per key at a time; callers arriving while it runs wait for it and share its result.
+
+    Nothing is cached: once the call returns, the next caller with the same key runs it again.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}  # key -> _Call in flight
+
+    def do(self, key, function):
+        """
+        Run `function()` for `key`, or wait for the run already in flight for it.
+
+        Args:
+            key (hashable): Identifies calls whose results are interchangeable.
+            function (callable): The call; run by the first caller only.
+
+        Returns:
+            tuple: (result of the call, bool whether it was shared from another caller's run)
+
+        Exceptions:
+            - Raises the call's exception, in the first caller and in every waiting caller.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = function()
+            return call.result, False
+        except BaseException as failed_call:
+            # Waiters get the leader's error, e.g. a TableError, too
+            call.error = failed_call
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            if call.waiters:
+                logger.debug("Shared one run of %s with %d waiting caller(s)", key, call.waiters)
+            call.done.set()
+
+    def in_flight(self):
+        """
+        Return the number of keys with a call in flight.
+        """
+        with self._lock:
+            return len(self._calls)
+
+
+# Exports in flight in this process, shared by every thread
+_exports = SingleFlight()
+
+
+def _hashable(value):
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return repr(value)
+
+
+def export_key(db, incident_id, output_path, collection_name, export_options):
+    """
+    Key of an export: the case, the file format and every option that changes the files written.
+
+    Args:
+        db (pymongo.database.Database): The database the case is read from.
+        incident_id (int or str): The incident ID of the case.
+        output_path (str): The directory the file is written to.
+        collection_name (str): The case details collection name.
+        export_options (dict): Further keyword arguments of export_all_tables().
+
+    Returns:
+        tuple: The key.
+    """
+    options = tuple(sorted((name, _hashable(value)) for name, value in export_options.items()))
+    return (incident_id, EXPORT_FORMAT, getattr(db, "name", None), collection_name, output_path, options)
+
+
+def export_once(db, incident_id, output_path, collection_name, styles, metrics=None, profiler=None,
+                **export_options):
+    """
+    Export a case with export_all_tables(), sharing the run with concurrent callers asking for the same export.
+
+    The first caller for a key renders the case; callers arriving while it runs wait
+    and receive the same output path (or the same exception) instead of fetching and
+    rendering the case again, so a burst of duplicate requests costs one export. Their
+    `metrics` record the wait as stage 'single_flight_wait' and 'shared_export' = True.
+
+    Args:
+        db (pymongo.database.Database): The MongoDB database instance.
+        incident_id (int or str): The incident ID of the case to export.
+        output_path (str): The directory to save the Excel file.
+        collection_name (str): The case details collection name.
+        styles (dict): Predefined styles for formatting; shared callers use the first caller's.
+        metrics (ExportMetrics, optional): Collector for this caller; one is created if omitted.
+        profiler (ExportProfiler, optional): Profiles the export if this caller runs it.
+        **export_options: Further keyword arguments of export_all_tables(), e.g. memory_budget_mb.
+
+    Returns:
+        str: The path of the (first) written Excel file.
+    """
+    if metrics is None:
+        metrics = ExportMetrics(incident_id)
+    key = export_key(db, incident_id, output_path, collection_name, export_options)
+
+    def export():
+        return export_all_tables(
+            db, incident_id, output_path, collection_name, styles, metrics, profiler, **export_options
+        )
+
+    start = time.perf_counter()
+    try:
+        path, shared = _exports.do(key, export)
+    except BaseException:
+        # export_all_tables() finishes the metrics of the caller that ran it
+        if metrics.status == "running":
+            metrics.add_stage("single_flight_wait", time.perf_counter() - start)
+            metrics.info["shared_export"] = True
+            metrics.finish("failed")
+        raise
+    if shared:
+        metrics.add_stage("single_flight_wait", time.perf_counter() - start)
+        metrics.info.update({"shared_export": True, "output_path": path})
+        metrics.finish("ok")
+    return path
@@ -0,0 +1,285 @@
+import logging  # Module for logging errors and debug information
+import time  # Module for timing the refresh
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from .throttle import throttled  # Rate and concurrency limit toward MongoDB
+
+# Initialize logger for this module
+logger = logging.getLogger('excel_data_writer')
+
+# Collection holding one pre-joined document per case when none is configured
+DEFAULT_SNAPSHOT_COLLECTION = "Export_snapshots"
+
+# Layout of the snapshot documents; exports ignore snapshots of another version,
+# so bump it whenever the rows below change and rebuild with --rebuild-snapshots
+SNAPSHOT_VERSION = 2
+
+# Cases joined and merged per aggregation
+DEFAULT_CHUNK_SIZE = 500
+
+# Cases with more payments than this are left out and exported live, keeping the
+# joined document well below MongoDB's 16 MB limit
+DEFAULT_MAX_ROWS = 20000
+
+# Changes this long before the watermark are picked up again, covering clock skew
+# between the DRS application and the refresh job and writes committed late
+DEFAULT_OVERLAP_SECONDS = 300
+
+# Source collections, by role
+DEFAULT_COLLECTIONS = {
+    "cases": "Case_details",
+    "settlements": "Case_settlements",
+    "payments": "Case_payments",
+    "commissions": "Commissions",
+    "arrears_bands": "Arrears_bands",
+}
+
+# Date fields that move forward when a document of the role is written; a case is
+# refreshed when any of them is past the watermark. Array fields match any entry.
+DEFAULT_CHANGE_FIELDS = {
+    "cases": ["created_dtm", "case_status.created_dtm", "remark.remark_added_date", "approve.approved_on",
+              "abnormal_stop.done_on", "drc.status_dtm", "ro_negotiation.created_dtm", "ro_requests.created_dtm"],
+    "settlements": ["status_dtm", "last_monitoring_dtm", "created_on"],
+    "payments": ["created_dtm"],
+    "commissions": ["paid_dtm"],
+}
+
+# Row fields in the column order of settlement_row(), settlement_plan_row(),
+# payment_row() and commission_row()
+SETTLEMENT_FIELDS = (
+    "settlement_id", "case_id", "drc_id", "ro_id", "settlement_status", "status_reason", "status_dtm",
+    "settlement_type", "settlement_amount", "settlement_phase", "created_by", "created_on",
+    "last_monitoring_dtm", "remark",
+)
+SETTLEMENT_PLAN_FIELDS = ("installment_seq", "installment_settle_amount", "accumulated_amount", "plan_date")
+PAYMENT_FIELDS = (
+    "payment_id", "settlement_id", "installment_seq", "bill_payment_seq", "bill_paid_amount", "bill_paid_date",
+    "bill_payment_status", "bill_payment_type", "settled_balance", "cumulative_settled_balance", "created_dtm",
+    "account_no", "money_transaction_Reference_type", "money_transaction_id",
+)
+COMMISSION_FIELDS = (
+    "money_transaction_id", "transaction_type", "paid_dtm", "arrears", "transaction", "running_credit",
+    "running_debt", "cummulative_settled_balance", "commissioned_amount",
+)
+
+
+def _row(variable, fields):
+    """
+    Aggregation expression building a table row from the fields of `$$<variable>`; missing fields become null.
+    """
+    return [f"$${variable}.{field}" for field in fields]
+
+
+def _batched(values, size):
+    iterator = iter(values)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def snapshot_pipeline(case_ids, snapshot_collection, collections, refreshed_at):
+    """
+    Build the aggregation that joins the given cases with their settlements, payments,
+    commissions and the arrears bands and merges one document per case into the snapshots.
+
+    The snapshot keeps the case document for the tables built from its embedded arrays,
+    and the finished rows of the Settlement, Settlement Plan, Payments and Commissions
+    tables and the totals of the Summary sheet, so an export reads nothing but the snapshot.
+
+    Args:
+        case_ids (list): case_id values of the cases to refresh.
+        snapshot_collection (str): The snapshot collection.
+        collections (dict): Source collection names by role, see DEFAULT_COLLECTIONS.
+        refreshed_at (datetime): Refresh time recorded in the snapshots.
+
+    Returns:
+        list: The pipeline, to be run on the case details collection.
+    """
+    settlement_plans = {"$reduce": {
+        "input": "$settlements",
+        "initialValue": [],
+        "in": {"$concatArrays": ["$$value", {"$map": {
+            "input": {"$ifNull": ["$$this.settlement_plan", []]},
+            "as": "plan",
+            "in": ["$$this.settlement_id"] + _row("plan", SETTLEMENT_PLAN_FIELDS),
+        }}]},
+    }}
+    month = lambda date: {"$dateToString": {"format": "%Y-%m", "date": date}}
+    # Same figures as sum_payments() groups: per distinct month, undated payments under null
+    payments_by_month = {"$map": {
+        "input": {"$setUnion": [{"$map": {"input": "$payments", "as": "payment",
+                                          "in": month("$$payment.bill_paid_date")}}]},
+        "as": "month",
+        "in": {"$let": {
+            "vars": {"paid": {"$filter": {"input": "$payments", "as": "payment",
+                                          "cond": {"$eq": [month("$$payment.bill_paid_date"), "$$month"]}}}},
+            "in": {"month": "$$month", "payments": {"$size": "$$paid"},
+                   "paid_amount": {"$sum": "$$paid.bill_paid_amount"}},
+        }},
+    }}
+    return [
+        {"$match": {"case_id": {"$in": case_ids}, "incident_id": {"$ne": None}}},
+        {"$replaceRoot": {"newRoot": {"case": "$$ROOT"}}},
+        {"$lookup": {"from": collections["settlements"], "localField": "case.case_id",
+                     "foreignField": "case_id", "as": "settlements"}},
+        {"$lookup": {"from": collections["payments"], "localField": "case.case_id",
+                     "foreignField": "case_id", "as": "payments"}},
+        {"$lookup": {"from": collections["commissions"], "localField": "payments.money_transaction_id",
+                     "foreignField": "money_transaction_id", "as": "commissions"}},
+        {"$lookup": {"from": collections["arrears_bands"], "pipeline": [{"$limit": 1}, {"$project": {"_id": 0}}],
+                     "as": "arrears_bands"}},
+        {"$project": {
+            "_id": "$case.incident_id",
+            "incident_id": "$case.incident_id",
+            "case_id": "$case.case_id",
+            "version": {"$literal": SNAPSHOT_VERSION},
+            "refreshed_at": {"$literal": refreshed_at},
+            "case": "$case",
+            "arrears_bands": {"$ifNull": [{"$arrayElemAt": ["$arrears_bands", 0]}, {}]},
+            "rows": {
+                "settlements": {"$map": {"input": "$settlements", "as": "settlement",
+                                         "in": _row("settlement", SETTLEMENT_FIELDS)}},
+                "settlement_plans": settlement_plans,
+                "payments": {"$map": {"input": "$payments", "as": "payment", "in": _row("payment", PAYMENT_FIELDS)}},
+                "commissions": {"$map": {"input": "$commissions", "as": "commission",
+                                         "in": _row("commission", COMMISSION_FIELDS)}},
+            },
+            "totals": {
+                "settlements": {"$size": "$settlements"},
+                "settlement_amount": {"$sum": "$settlements.settlement_amount"},
+                "payments": {"$size": "$payments"},
+                "paid_amount": {"$sum": "$payments.bill_paid_amount"},
+                "by_month": payments_by_month,
+                "commissions": {"$size": "$commissions"},
+                "commissioned_amount": {"$sum": "$commissions.commissioned_amount"},
+            },
+        }},
+        {"$merge": {"into": snapshot_collection, "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ]
+
+
+def _group_values(collection, field, query):
+    """
+    Distinct values of `field` over the matching documents, read through a cursor
+    rather than distinct() so that large sets are not limited to one 16 MB reply.
+    """
+    with throttled():
+        return [group["_id"] for group in collection.aggregate(
+            [{"$match": query}, {"$group": {"_id": f"${field}"}}], allowDiskUse=True
+        ) if group["_id"] is not None]
+
+
+def touched_case_ids(db, collections, change_fields, since):
+    """
+    Find the cases with a document written after `since` in any source collection.
+
+    Args:
+        db (pymongo.database.Database): The MongoDB database instance.
+        collections (dict): Source collection names by role, see DEFAULT_COLLECTIONS.
+        change_fields (dict): Change date fields by role, see DEFAULT_CHANGE_FIELDS.
+        since (datetime): Changes after this time are picked up.
+
+    Returns:
+        set: case_id values of the touched cases.
+    """
+    changed = lambda role: {"$or": [{field: {"$gt": since}} for field in change_fields[role]]}
+    case_ids = set()
+    for role in ("cases", "settlements", "payments"):
+        if change_fields.get(role):
+            case_ids.update(_group_values(db[collections[role]], "case_id", changed(role)))
+    if change_fields.get("commissions"):
+        transaction_ids = _group_values(db[collections["commissions"]], "money_transaction_id", changed("commissions"))
+        for batch in _batched(transaction_ids, DEFAULT_CHUNK_SIZE):
+            case_ids.update(_group_values(
+                db[collections["payments"]], "case_id", {"money_transaction_id": {"$in": batch}}
+            ))
+    return case_ids
+
+
+def _oversized_case_ids(db, collections, case_ids, max_rows):
+    """
+    Return the case_id values among `case_ids` with more than `max_rows` payments.
+    """
+    with throttled():
+        return [group["_id"] for group in db[collections["payments"]].aggregate([
+            {"$match": {"case_id": {"$in": case_ids}}},
+            {"$group": {"_id": "$case_id", "payments": {"$sum": 1}}},
+            {"$match": {"payments": {"$gt": max_rows}}},
+        ])]
+
+
+def refresh_snapshots(db, snapshot_collection=DEFAULT_SNAPSHOT_COLLECTION, collections=None, change_fields=None,
+                      full=False, chunk_size=DEFAULT_CHUNK_SIZE, max_rows=DEFAULT_MAX_ROWS,
+                      overlap_seconds=DEFAULT_OVERLAP_SECONDS):
+    """
+    Bring the export snapshots up to date with the source collections.
+
+    Incremental refreshes re-join only the cases touched since the watermark of the last
+    refresh; the first refresh, and any with `full`, re-joins every case and removes the
+    snapshots of cases that no longer exist. The watermark is the start time of the
+    refresh, so writes made while it runs are picked up by the next one. Deleted
+    payments, settlements and commissions leave no change date behind and are only
+    reflected by the next change to the case or a full refresh.
+
+    Args:
+        db (pymongo.database.Database): The MongoDB database instance; the refresh writes, so use the primary.
+        snapshot_collection (str): The snapshot collection; the watermark is kept in '<name>_state'.
+        collections (dict, optional): Source collection names by role; DEFAULT_COLLECTIONS if omitted.
+        change_fields (dict, optional): Change date fields by role; DEFAULT_CHANGE_FIELDS if omitted.
+        full (bool): Re-join every case instead of the touched ones.
+        chunk_size (int): Cases joined and merged per aggregation.
+        max_rows (int): Cases with more payments are left out and exported live.
+        overlap_seconds (float): Changes this long before the watermark are picked up again.
+
+    Returns:
+        dict: mode, since, watermark, and the numbers of cases refreshed, oversized and removed.
+    """
+    collections = dict(DEFAULT_COLLECTIONS, **(collections or {}))
+    change_fields = change_fields if change_fields is not None else DEFAULT_CHANGE_FIELDS
+    started = datetime.now(timezone.utc)
+    clock = time.perf_counter()
+    state = db[f"{snapshot_collection}_state"]
+    watermark = state.find_one({"_id": "watermark"})
+
+    if full or watermark is None:
+        mode, since = "full", None
+        case_ids = (case["case_id"] for case in db[collections["cases"]].find(
+            {}, {"case_id": 1, "_id": 0}, batch_size=chunk_size
+        ).sort("_id", 1) if case.get("case_id") is not None)
+    else:
+        mode, since = "incremental", watermark["value"] - timedelta(seconds=overlap_seconds)
+        case_ids = sorted(touched_case_ids(db, collections, change_fields, since), key=str)
+
+    refreshed, oversized = 0, []
+    for batch in _batched(case_ids, chunk_size):
+        too_large = _oversized_case_ids(db, collections, batch, max_rows)
+        if too_large:
+            # Their exports read the source collections, so drop any older snapshot
+            db[snapshot_collection].delete_many({"case_id": {"$in": too_large}})
+            oversized.extend(too_large)
+            too_large = set(too_large)
+            batch = [case_id for case_id in batch if case_id not in too_large]
+        if batch:
+            with throttled():
+                db[collections["cases"]].aggregate(
+                    snapshot_pipeline(batch, snapshot_collection, collections, started), allowDiskUse=True
+                )
+            refreshed += len(batch)
+
+    removed = 0
+    if mode == "full":
+        # Cases gone from the source, and snapshots of an older layout
+        removed = db[snapshot_collection].delete_many({"refreshed_at": {"$lt": started}}).deleted_count
+
+    state.replace_one({"_id": "watermark"}, {"value": started, "mode": mode, "cases": refreshed}, upsert=True)
+    report = {
+        "mode": mode, "since": since, "watermark": started, "refreshed": refreshed,
+        "oversized": len(oversized), "removed": removed, "seconds": round(time.perf_counter() - clock, 3),
+    }
+    logger.info(
+        f"Refreshed {refreshed} export snapshot(s) ({mode}) in {report['seconds']} s; "
+        f"{len(oversized)} case(s) over {max_rows} payments left to live exports, {removed} removed."
+    )
+    return report
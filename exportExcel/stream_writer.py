@@ -0,0 +1,362 @@
+import logging  # Module for logging errors and debug information
+import os  # Module for building the names of spill files
+from copy import copy  # Copies the template cell styles
+from itertools import chain, islice
+from .deadline import check_deadline
+from .metrics import record_table, timed
+from .profiling import phase
+from .errors import ExportError
+from .table_specs import handle_table_error, table_cells, unavailable_spec
+from .table_utils import writable_value
+
+# Initialize logger for this module
+logger = logging.getLogger('excel_data_writer')
+
+# Rows per table inspected to size the columns; write-only sheets need the
+# widths before the first row is written, so later rows cannot widen a column.
+WIDTH_SAMPLE_ROWS = 1000
+
+# Rows per worksheet in the .xlsx format
+EXCEL_MAX_ROWS = 1048576
+
+# Smallest sheet or file: a table title, its sub-headers and one data row
+MIN_SPILL_ROWS = 3
+
+SHEET_TITLE = "Case Details"
+
+
+def _column_width(max_length):
+    """
+    Column width for the longest value, as create_table() computes it.
+    """
+    return (max_length + 2) * 1.2
+
+
+def _measure(lengths, column, value):
+    """
+    Track the longest value written to a column.
+    """
+    if value and len(str(value)) > lengths.get(column, 0):
+        lengths[column] = len(str(value))
+
+
+def _sample_lengths(lengths, spec, sample):
+    """
+    Add the header and sampled row lengths of one table to the per-column maxima.
+    """
+    if spec["layout"] == "vertical":
+        # The main header spans both columns and is not measured, as in create_vertical_table()
+        for row in sample:
+            for column, value in enumerate(row, start=1):
+                _measure(lengths, column, value)
+        return
+
+    _measure(lengths, 1, spec["title"])
+    for column, header in enumerate(spec["headers"], start=1):
+        _measure(lengths, column, header)
+    for row in sample:
+        for column, value in enumerate(row, start=1):
+            _measure(lengths, column, value)
+
+
+def _style_templates(worksheet, styles):
+    """
+    Resolve the table cell styles ('title', 'header', 'bold', 'data') once in the
+    worksheet's workbook, as the style arrays of template cells.
+    """
+    from openpyxl.cell import WriteOnlyCell  # Imported with openpyxl on first use
+
+    def template(font=None, fill=None, alignment=None):
+        cell = WriteOnlyCell(worksheet)
+        cell.border = styles["cell_border"]
+        if font is not None:
+            cell.font = font
+        if fill is not None:
+            cell.fill = fill
+        if alignment is not None:
+            cell.alignment = alignment
+        return cell._style
+
+    return {
+        "title": template(styles["header_font"], styles["main_header_fill"], styles["main_header_alignment"]),
+        "header": template(styles["header_font"], styles["sub_header_fill"], styles["sub_header_alignment"]),
+        "bold": template(styles["bold_font"]),
+        "data": template(),
+    }
+
+
+def _cell_factory(worksheet, styles):
+    """
+    Return a function building write-only cells in one of the table cell styles.
+
+    Each style is resolved once on a template cell and then copied, which is several
+    times faster than assigning font, fill and border objects to every cell.
+    """
+    from openpyxl.cell import WriteOnlyCell  # Imported with openpyxl on first use
+
+    templates = _style_templates(worksheet, styles)
+
+    def make_cell(value, style="data"):
+        cell = WriteOnlyCell(worksheet)
+        cell._style = copy(templates[style])
+        # Bound after the style so dates still get their number format
+        cell.value = value
+        return cell
+
+    return make_cell
+
+
+class SpillingSheetWriter:
+    """
+    Write-only 'Case Details' sheets that continue on a new sheet when one is full,
+    and in a new file once a file holds `max_rows_per_file` rows.
+
+    Files after the first are named '<name>_part<N>.xlsx'; sheets after the first in
+    a file are named '<sheet title> (<N>)'. Every full file except the last is saved
+    as soon as it is closed, so only the rows of the current sheet are in flight.
+    """
+
+    def __init__(self, output_path, styles, widths, max_sheet_rows=EXCEL_MAX_ROWS, max_rows_per_file=None,
+                 sheet_title=SHEET_TITLE):
+        """
+        Args:
+            output_path (str): Path of the first file.
+            styles (dict): Predefined styles for formatting.
+            widths (dict): Column width by column number, applied to every sheet.
+            max_sheet_rows (int): Rows per sheet, at most Excel's limit.
+            max_rows_per_file (int, optional): Rows per file; one file if omitted.
+            sheet_title (str): Title of the first sheet of each file.
+
+        Exceptions:
+            - Raises ValueError if a limit cannot hold a table heading and one row.
+        """
+        if not MIN_SPILL_ROWS <= max_sheet_rows <= EXCEL_MAX_ROWS:
+            raise ValueError(f"max_sheet_rows must be between {MIN_SPILL_ROWS} and {EXCEL_MAX_ROWS}")
+        if max_rows_per_file is not None and max_rows_per_file < MIN_SPILL_ROWS:
+            raise ValueError(f"max_rows_per_file must be at least {MIN_SPILL_ROWS}")
+        self.output_path = output_path
+        self.styles = styles
+        self.widths = widths
+        self.max_sheet_rows = max_sheet_rows
+        self.max_rows_per_file = max_rows_per_file
+        self.sheet_title = sheet_title
+        self.output_files = []
+        self.sheet_count = 0
+        self.workbook = None
+        self.worksheet = None
+        self.make_cell = None
+        self.sheet_rows = 0
+        self.file_rows = 0
+
+    def room(self):
+        """
+        Number of rows that still fit on the current sheet and in the current file.
+        """
+        if self.worksheet is None:
+            return 0
+        room = self.max_sheet_rows - self.sheet_rows
+        if self.max_rows_per_file:
+            room = min(room, self.max_rows_per_file - self.file_rows)
+        return room
+
+    def spill(self):
+        """
+        Continue on a new sheet, in a new file if the current one is full.
+        """
+        if self.workbook is None or (self.max_rows_per_file and self.file_rows >= self.max_rows_per_file):
+            self._new_file()
+
+        from openpyxl.utils import get_column_letter  # Imported with openpyxl on first use
+
+        sheets_in_file = len(self.workbook.worksheets)
+        title = self.sheet_title if not sheets_in_file else f"{self.sheet_title} ({sheets_in_file + 1})"
+        self.worksheet = self.workbook.create_sheet(title)
+        # Write-only sheets need their column widths before the first row
+        for column, width in self.widths.items():
+            self.worksheet.column_dimensions[get_column_letter(column)].width = width
+        self.make_cell = _cell_factory(self.worksheet, self.styles)
+        self.sheet_rows = 0
+        self.sheet_count += 1
+        if self.sheet_count > 1:
+            logger.info("%s continued on sheet '%s' of %s", self.sheet_title, title, self.output_files[-1])
+
+    def _new_file(self):
+        """
+        Save the current workbook, if any, and start the next file.
+        """
+        from openpyxl import Workbook  # Imported on first use to keep start-up fast
+
+        if self.workbook is not None:
+            with timed("save"), phase("save"):
+                self.workbook.save(self.output_files[-1])
+            logger.info("Saved %s after %d rows; continuing in a new file.", self.output_files[-1], self.file_rows)
+
+        index = len(self.output_files) + 1
+        if index == 1:
+            path = self.output_path
+        else:
+            base, extension = os.path.splitext(self.output_path)
+            path = f"{base}_part{index}{extension}"
+        self.workbook = Workbook(write_only=True)
+        self.output_files.append(path)
+        self.file_rows = 0
+
+    def start_table(self, rows_needed):
+        """
+        Leave the two-row gap before a table, or move to a new sheet if the table's first rows do not fit.
+        """
+        if self.worksheet is not None and self.sheet_rows and self.room() >= 2 + rows_needed:
+            self.append([])
+            self.append([])
+        elif self.worksheet is None or self.sheet_rows:
+            self.spill()
+
+    def append(self, cells):
+        """
+        Append one row to the current sheet.
+        """
+        self.worksheet.append(cells)
+        self.sheet_rows += 1
+        self.file_rows += 1
+
+    def merge_last_row(self, width):
+        """
+        Merge the first `width` cells of the row just appended.
+        """
+        from openpyxl.utils import get_column_letter  # Imported with openpyxl on first use
+
+        if width > 1:
+            self.worksheet.merged_cells.add(f"A{self.sheet_rows}:{get_column_letter(width)}{self.sheet_rows}")
+
+
+def _append_heading(sheet, spec, continued=False):
+    """
+    Append a table's merged main header and, for header-over-rows tables, its sub-headers.
+    """
+    make_cell = sheet.make_cell
+    title = f"{spec['title']} (continued)" if continued else spec["title"]
+    sheet.append([make_cell(title, "title")])
+    if spec["layout"] == "vertical":
+        sheet.merge_last_row(2)
+    else:
+        sheet.merge_last_row(len(spec["headers"]))
+        sheet.append([make_cell(header, "header") for header in spec["headers"]])
+
+
+def _row_cells(make_cell, spec, row):
+    """
+    Build the cells of one data row.
+    """
+    if spec["layout"] == "vertical":
+        label, value = row
+        value_style = "bold" if label in spec["bold_labels"] else "data"
+        return [make_cell(label, "header"), make_cell(value, value_style)]
+    return [make_cell(value) for value in row]
+
+
+def _append_table(sheet, spec, rows, policies=None):
+    """
+    Append one table, repeating its heading wherever it spills, and return the data rows written.
+
+    Under the 'degrade' policy a row holding a value openpyxl rejects is written with
+    that value as text, and a table whose rows stop with an error ends with a notice row.
+    """
+    vertical = spec["layout"] == "vertical"
+    sheet.start_table((1 if vertical else 2) + 1)
+    _append_heading(sheet, spec)
+
+    written = 0
+    degraded = False
+    rows = iter(rows)
+    while True:
+        try:
+            row = next(rows)
+        except StopIteration:
+            break
+        except Exception as failed_rows:
+            handle_table_error(spec, failed_rows, policies)
+            sheet.append([sheet.make_cell(f"Table incomplete: {type(failed_rows).__name__}: {failed_rows}")])
+            break
+        if sheet.room() < 1:
+            sheet.spill()
+            _append_heading(sheet, spec, continued=True)
+        try:
+            cells = _row_cells(sheet.make_cell, spec, row)
+        except Exception as failed_row:
+            if not degraded:
+                handle_table_error(spec, failed_row, policies)
+                degraded = True
+            cells = _row_cells(sheet.make_cell, spec, [writable_value(value) for value in row])
+        sheet.append(cells)
+        written += 1
+    return written
+
+
+def write_streaming_tables(specs, styles, output_path, max_sheet_rows=EXCEL_MAX_ROWS, max_rows_per_file=None,
+                           sheet_title=SHEET_TITLE, policies=None):
+    """
+    Write the tables of the Case Details sheet, or of another sheet of stacked tables, into write-only workbooks.
+
+    Rows are taken from each spec's iterator and written straight to the sheet's
+    temporary file, so memory stays flat however long a table is. The layout
+    matches create_all_tables(): tables start in column A with two blank rows between them.
+    A table that does not fit continues on the next sheet or file under a repeated
+    '(continued)' heading; see SpillingSheetWriter.
+
+    Args:
+        specs (list): Table specs from case_table_specs(streaming=True).
+        styles (dict): Predefined styles for formatting.
+        output_path (str): Path of the first file.
+        max_sheet_rows (int): Rows per sheet, at most Excel's limit.
+        max_rows_per_file (int, optional): Rows per file; one file if omitted.
+        sheet_title (str): Title of the sheet the tables are written to.
+        policies (dict, optional): Error policy by table stage name; see errors.table_policy().
+
+    Returns:
+        SpillingSheetWriter: Its `workbook` is the last, still unsaved, file and
+        `output_files[-1]` the path to save it to; earlier files are already saved.
+
+    Outputs:
+        - Logs an error if a table cannot be written.
+
+    Exceptions:
+        - Raises TableError for a failing table under the 'fail' policy, ExportError for other failures.
+    """
+    try:
+        logger.debug("Streaming %s sheet...", sheet_title)
+
+        # Open every table and sample its first rows to size the columns
+        tables = []
+        lengths = {}
+        for spec in specs:
+            try:
+                rows = iter(spec["rows"]())
+                sample = list(islice(rows, WIDTH_SAMPLE_ROWS))
+            except Exception as failed_rows:
+                handle_table_error(spec, failed_rows, policies)
+                spec = unavailable_spec(spec, failed_rows)
+                rows = iter(())
+                sample = spec["rows"]()
+            if spec["optional"] and not sample:
+                continue
+            _sample_lengths(lengths, spec, sample)
+            tables.append((spec, chain(sample, rows)))
+
+        widths = {column: _column_width(max_length) for column, max_length in lengths.items()}
+        sheet = SpillingSheetWriter(output_path, styles, widths, max_sheet_rows, max_rows_per_file, sheet_title)
+        for spec, rows in tables:
+            check_deadline(spec["name"])
+            with timed(spec["name"]):
+                written = _append_table(sheet, spec, rows, policies)
+            record_table(spec["title"], written, table_cells(spec, written))
+
+        if sheet.workbook is None:
+            sheet.spill()
+
+        logger.debug("%s sheet streamed successfully.", sheet_title)
+        return sheet
+    except ExportError:
+        raise
+    except Exception as failed_stream_write:
+        logger.error(f"Failed to stream tables into sheet: {failed_stream_write}")
+        raise ExportError(f"Failed to stream tables into sheet: {failed_stream_write}") from failed_stream_write
@@ -0,0 +1,152 @@
+import logging
+from decimal import Decimal
+from .data_fetcher import sum_settlements, sum_payments, sum_commissions
+from .errors import TableError
+from .metrics import record_table
+from .stream_writer import _cell_factory, _column_width
+
+logger = logging.getLogger('excel_data_writer')
+
+SUMMARY_SHEET_TITLE = "Summary"
+
+# Row labels of the vertical Totals table
+TOTALS_HEADERS = [
+    "Settlement Amount", "Paid Amount", "Outstanding Balance", "Settlements", "Payments",
+    "Commissioned Amount", "Commissions"
+]
+
+PAYMENTS_BY_MONTH_HEADERS = ["Month", "Payments", "Paid Amount"]
+
+# Excel number formats of the summary figures
+AMOUNT_FORMAT = "#,##0.00"
+COUNT_FORMAT = "#,##0"
+
+TOTALS_FORMATS = {
+    "Settlement Amount": AMOUNT_FORMAT, "Paid Amount": AMOUNT_FORMAT, "Outstanding Balance": AMOUNT_FORMAT,
+    "Settlements": COUNT_FORMAT, "Payments": COUNT_FORMAT,
+    "Commissioned Amount": AMOUNT_FORMAT, "Commissions": COUNT_FORMAT,
+}
+PAYMENTS_BY_MONTH_FORMATS = [None, COUNT_FORMAT, AMOUNT_FORMAT]
+
+
+def excel_number(value):
+    """
+    Return a server-computed sum as a number openpyxl writes natively (Decimal128 becomes Decimal).
+
+    Args:
+        value: A number, Decimal128 or None read from an aggregation result.
+
+    Returns:
+        The value as an int, float or Decimal, or None.
+    """
+    return value.to_decimal() if hasattr(value, "to_decimal") else value
+
+
+def _difference(minuend, subtrahend):
+    """
+    Subtract two sums, in Decimal when either is a Decimal128 total.
+    """
+    if isinstance(minuend, Decimal) or isinstance(subtrahend, Decimal):
+        return Decimal(str(minuend)) - Decimal(str(subtrahend))
+    return minuend - subtrahend
+
+
+def case_totals(db, case_id):
+    """
+    Fetch the settlement, payment and commission totals of a case, computed by MongoDB.
+    """
+    return dict(sum_settlements(db, case_id), **sum_payments(db, case_id), **sum_commissions(db, case_id))
+
+
+def totals_rows(totals):
+    """
+    Prepare the [label, value] rows of the Totals table; the outstanding balance is the settlement amount less the amount paid.
+    """
+    settlement_amount = excel_number(totals["settlement_amount"])
+    paid_amount = excel_number(totals["paid_amount"])
+    values = {
+        "Settlement Amount": settlement_amount,
+        "Paid Amount": paid_amount,
+        "Outstanding Balance": _difference(settlement_amount, paid_amount) if totals["settlements"] else None,
+        "Settlements": totals["settlements"],
+        "Payments": totals["payments"],
+        "Commissioned Amount": excel_number(totals["commissioned_amount"]),
+        "Commissions": totals["commissions"],
+    }
+    return [[label, values[label]] for label in TOTALS_HEADERS]
+
+
+def payments_by_month_rows(totals):
+    """
+    Prepare the Payments by Month table rows, oldest month first and undated payments last.
+    """
+    months = sorted(totals["by_month"], key=lambda month: (month["month"] is None, month["month"] or ""))
+    return [[month["month"] or "No date", month["payments"], excel_number(month["paid_amount"])] for month in months]
+
+
+def _widths(rows):
+    widths = {}
+    for row in rows:
+        for column, value in enumerate(row, start=1):
+            text = f"{value:,.2f}" if isinstance(value, float) else str(value if value is not None else "")
+            widths[column] = max(widths.get(column, 0), len(text))
+    return {column: _column_width(length) for column, length in widths.items()}
+
+
+def create_summary_sheet(workBook, totals, styles):
+    """
+    Add the Summary sheet with the Totals and Payments by Month tables, as numeric cells.
+
+    Rows are appended, so the sheet is written the same way into in-memory and write-only workbooks.
+    """
+    try:
+        logger.debug("Creating Summary sheet...")
+        from openpyxl.utils import get_column_letter  # Imported with openpyxl on first use
+
+        worksheet = workBook.create_sheet(SUMMARY_SHEET_TITLE)
+        make_cell = _cell_factory(worksheet, styles)
+        totals_data = totals_rows(totals)
+        months_data = payments_by_month_rows(totals)
+
+        # Write-only sheets need their column widths before the first row
+        widths = _widths(totals_data + [PAYMENTS_BY_MONTH_HEADERS] + months_data)
+        for column, width in widths.items():
+            worksheet.column_dimensions[get_column_letter(column)].width = width
+
+        def merge(row, width):
+            cells = f"A{row}:{get_column_letter(width)}{row}"
+            if getattr(workBook, "write_only", False):
+                worksheet.merged_cells.add(cells)
+            else:
+                worksheet.merge_cells(cells)
+
+        def numeric(value, number_format):
+            cell = make_cell(value)
+            if number_format and value is not None:
+                cell.number_format = number_format
+            return cell
+
+        worksheet.append([make_cell("Totals", "title")])
+        merge(1, 2)
+        for label, value in totals_data:
+            worksheet.append([make_cell(label, "header"), numeric(value, TOTALS_FORMATS[label])])
+        record_table("Totals", len(totals_data), 1 + 2 * len(totals_data))
+
+        # Two blank rows between the tables, as on the Case Details sheet
+        worksheet.append([])
+        worksheet.append([])
+        title_row = len(totals_data) + 4
+        worksheet.append([make_cell("Payments by Month", "title")])
+        merge(title_row, len(PAYMENTS_BY_MONTH_HEADERS))
+        worksheet.append([make_cell(header, "header") for header in PAYMENTS_BY_MONTH_HEADERS])
+        for row in months_data:
+            worksheet.append([numeric(value, number_format)
+                              for value, number_format in zip(row, PAYMENTS_BY_MONTH_FORMATS)])
+        record_table("Payments by Month", len(months_data),
+                     1 + len(PAYMENTS_BY_MONTH_HEADERS) * (len(months_data) + 1))
+
+        logger.debug("Summary sheet created successfully.")
+        return worksheet
+    except Exception as failed_summary_sheet_creation:
+        logger.error(f"Failed to create Summary sheet: {failed_summary_sheet_creation}")
+        raise TableError("Summary", failed_summary_sheet_creation) from failed_summary_sheet_creation
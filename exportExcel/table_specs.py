@@ -0,0 +1,200 @@
+import logging  # Module for logging the tables left out of an export
+from .data_fetcher import (
+    get_settlement_data, get_settlement_plan_data, get_payments_data, get_commissions_data,
+    iter_payments, iter_commissions,
+    count_settlements, count_settlement_plans, count_payments, count_commissions
+)
+from .case_contact_tables import (
+    CASE_DETAILS_HEADERS, CASE_DETAILS_BOLD_HEADERS, CONTACT_HEADERS, case_details_rows, contact_rows
+)
+from .settlements_remarks import (
+    REMARKS_HEADERS, SETTLEMENT_HEADERS, SETTLEMENT_PLAN_HEADERS, remarks_rows, settlement_row, settlement_plan_row
+)
+from .approve_table import (
+    APPROVE_HEADERS, CASE_STATUS_HEADERS, ABNORMAL_STOP_HEADERS, approve_rows, case_status_rows, abnormal_stop_rows
+)
+from .drc_ro_tables import DRC_HEADERS, RO_HEADERS, drc_rows, ro_rows
+from .payments_table import PAYMENTS_HEADERS, payment_row
+from .ro_tables import RO_NEGOTIATIONS_HEADERS, RO_REQUESTS_HEADERS, ro_negotiations_rows, ro_requests_rows
+from .commissions_table import COMMISSIONS_HEADERS, commission_row
+from .preview import preview_title
+from .errors import FAIL, ExportTimeoutError, TableError, table_policy
+from .metrics import current_metrics
+
+logger = logging.getLogger('excel_data_writer')
+
+
+def table_spec(name, title, headers, rows, count, layout="table", optional=False, bold_labels=()):
+    """
+    Describe one table of the Case Details sheet.
+
+    Args:
+        name (str): Stage name the table is timed under.
+        title (str): Main header written above the table.
+        headers (list): Sub-headers, or the row labels of a vertical table.
+        rows (callable): Returns the table's rows; may return a lazy iterator.
+        count (callable): Returns the number of rows without building them.
+        layout (str): 'table' for a header row over data rows, 'vertical' for label/value pairs.
+        optional (bool): Leave the table out when it has no rows.
+        bold_labels (tuple): Labels of a vertical table whose value is written in bold.
+
+    Returns:
+        dict: The table spec.
+    """
+    return {
+        "name": name, "title": title, "headers": headers, "rows": rows, "count": count,
+        "layout": layout, "optional": optional, "bold_labels": bold_labels,
+    }
+
+
+def _array_length(case_data, key):
+    """
+    Length of an embedded array of the case document, treating a missing or null field as empty.
+    """
+    return len(case_data.get(key) or [])
+
+
+def case_table_specs(case_data, db, streaming=False, snapshot=None, preview=None):
+    """
+    List the tables of the Case Details sheet in the order they are written.
+
+    Args:
+        case_data (dict): The case document.
+        db (pymongo.database.Database): The MongoDB database instance.
+        streaming (bool): Read the Payments and Commissions rows through cursors instead of lists.
+        snapshot (dict, optional): Export snapshot of the case; its rows replace every further query.
+        preview (dict, optional): Preview of the case from preview_bundle(); its rows replace the
+            Settlement, Settlement Plan, Payments and Commissions queries, and the titles of
+            truncated tables say so.
+
+    Returns:
+        list: Table specs, see table_spec().
+    """
+    case_id = case_data.get("case_id")
+
+    if snapshot is not None or preview is not None:
+        rows = (snapshot if snapshot is not None else preview)["rows"]
+        arrears_bands = (snapshot.get("arrears_bands") or {}) if snapshot is not None else None
+        settlements, count_settlement_rows = lambda: rows["settlements"], lambda: len(rows["settlements"])
+        plans, count_plan_rows = lambda: rows["settlement_plans"], lambda: len(rows["settlement_plans"])
+        payments, count_payment_rows = lambda: rows["payments"], lambda: len(rows["payments"])
+        commissions, count_commission_rows = lambda: rows["commissions"], lambda: len(rows["commissions"])
+    else:
+        arrears_bands = None
+        settlements = lambda: [settlement_row(settlement) for settlement in get_settlement_data(db, case_id)]
+        count_settlement_rows = lambda: count_settlements(db, case_id)
+        plans = lambda: [settlement_plan_row(plan) for plan in get_settlement_plan_data(db, case_id)]
+        count_plan_rows = lambda: count_settlement_plans(db, case_id)
+        count_payment_rows = lambda: count_payments(db, case_id)
+        count_commission_rows = lambda: count_commissions(db, case_id)
+        if streaming:
+            payments = lambda: map(payment_row, iter_payments(db, case_id))
+            commissions = lambda: map(commission_row, iter_commissions(db, case_id))
+        else:
+            payments = lambda: [payment_row(payment) for payment in get_payments_data(db, case_id)]
+            commissions = lambda: [commission_row(transaction) for transaction in get_commissions_data(db, case_id)]
+
+    specs = [
+        table_spec("create_case_details_table", "Case Details", CASE_DETAILS_HEADERS,
+              lambda: case_details_rows(case_data, db, arrears_bands), lambda: len(CASE_DETAILS_HEADERS),
+              layout="vertical", bold_labels=CASE_DETAILS_BOLD_HEADERS),
+        table_spec("create_contact_details_table", "Contact Info", CONTACT_HEADERS,
+              lambda: contact_rows(case_data), lambda: _array_length(case_data, "contact")),
+        table_spec("create_remarks_table", "Remarks", REMARKS_HEADERS,
+              lambda: remarks_rows(case_data), lambda: _array_length(case_data, "remark")),
+        table_spec("create_settlement_table", "Settlement Details", SETTLEMENT_HEADERS,
+              settlements, count_settlement_rows, optional=True),
+        table_spec("create_settlement_plan_table", "Settlement Plan", SETTLEMENT_PLAN_HEADERS,
+              plans, count_plan_rows, optional=True),
+        table_spec("create_approve_table", "Approve Details", APPROVE_HEADERS,
+              lambda: approve_rows(case_data), lambda: _array_length(case_data, "approve")),
+        table_spec("create_case_status_table", "Case Status", CASE_STATUS_HEADERS,
+              lambda: case_status_rows(case_data), lambda: _array_length(case_data, "case_status")),
+        table_spec("create_abnormal_stop_table", "Abnormal Stop", ABNORMAL_STOP_HEADERS,
+              lambda: abnormal_stop_rows(case_data), lambda: _array_length(case_data, "abnormal_stop")),
+        table_spec("create_drc_table", "Debt Recovery Company (DRC)", DRC_HEADERS,
+              lambda: drc_rows(case_data), lambda: _array_length(case_data, "drc")),
+        table_spec("create_ro_table", "Recovery Officer (RO)", RO_HEADERS,
+              lambda: ro_rows(case_data),
+              lambda: sum(_array_length(drc, "recovery_officers") for drc in case_data.get("drc") or [])),
+        table_spec("create_payments_table", "Payments", PAYMENTS_HEADERS,
+              payments, count_payment_rows),
+        table_spec("create_ro_negotiations_table", "Recovery Officer Negotiations", RO_NEGOTIATIONS_HEADERS,
+              lambda: ro_negotiations_rows(case_data), lambda: _array_length(case_data, "ro_negotiation")),
+        table_spec("create_ro_requests_table", "Recovery Officer Requests", RO_REQUESTS_HEADERS,
+              lambda: ro_requests_rows(case_data), lambda: _array_length(case_data, "ro_requests")),
+        table_spec("create_commissions_table", "Commissions", COMMISSIONS_HEADERS,
+              commissions, count_commission_rows, optional=True),
+    ]
+    if preview is not None:
+        for spec in specs:
+            if spec["name"] in preview["truncated"]:
+                spec["title"] = preview_title(spec["title"], preview["limit"])
+    return specs
+
+
+def handle_table_error(spec, error, policies=None):
+    """
+    Apply a table's error policy to an error raised while building or writing it.
+
+    Under 'fail' a TableError is raised; under 'degrade' the error is logged and the
+    table is recorded in the export's metrics as 'degraded_tables', and the caller
+    goes on with what it can still write. A passed deadline is never degraded: the
+    ExportTimeoutError is raised again, whatever the policy.
+
+    Args:
+        spec (dict): The table spec.
+        error (Exception): The error.
+        policies (dict, optional): Policy by table stage name; see errors.table_policy().
+
+    Exceptions:
+        - Raises TableError if the table's policy is 'fail', and ExportTimeoutError again.
+    """
+    if isinstance(error, ExportTimeoutError):
+        raise error
+    if table_policy(policies, spec["name"]) == FAIL:
+        raise TableError(spec["title"], error) from error
+    logger.warning(f"Table '{spec['title']}' degraded: {error!r}")
+    metrics = current_metrics()
+    if metrics is not None:
+        metrics.info.setdefault("degraded_tables", {})[spec["name"]] = repr(error)
+
+
+def unavailable_spec(spec, error):
+    """
+    Replace a table whose rows could not be built by a one-row notice under its title.
+    """
+    message = f"{type(error).__name__}: {error}"
+    return table_spec(spec["name"], f"{spec['title']} (unavailable)", ["Error"], lambda: [[message]], lambda: 1)
+
+
+def table_cells(spec, rows):
+    """
+    Number of cells a table with `rows` data rows occupies, headers included.
+
+    Args:
+        spec (dict): The table spec.
+        rows (int): Number of data rows.
+
+    Returns:
+        int: Main header plus sub-header and data cells.
+    """
+    if spec["layout"] == "vertical":
+        return 1 + 2 * rows
+    return 1 + len(spec["headers"]) * (rows + 1)
+
+
+def table_rows(spec, rows):
+    """
+    Number of sheet rows a table with `rows` data rows occupies, headers included.
+
+    Args:
+        spec (dict): The table spec.
+        rows (int): Number of data rows.
+
+    Returns:
+        int: Main header row, sub-header row of header-over-rows tables, and data rows.
+    """
+    if spec["layout"] == "vertical":
+        return 1 + rows
+    return 2 + rows
@@ -1,6 +1,6 @@
 import logging
-import sys
-from openpyxl.styles import Font, PatternFill, Border, Side, Alignment
+from .errors import TableError
+from .metrics import record_table
 
 logger = logging.getLogger('excel_data_writer')
 
@@ -42,8 +42,79 @@ def create_table(worksheet, x_pointer, y_pointer, main_header, sub_headers, data
             adjusted_width = (max_length + 2) * 1.2
             worksheet.column_dimensions[column_letter].width = adjusted_width
         
-        logger.info(f"Table '{main_header}' created successfully.")
+        # Main header plus sub-header and data cells
+        record_table(main_header, len(data), 1 + len(sub_headers) * (len(data) + 1))
+        
+        logger.debug("Table '%s' created successfully.", main_header)
         return x_pointer + len(data) + 3
     except Exception as failed_table_creation:
         logger.error(f"Failed to create table: {failed_table_creation}")
-        sys.exit(1)
\ No newline at end of file
+        raise TableError(main_header, failed_table_creation) from failed_table_creation
+
+def create_vertical_table(worksheet, x_pointer, y_pointer, main_header, rows, styles, bold_labels=()):
+    """
+    Create a two-column table with a main header and one [label, value] pair per row.
+    """
+    try:
+        # Merge cells for the main header
+        worksheet.merge_cells(start_row=x_pointer, start_column=y_pointer, end_row=x_pointer, end_column=y_pointer + 1)
+        main_header_cell = worksheet.cell(row=x_pointer, column=y_pointer, value=main_header)
+        main_header_cell.font = styles["header_font"]
+        main_header_cell.fill = styles["main_header_fill"]
+        main_header_cell.border = styles["cell_border"]
+        main_header_cell.alignment = styles["main_header_alignment"]
+        
+        # Move to the next row for the table
+        x_pointer += 1
+        
+        # Write labels and values horizontally
+        for index, (label, value) in enumerate(rows):
+            # Write the label in the first column
+            label_cell = worksheet.cell(row=x_pointer + index, column=y_pointer, value=label)
+            label_cell.font = styles["header_font"]
+            label_cell.fill = styles["sub_header_fill"]
+            label_cell.border = styles["cell_border"]
+            label_cell.alignment = styles["sub_header_alignment"]
+            
+            # Write the corresponding value in the next column
+            value_cell = worksheet.cell(row=x_pointer + index, column=y_pointer + 1, value=value)
+            value_cell.border = styles["cell_border"]
+            if label in bold_labels:
+                value_cell.font = styles["bold_font"]
+        
+        # Adjust column widths
+        for col in range(y_pointer, y_pointer + 2):  # Only two columns (labels and values)
+            max_length = 0
+            column_letter = chr(64 + col)
+            for row in range(x_pointer, x_pointer + len(rows)):
+                cell_value = worksheet.cell(row=row, column=col).value
+                if cell_value and len(str(cell_value)) > max_length:
+                    max_length = len(str(cell_value))
+            adjusted_width = (max_length + 2) * 1.2
+            worksheet.column_dimensions[column_letter].width = adjusted_width
+        
+        # Main header plus one label and one value cell per row
+        record_table(main_header, len(rows), 1 + 2 * len(rows))
+        
+        logger.debug("Table '%s' created successfully.", main_header)
+        return x_pointer + len(rows) + 1
+    except Exception as failed_table_creation:
+        logger.error(f"Failed to create table: {failed_table_creation}")
+        raise TableError(main_header, failed_table_creation) from failed_table_creation
+
+def writable_value(value):
+    """
+    Return a value openpyxl can store: unsupported types (dicts, lists, ObjectIds) as text, without illegal characters.
+    """
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE, KNOWN_TYPES  # Imported with openpyxl on first use
+
+    if isinstance(value, KNOWN_TYPES) and not isinstance(value, (str, bytes)):
+        return value
+    text = value.decode("utf-8", "replace") if isinstance(value, bytes) else str(value)
+    return ILLEGAL_CHARACTERS_RE.sub("", text)
+
+def writable_rows(rows):
+    """
+    Apply writable_value() to every value of a table's rows.
+    """
+    return [[writable_value(value) for value in row] for row in rows]
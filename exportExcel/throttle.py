@@ -0,0 +1,176 @@
+import logging  # Module for logging errors and debug information
+import threading  # Locks shared by the export threads
+import time  # Module for token refills and query latencies
+from contextlib import contextmanager
+from .metrics import timed  # Time spent waiting for the throttle, per export
+
+# Initialize logger for this module
+logger = logging.getLogger('excel_data_writer')
+
+# Query latencies collected before the adaptive limit is reconsidered
+ADJUST_EVERY = 50
+
+# Fraction of the limit kept when the latency target is exceeded
+DECREASE_FACTOR = 0.75
+
+# Process-wide throttle used by data_fetcher; see install_throttle()
+_throttle = None
+
+
+def _percentile(sorted_values, fraction):
+    """
+    Return the value below which `fraction` of the sorted values fall (nearest rank).
+    """
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+class TokenBucket:
+    """
+    Token-bucket rate limit: `rate` queries per second on average, bursts of up to `burst`.
+
+    Callers reserve a token and sleep until it is due, so waiting threads are served in
+    arrival order and never spin.
+    """
+
+    def __init__(self, rate, burst=None):
+        """
+        Args:
+            rate (float): Tokens added per second.
+            burst (int, optional): Bucket size; defaults to one second's worth of tokens.
+        """
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Take one token, sleeping until it is available.
+
+        Returns:
+            float: Seconds spent waiting.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class QueryThrottle:
+    """
+    Limits the exporter's load on MongoDB: a query rate, a number of queries in flight,
+    and optionally a latency target that adapts the number in flight.
+
+    In adaptive mode the p95 latency of the last ADJUST_EVERY queries is compared with
+    the target: above it the limit drops to DECREASE_FACTOR of its value, below 80% of
+    it the limit grows by one, up to max_concurrency. Rising latency on the primary
+    thus slows the exporter down until production traffic has its headroom back.
+    """
+
+    def __init__(self, queries_per_second=None, burst=None, max_concurrency=None, min_concurrency=1,
+                 target_p95_ms=None):
+        """
+        Args:
+            queries_per_second (float, optional): Average query rate; unlimited if omitted.
+            burst (int, optional): Queries allowed at once above the average rate.
+            max_concurrency (int, optional): Queries in flight across all export threads; unlimited if omitted.
+            min_concurrency (int): Lowest limit the adaptive mode goes down to.
+            target_p95_ms (float, optional): p95 query latency to stay below; enables the adaptive mode.
+
+        Exceptions:
+            - Raises ValueError if the adaptive mode is enabled without max_concurrency.
+        """
+        if target_p95_ms and not max_concurrency:
+            raise ValueError("The adaptive throttle needs max_concurrency as its upper limit")
+        self.bucket = TokenBucket(queries_per_second, burst) if queries_per_second else None
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = max(1, min(min_concurrency, max_concurrency or min_concurrency))
+        self.target_seconds = target_p95_ms / 1000 if target_p95_ms else None
+        self.limit = max_concurrency
+        self._in_flight = 0
+        self._latencies = []
+        self._condition = threading.Condition()
+
+    def _acquire_slot(self):
+        with self._condition:
+            while self.limit is not None and self._in_flight >= self.limit:
+                self._condition.wait()
+            self._in_flight += 1
+
+    def _release_slot(self, seconds):
+        with self._condition:
+            self._in_flight -= 1
+            if self.target_seconds is not None:
+                self._latencies.append(seconds)
+                if len(self._latencies) >= ADJUST_EVERY:
+                    self._adjust()
+            self._condition.notify_all()
+
+    def _adjust(self):
+        """
+        Move the concurrency limit toward the latency target; called with the condition held.
+        """
+        latencies = sorted(self._latencies)
+        self._latencies = []
+        p50, p95 = _percentile(latencies, 0.50), _percentile(latencies, 0.95)
+        previous = self.limit
+        if p95 > self.target_seconds:
+            self.limit = max(self.min_concurrency, int(self.limit * DECREASE_FACTOR))
+        elif p95 < 0.8 * self.target_seconds:
+            self.limit = min(self.max_concurrency, self.limit + 1)
+        if self.limit != previous:
+            logger.info(
+                f"Query p50 {p50 * 1000:.1f} ms, p95 {p95 * 1000:.1f} ms against a target of "
+                f"{self.target_seconds * 1000:.0f} ms; queries in flight limited to {self.limit} (was {previous})."
+            )
+
+    @contextmanager
+    def query(self):
+        """
+        Wait for a token and a free slot, then run the enclosed query and record its latency.
+
+        The wait is recorded as stage 'throttle_wait' of the running export.
+        """
+        with timed("throttle_wait"):
+            if self.bucket is not None:
+                self.bucket.acquire()
+            self._acquire_slot()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._release_slot(time.perf_counter() - started)
+
+
+def install_throttle(throttle):
+    """
+    Make `throttle` limit every query issued through data_fetcher, in all threads.
+
+    Args:
+        throttle (QueryThrottle): The throttle, or None to remove it.
+
+    Returns:
+        QueryThrottle: The throttle installed before, or None.
+    """
+    global _throttle
+    previous, _throttle = _throttle, throttle
+    return previous
+
+
+@contextmanager
+def throttled():
+    """
+    Run the enclosed query under the installed throttle, if any.
+    """
+    if _throttle is None:
+        yield
+    else:
+        with _throttle.query():
+            yield
@@ -1,65 +1,74 @@
 import configparser
-from datetime import datetime, timedelta
+from datetime import datetime
 import logging
 import logging.config
 import os
 import sys
-from pymongo import MongoClient
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Border, Side, Alignment
-from bson import ObjectId
 
-# Load logger configuration
-logging.config.fileConfig('Config/logger/loggers.ini')
 logger = logging.getLogger('excel_data_writer')
 
-# Load styles globally
-config = configparser.ConfigParser()
-try:
-    config.read(os.path.join(os.path.dirname(__file__), '../Config/styles.ini'))
-    if not config.has_section("MAIN_HEADER_FILLS"):
-        logger.error("Section 'MAIN_HEADER_FILLS' not found in styles.ini.")
+# Styles are filled in by load_styles() so that importing this module stays
+# free of file I/O; openpyxl and pymongo are imported where they are used.
+styles = {}
+
+def init_logging():
+    """
+    Load the logger configuration from loggers.ini.
+    """
+    logging.config.fileConfig('Config/logger/loggers.ini')
+
+def load_styles():
+    """
+    Load styles.ini into the module-level styles dictionary.
+    """
+    from openpyxl.styles import Font, PatternFill, Border, Side, Alignment
+
+    config = configparser.ConfigParser()
+    try:
+        config.read(os.path.join(os.path.dirname(__file__), '../Config/styles.ini'))
+        if not config.has_section("MAIN_HEADER_FILLS"):
+            logger.error("Section 'MAIN_HEADER_FILLS' not found in styles.ini.")
+            sys.exit(1)
+    except Exception as e:
+        logger.error(f"Failed to load styles.ini: {e}")
         sys.exit(1)
-except Exception as e:
-    logger.error(f"Failed to load styles.ini: {e}")
-    sys.exit(1)
 
-#region Styles for tables and fonts
-styles = {
-    "header_font": Font(
-        bold=config.getboolean("FONTS", "header_font_bold"),
-        color=config.get("FONTS", "header_font_color"),
-        size=config.getint("FONTS", "header_font_size")
-    ),
-    "bold_font": Font(
-        bold=config.getboolean("FONTS", "bold_font_bold")
-    ),
-    "main_header_fill": PatternFill(
-        start_color=config.get("MAIN_HEADER_FILLS", "main_header_fill_start_color"),
-        end_color=config.get("MAIN_HEADER_FILLS", "main_header_fill_end_color"),
-        fill_type=config.get("MAIN_HEADER_FILLS", "main_header_fill_type")
-    ),
-    "sub_header_fill": PatternFill(
-        start_color=config.get("SUB_HEADER_FILLS", "header_fill_start_color"),
-        end_color=config.get("SUB_HEADER_FILLS", "header_fill_end_color"),
-        fill_type=config.get("SUB_HEADER_FILLS", "header_fill_type")
-    ),
-    "cell_border": Border(
-        left=Side(style=config.get("BORDERS", "cell_border_left_style")),
-        right=Side(style=config.get("BORDERS", "cell_border_right_style")),
-        top=Side(style=config.get("BORDERS", "cell_border_top_style")),
-        bottom=Side(style=config.get("BORDERS", "cell_border_bottom_style"))
-    ),
-    "sub_header_alignment": Alignment(
-        horizontal=config.get("SUB_HEADER_ALIGNMENTS", "header_alignment_horizontal"),
-        vertical=config.get("SUB_HEADER_ALIGNMENTS", "header_alignment_vertical")
-    ),
-    "main_header_alignment": Alignment(
-        horizontal=config.get("MAIN_HEADER_ALIGNMENTS", "main_header_alignment_horizontal"),
-        vertical=config.get("MAIN_HEADER_ALIGNMENTS", "main_header_alignment_vertical")
-    )
-}
-#endregion
+    #region Styles for tables and fonts
+    styles.update({
+        "header_font": Font(
+            bold=config.getboolean("FONTS", "header_font_bold"),
+            color=config.get("FONTS", "header_font_color"),
+            size=config.getint("FONTS", "header_font_size")
+        ),
+        "bold_font": Font(
+            bold=config.getboolean("FONTS", "bold_font_bold")
+        ),
+        "main_header_fill": PatternFill(
+            start_color=config.get("MAIN_HEADER_FILLS", "main_header_fill_start_color"),
+            end_color=config.get("MAIN_HEADER_FILLS", "main_header_fill_end_color"),
+            fill_type=config.get("MAIN_HEADER_FILLS", "main_header_fill_type")
+        ),
+        "sub_header_fill": PatternFill(
+            start_color=config.get("SUB_HEADER_FILLS", "header_fill_start_color"),
+            end_color=config.get("SUB_HEADER_FILLS", "header_fill_end_color"),
+            fill_type=config.get("SUB_HEADER_FILLS", "header_fill_type")
+        ),
+        "cell_border": Border(
+            left=Side(style=config.get("BORDERS", "cell_border_left_style")),
+            right=Side(style=config.get("BORDERS", "cell_border_right_style")),
+            top=Side(style=config.get("BORDERS", "cell_border_top_style")),
+            bottom=Side(style=config.get("BORDERS", "cell_border_bottom_style"))
+        ),
+        "sub_header_alignment": Alignment(
+            horizontal=config.get("SUB_HEADER_ALIGNMENTS", "header_alignment_horizontal"),
+            vertical=config.get("SUB_HEADER_ALIGNMENTS", "header_alignment_vertical")
+        ),
+        "main_header_alignment": Alignment(
+            horizontal=config.get("MAIN_HEADER_ALIGNMENTS", "main_header_alignment_horizontal"),
+            vertical=config.get("MAIN_HEADER_ALIGNMENTS", "main_header_alignment_vertical")
+        )
+    })
+    #endregion
 
 def get_config():
     """
@@ -81,6 +90,8 @@ def connect_db(config):
     Connect to the MongoDB database using the configuration.
     """
     try:
+        from pymongo import MongoClient
+
         client = MongoClient(config['DATABASE']['MONGO_URI'])
         db = client[config['DATABASE']['DB_NAME']]
         logger.info("Successfully connected to the database.")
@@ -121,7 +132,7 @@ def get_settlement_data(db, case_id):
         settlements_collection = db["Case_settlements"]
         settlements = list(settlements_collection.find({"case_id": case_id}))
         if settlements:
-            logger.info(f"Found {len(settlements)} settlement records for case_id: {case_id}")
+            logger.debug("Found %d settlement records for case_id: %s", len(settlements), case_id)
         else:
             logger.warning(f"No settlement records found for case_id: {case_id}")
         return settlements
@@ -144,7 +155,7 @@ def get_settlement_plan_data(db, case_id):
                     plan["settlement_id"] = settlement.get("settlement_id")
                     settlement_plans.append(plan)
         if settlement_plans:
-            logger.info(f"Found {len(settlement_plans)} settlement plan records for case_id: {case_id}")
+            logger.debug("Found %d settlement plan records for case_id: %s", len(settlement_plans), case_id)
         else:
             logger.warning(f"No settlement plan records found for case_id: {case_id}")
         return settlement_plans
@@ -190,7 +201,7 @@ def create_table(ws, start_row, start_col, main_header, sub_headers, data, style
             adjusted_width = (max_length + 2) * 1.2
             ws.column_dimensions[column_letter].width = adjusted_width
         
-        logger.info(f"Table '{main_header}' created successfully.")
+        logger.debug("Table '%s' created successfully.", main_header)
         return start_row + len(data) + 3
     except Exception as e:
         logger.error(f"Failed to create table: {e}")
@@ -201,7 +212,7 @@ def create_case_details_table(ws, case_data, start_row, start_col, db):
     Create the Case Details table in the worksheet with a horizontal layout and a start_process header.
     """
     try:
-        logger.info("Creating Case Details table...")
+        logger.debug("Creating Case Details table...")
         
         # Define the start_process header
         main_header = "Case Details"
@@ -285,7 +296,7 @@ def create_case_details_table(ws, case_data, start_row, start_col, db):
             adjusted_width = (max_length + 2) * 1.2
             ws.column_dimensions[column_letter].width = adjusted_width
         
-        logger.info("Case Details table created successfully.")
+        logger.debug("Case Details table created successfully.")
         return start_row + len(headers) + 1
     except Exception as e:
         logger.error(f"Failed to create Case Details table: {e}")
@@ -296,7 +307,7 @@ def create_contact_details_table(ws, case_data, start_row, start_col):
     Create the Contact Details table in the worksheet.
     """
     try:
-        logger.info("Creating Contact Details table...")
+        logger.debug("Creating Contact Details table...")
         contacts_headers = ["Mobile", "Email", "Home Phone", "Address"]
         
         # Prepare data for the table
@@ -306,7 +317,7 @@ def create_contact_details_table(ws, case_data, start_row, start_col):
         # Create the table
         next_row = create_table(ws, start_row, start_col, "Contact Info", contacts_headers, data, styles)
         
-        logger.info("Contact Details table created successfully.")
+        logger.debug("Contact Details table created successfully.")
         return next_row
     except Exception as e:
         logger.error(f"Failed to create Contact Details table: {e}")
@@ -317,7 +328,7 @@ def create_remarks_table(ws, case_data, start_row, start_col):
     Create the Remarks table in the worksheet.
     """
     try:
-        logger.info("Creating Remarks table...")
+        logger.debug("Creating Remarks table...")
         headers = ["Remark", "Remark Added by", "Remark Added Date"]
         
         # Prepare data for the table
@@ -327,7 +338,7 @@ def create_remarks_table(ws, case_data, start_row, start_col):
         # Create the table
         next_row = create_table(ws, start_row, start_col, "Remarks", headers, data, styles)
         
-        logger.info("Remarks table created successfully.")
+        logger.debug("Remarks table created successfully.")
         return next_row
     except Exception as e:
         logger.error(f"Failed to create Remarks table: {e}")
@@ -338,7 +349,7 @@ def create_settlement_table(ws, settlements, start_row, start_col):
     Create the Settlement table in the worksheet.
     """
     try:
-        logger.info("Creating Settlement table...")
+        logger.debug("Creating Settlement table...")
         headers = [
             "Settlement ID", "Case ID", "DRC Name", "RO Name", "Status", "Status reason",
             "Status DTM", "Settlement Type", "Settlement Amount", "Settlement Phase",
@@ -360,7 +371,7 @@ def create_settlement_table(ws, settlements, start_row, start_col):
         # Create the table
         next_row = create_table(ws, start_row, start_col, "Settlement Details", headers, data, styles)
         
-        logger.info("Settlement table created successfully.")
+        logger.debug("Settlement table created successfully.")
         return next_row
     except Exception as e:
         logger.error(f"Failed to create Settlement table: {e}")
@@ -371,7 +382,7 @@ def create_settlement_plan_table(ws, settlement_plans, start_row, start_col):
     Create the Settlement Plan table in the worksheet.
     """
     try:
-        logger.info("Creating Settlement Plan table...")
+        logger.debug("Creating Settlement Plan table...")
         headers = [
             "Settlement ID", "Installment Sequence", "Installment Settle Amount",
             "Accumulated Amount", "Plan Date and Time"
@@ -389,7 +400,7 @@ def create_settlement_plan_table(ws, settlement_plans, start_row, start_col):
         # Create the table
         next_row = create_table(ws, start_row, start_col, "Settlement Plan", headers, data, styles)
         
-        logger.info("Settlement Plan table created successfully.")
+        logger.debug("Settlement Plan table created successfully.")
         return next_row
     except Exception as e:
         logger.error(f"Failed to create Settlement Plan table: {e}")
@@ -400,7 +411,7 @@ def create_all_tables(wb, case_data, db):
     Create the Case Details sheet with all tables.
     """
     try:
-        logger.info("Creating Case Details sheet...")
+        logger.debug("Creating Case Details sheet...")
         ws = wb.active
         ws.title = "Case Details"
         
@@ -441,7 +452,7 @@ def create_all_tables(wb, case_data, db):
         if settlement_plans:
             create_settlement_plan_table(ws, settlement_plans, gap_row, start_col)
         
-        logger.info("Case Details sheet created successfully.")
+        logger.debug("Case Details sheet created successfully.")
         return ws
     except Exception as e:
         logger.error(f"Failed to create Case Details sheet: {e}")
@@ -461,8 +472,11 @@ def export_all_tables(db, incident_id, output_path, collection_name):
             logger.error(f"No case details found for Incident ID: {incident_id}")
             sys.exit(1)
         
-        logger.info(f"Case data found: {case_data}")
+        # Only the incident ID is logged; the full case document can be very large
+        logger.debug("Case data found for Incident ID: %s", incident_id)
         
+        from openpyxl import Workbook
+
         wb = Workbook()
         ws = create_all_tables(wb, case_data, db)
         
@@ -504,6 +518,8 @@ def start_process():
     """
     Main function to execute the case details export process.
     """
+    init_logging()
+    load_styles()
     try:
         logger.info("Starting case details export process...")
         config = get_config()
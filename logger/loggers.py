@@ -2,22 +2,37 @@ import logging
 import logging.config
 import os
 
-# Ensure the logs directory exists
 logs_dir = os.path.join(os.path.dirname(__file__), "logs")
-os.makedirs(logs_dir, exist_ok=True)
-
-# Load logger configuration from loggers.ini
 config_file = os.path.join(os.path.dirname(__file__), "../Config/logger/loggers.ini")
-logging.config.fileConfig(config_file)
+
+_initialized = False
+
+def init_logging():
+    """
+    Creates the logs directory and loads the logger configuration from loggers.ini.
+
+    Safe to call more than once; only the first call has any effect.
+    """
+    global _initialized
+    if _initialized:
+        return
+    # Ensure the logs directory exists
+    os.makedirs(logs_dir, exist_ok=True)
+    # Load logger configuration from loggers.ini
+    logging.config.fileConfig(config_file)
+    _initialized = True
 
 def get_logger(name: str) -> logging.Logger:
     """
     Retrieves a logger with the specified name.
-    
+
+    Logging is configured on first use rather than at import time.
+
     Args:
         name (str): The name of the logger.
-    
+
     Returns:
         logging.Logger: The configured logger.
     """
-    return logging.getLogger(name)
\ No newline at end of file
+    init_logging()
+    return logging.getLogger(name)
@@ -0,0 +1,120 @@
+import itertools
+import os
+import sys
+
+import pytest
+
+# The repository root, on sys.path so that the tests import exportExcel and main from it
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, REPO_ROOT)
+
+# MongoDB used by the tests that need a real server; they are skipped if it is unreachable
+MONGO_URI = os.environ.get("DRS_TEST_MONGO_URI", "mongodb://localhost:27017/")
+
+
+@pytest.fixture
+def repo_root():
+    """
+    The repository root, the working directory the exporter runs from.
+    """
+    return REPO_ROOT
+
+
+@pytest.fixture
+def mock_db():
+    """
+    An empty mongomock 'DRS' database; the test is skipped if mongomock is not installed.
+    """
+    mongomock = pytest.importorskip("mongomock")
+    return mongomock.MongoClient()["DRS"]
+
+
+@pytest.fixture
+def mongo_uri():
+    """
+    The URI of the MongoDB server at DRS_TEST_MONGO_URI; the test is skipped if it is unreachable.
+    """
+    pymongo = pytest.importorskip("pymongo")
+    client = pymongo.MongoClient(MONGO_URI, serverSelectionTimeoutMS=500)
+    try:
+        client.admin.command("ping")
+    except pymongo.errors.PyMongoError:
+        pytest.skip(f"no MongoDB reachable at {MONGO_URI}")
+    finally:
+        client.close()
+    return MONGO_URI
+
+
+@pytest.fixture
+def live_db(mongo_uri):
+    """
+    An empty database of its own on the real MongoDB server, dropped after the test.
+    """
+    import uuid
+
+    import pymongo
+
+    client = pymongo.MongoClient(mongo_uri)
+    db = client[f"DRS_test_{uuid.uuid4().hex[:8]}"]
+    try:
+        yield db
+    finally:
+        client.drop_database(db.name)
+        client.close()
+
+
+@pytest.fixture
+def styles(repo_root):
+    """
+    The styles loaded from Config/styles.ini.
+    """
+    from exportExcel.excel_styles import load_styles
+
+    return load_styles(os.path.join(repo_root, "Config", "styles.ini"))
+
+
+def _bind(value, variables):
+    """
+    Replace the '$$name' references of a lookup pipeline with the values of its `let` variables.
+    """
+    if isinstance(value, dict):
+        return {key: _bind(item, variables) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_bind(item, variables) for item in value]
+    if isinstance(value, str) and value[2:] in variables and value.startswith("$$"):
+        return variables[value[2:]]
+    return value
+
+
+@pytest.fixture
+def pipeline_lookups(monkeypatch):
+    """
+    Run $lookup stages with a pipeline, which mongomock lacks, one joined document at a time.
+
+    `let` variables may only name top-level fields of the joined documents.
+    """
+    from mongomock.collection import Collection
+
+    aggregate = Collection.aggregate
+    joins = itertools.count()
+
+    def emulated_aggregate(self, pipeline, *args, **kwargs):
+        for index, stage in enumerate(pipeline):
+            lookup = stage.get("$lookup", {})
+            if "pipeline" not in lookup:
+                continue
+            documents = list(aggregate(self, pipeline[:index]))
+            for document in documents:
+                # Unwound documents share their _id; the joined copies get new ones
+                document.pop("_id", None)
+                variables = {name: document.get(field[1:]) for name, field in lookup.get("let", {}).items()}
+                document[lookup["as"]] = list(
+                    aggregate(self.database[lookup["from"]], _bind(lookup["pipeline"], variables))
+                )
+            joined = self.database[f"joined_{next(joins)}"]
+            if documents:
+                joined.insert_many(documents)
+            return emulated_aggregate(joined, pipeline[index + 1:], *args, **kwargs)
+        return aggregate(self, pipeline, *args, **kwargs)
+
+    monkeypatch.setattr(Collection, "aggregate", emulated_aggregate)
@@ -0,0 +1,69 @@
+from datetime import datetime
+
+import pytest
+
+INCIDENT_IDS = [2025, 2026, 2027]
+
+
+@pytest.fixture
+def db(mock_db):
+    mock_db["Case_details"].insert_many([
+        {"case_id": 1, "incident_id": 2025, "current_arrears_amount": 1500},
+        # A malformed remark fails the Remarks table, and with it the export
+        {"case_id": 2, "incident_id": 2026, "current_arrears_amount": 10,
+         "remark": [{"remark": {"text": "first call"}, "remark_added_date": datetime(2025, 1, 1)}]},
+        {"case_id": 3, "incident_id": 2027, "current_arrears_amount": 20},
+    ])
+    return mock_db
+
+
+def test_run_key_is_stable_across_id_order():
+    from exportExcel.checkpoint import run_key
+
+    assert run_key("Case_details", INCIDENT_IDS) == run_key("Case_details", list(reversed(INCIDENT_IDS)))
+    assert run_key("Case_details", INCIDENT_IDS) != run_key("Case_details", INCIDENT_IDS[:2])
+    assert run_key("Case_details", query={"a": 1, "b": 2}) == run_key("Case_details", query={"b": 2, "a": 1})
+
+
+def test_checkpoint_is_abstract():
+    from exportExcel.checkpoint import Checkpoint
+
+    with pytest.raises(TypeError):
+        Checkpoint("run")
+
+
+def test_resume_skips_done_cases_and_gives_up_on_failing_ones(db, tmp_path, styles):
+    from exportExcel.batch import export_batch
+    from exportExcel.checkpoint import SqliteCheckpoint, run_key
+
+    checkpoint_path = str(tmp_path / "checkpoints" / "export_checkpoints.sqlite")
+    output_path = tmp_path / "exports"
+
+    def run(incident_ids):
+        checkpoint = SqliteCheckpoint(checkpoint_path, run_key("Case_details", incident_ids), max_attempts=2)
+        try:
+            results, _ = export_batch(db, incident_ids, str(output_path), "Case_details", styles,
+                                      checkpoint=checkpoint, render_mode="memory", summary_sheet=False)
+            return {result["incident_id"]: result for result in results}, checkpoint.counts(), checkpoint.get(2026)
+        finally:
+            checkpoint.close()
+
+    results, counts, failing = run(INCIDENT_IDS)
+    assert [results[incident_id]["status"] for incident_id in INCIDENT_IDS] == ["ok", "failed", "ok"]
+    assert counts == {"ok": 2, "failed": 1} and failing["attempts"] == 1
+    exported = sorted(path.name for path in output_path.iterdir())
+    assert len(exported) == 2
+
+    # Resumed in another order: the same run, so only the failing case is exported again
+    results, counts, failing = run(list(reversed(INCIDENT_IDS)))
+    assert [results[incident_id]["status"] for incident_id in INCIDENT_IDS] == ["skipped", "failed", "skipped"]
+    assert results[2025]["output_path"] == str(output_path / exported[0])
+    assert failing["attempts"] == 2 and results[2026]["error_type"] == "TableError"
+
+    # With its attempts used up the case is reported as given up without another export
+    results, counts, failing = run(INCIDENT_IDS)
+    assert [results[incident_id]["status"] for incident_id in INCIDENT_IDS] == ["skipped", "failed", "skipped"]
+    assert results[2026]["error"].startswith("Gave up after 2 attempts")
+    assert failing["attempts"] == 2
+    assert counts == {"ok": 2, "failed": 1}
+    assert sorted(path.name for path in output_path.iterdir()) == exported
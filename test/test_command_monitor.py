@@ -0,0 +1,49 @@
+import datetime
+
+import pytest
+
+
+def test_listener_records_the_queries_of_the_active_export(caplog):
+    monitoring = pytest.importorskip("pymongo.monitoring")
+    from exportExcel.command_monitor import command_listener, query_report
+    from exportExcel.metrics import ExportMetrics, MetricsAggregator, activate
+
+    listener = command_listener(slow_query_ms=50)
+    connection = ("localhost", 27017)
+
+    def run(request_id, command, reply, milliseconds):
+        listener.started(monitoring.CommandStartedEvent(command, "DRS", request_id, connection, request_id))
+        listener.succeeded(monitoring.CommandSucceededEvent(
+            datetime.timedelta(milliseconds=milliseconds), reply, next(iter(command)), request_id, connection,
+            request_id, database_name="DRS"
+        ))
+
+    metrics = ExportMetrics(2025)
+    with activate(metrics):
+        run(1, {"find": "Case_details", "filter": {"incident_id": 2025}},
+            {"cursor": {"id": 0, "firstBatch": [{"case_id": 1}]}, "ok": 1}, 2)
+        for request_id in range(2, 5):
+            run(request_id, {"find": "Commissions", "filter": {"money_transaction_id": request_id}},
+                {"cursor": {"id": 0, "firstBatch": [{"a": 1}, {"a": 2}]}, "ok": 1}, 20)
+        run(5, {"getMore": 42, "collection": "Case_payments"},
+            {"cursor": {"id": 0, "nextBatch": [{}] * 3}, "ok": 1}, 80)
+        run(6, {"ping": 1}, {"ok": 1}, 1)
+    # Outside an export nothing is recorded
+    run(7, {"find": "Export_leases", "filter": {}}, {"cursor": {"id": 0, "firstBatch": []}, "ok": 1}, 90)
+
+    queries = metrics.summary()["queries"]
+    assert sorted(queries) == ["Case_details.find", "Case_payments.getMore", "Commissions.find"]
+    assert queries["Commissions.find"]["count"] == 3
+    assert queries["Commissions.find"]["documents"] == 6
+    assert queries["Commissions.find"]["seconds"] == pytest.approx(0.06)
+    assert queries["Case_payments.getMore"]["slow"] == 1
+    assert queries["Case_details.find"]["reply_bytes"] > 0
+    assert [slow["command"] for slow in metrics.slow_queries] == ["Case_payments.getMore"]
+    assert "Slow query for Incident ID 2025: Case_payments.getMore" in caplog.text
+
+    aggregator = MetricsAggregator()
+    aggregator.add(metrics.summary())
+    aggregator.add(metrics.summary())
+    assert aggregator.summary()["queries"]["Commissions.find"]["count"] == 6
+    assert "Commissions.find: 6 commands, 3.0 per export" in query_report(aggregator.summary()["queries"])
+    assert 'drs_export_mongo_slow_commands_total{command="Case_payments.getMore"} 2' in aggregator.to_prometheus()
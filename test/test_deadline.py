@@ -0,0 +1,45 @@
+import pytest
+
+
+@pytest.fixture
+def db(mock_db):
+    mock_db["Case_details"].insert_many([
+        {"case_id": 1, "incident_id": 2025, "current_arrears_amount": 1500},
+        {"case_id": 2, "incident_id": 2026, "current_arrears_amount": 10},
+    ])
+    return mock_db
+
+
+def test_queries_get_the_remaining_budget():
+    from exportExcel.data_fetcher import query_time_limit
+    from exportExcel.deadline import deadline_scope, max_time_ms
+
+    assert max_time_ms() is None and query_time_limit() == {}
+    with deadline_scope(2):
+        assert 0 < query_time_limit()["maxTimeMS"] <= 2000
+        # An inner, longer deadline does not extend the outer one
+        with deadline_scope(60):
+            assert max_time_ms() <= 2000
+
+
+def test_passed_deadline_fails_the_export_fast(db, tmp_path, styles):
+    from exportExcel.errors import ExportTimeoutError
+    from exportExcel.excel_writer import export_all_tables
+    from exportExcel.metrics import ExportMetrics
+
+    metrics = ExportMetrics(2025)
+    with pytest.raises(ExportTimeoutError) as raised:
+        export_all_tables(db, 2025, str(tmp_path), "Case_details", styles, metrics, deadline_seconds=1e-6)
+
+    assert raised.value.incident_id == 2025
+    assert metrics.status == "failed" and metrics.info["timed_out_at"] == raised.value.stage
+    assert not list(tmp_path.iterdir())
+
+
+def test_batch_reports_timeouts_per_case(db, tmp_path, styles):
+    from exportExcel.batch import export_batch
+
+    results, _ = export_batch(db, [2025, 2026], str(tmp_path), "Case_details", styles,
+                              render_mode="memory", deadline_seconds=1e-6)
+
+    assert [result["error_type"] for result in results] == ["ExportTimeoutError"] * 2
@@ -0,0 +1,43 @@
+import pytest
+
+
+def test_dry_run_counts_the_cells_of_the_export(tmp_path, mock_db, styles):
+    from exportExcel.dry_run import estimate_run, load_calibration
+    from exportExcel.excel_writer import export_all_tables
+    from exportExcel.metrics import ExportMetrics, MetricsAggregator
+
+    mock_db["Case_details"].insert_many([
+        {"case_id": 1, "incident_id": 2025, "contact": [{"mob": "077"}], "remark": [{"remark": "called"}] * 3,
+         "drc": [{"drc_id": 7, "recovery_officers": [{"ro_id": 1}, {"ro_id": 2}]}]},
+        {"case_id": 2, "incident_id": 2026},
+    ])
+    mock_db["Case_settlements"].insert_one(
+        {"settlement_id": 11, "case_id": 1, "settlement_plan": [{"installment_seq": 1}] * 4}
+    )
+    mock_db["Case_payments"].insert_many([
+        {"payment_id": index, "case_id": 1, "bill_paid_amount": index, "money_transaction_id": 100 + index}
+        for index in range(6)
+    ])
+    mock_db["Commissions"].insert_many(
+        [{"money_transaction_id": 100 + index, "commissioned_amount": 1} for index in range(4)]
+    )
+
+    aggregator = MetricsAggregator()
+    for incident_id in (2025, 2026):
+        metrics = ExportMetrics(incident_id)
+        export_all_tables(mock_db, incident_id, str(tmp_path), "Case_details", styles, metrics, summary_sheet=False)
+        aggregator.add(metrics.summary())
+    aggregator.write_prometheus(str(tmp_path / "drs_export.prom"))
+
+    calibration = load_calibration(str(tmp_path / "drs_export.prom"))
+    report = estimate_run(mock_db, "Case_details", {}, calibration, {"summary_sheet": False})
+
+    assert report["cases"] == 2
+    assert report["cells"] == sum(aggregator.table_cells.values())
+    assert report["tables"]["Recovery Officer (RO)"]["rows"] == 2
+    assert report["tables"]["Settlement Plan"]["rows"] == 4
+    assert report["tables"]["Commissions"]["rows"] == 4
+    assert calibration.exports == 2
+    # Calibrated on these very exports, the estimate adds up to what they wrote and took
+    assert report["xlsx_bytes"] == pytest.approx(aggregator.output_bytes, rel=0.01)
+    assert report["seconds"] == pytest.approx(aggregator.duration.sum, rel=0.01)
@@ -0,0 +1,56 @@
+from datetime import datetime
+
+import pytest
+
+
+@pytest.fixture
+def db(mock_db):
+    mock_db["Case_details"].insert_one({
+        "case_id": 1, "incident_id": 2025, "current_arrears_amount": 1500,
+        # A malformed remark: openpyxl cannot write a sub-document into a cell
+        "remark": [{"remark": {"text": "first call"}, "remark_added_date": datetime(2025, 1, 1)}],
+    })
+    return mock_db
+
+
+def _export(db, tmp_path, styles, incident_id=2025, **options):
+    from exportExcel.excel_writer import export_all_tables
+    from exportExcel.metrics import ExportMetrics
+
+    metrics = ExportMetrics(incident_id)
+    path = export_all_tables(db, incident_id, str(tmp_path), "Case_details", styles, metrics,
+                             summary_sheet=False, **options)
+    return path, metrics
+
+
+@pytest.mark.parametrize("render_mode", ["memory", "streaming"])
+def test_degraded_table_is_written_as_text(db, tmp_path, styles, render_mode):
+    from openpyxl import load_workbook
+
+    path, metrics = _export(db, tmp_path, styles, render_mode=render_mode,
+                            table_policies={"create_remarks_table": "degrade"})
+
+    assert list(metrics.info["degraded_tables"]) == ["create_remarks_table"]
+    values = [cell.value for row in load_workbook(path)["Case Details"].iter_rows() for cell in row]
+    assert "{'text': 'first call'}" in values
+
+
+def test_failing_table_raises_table_error(db, tmp_path, styles):
+    from exportExcel.errors import TableError
+
+    with pytest.raises(TableError) as raised:
+        _export(db, tmp_path, styles, render_mode="memory")
+    assert raised.value.incident_id == 2025
+    assert "Remarks" in raised.value.table
+
+
+def test_batch_reports_each_failure_and_goes_on(db, tmp_path, styles):
+    from exportExcel.batch import export_batch
+
+    db["Case_details"].insert_one({"case_id": 2, "incident_id": 2026, "current_arrears_amount": 10})
+    results, _ = export_batch(db, [2025, 404, 2026], str(tmp_path), "Case_details", styles,
+                              render_mode="memory", summary_sheet=False)
+
+    assert [(result["status"], result["error_type"]) for result in results] == [
+        ("failed", "TableError"), ("failed", "CaseNotFoundError"), ("ok", None),
+    ]
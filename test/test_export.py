@@ -0,0 +1,26 @@
+import pytest
+
+
+def test_bad_filter_is_reported_and_exits(caplog):
+    from exportExcel.export import start_process
+
+    with pytest.raises(SystemExit) as raised:
+        start_process(["--filter", "{bad json"])
+
+    assert raised.value.code == 1
+    assert any(record.levelname == "ERROR" and "An unexpected error occurred" in record.getMessage()
+               for record in caplog.records)
+
+
+def test_missing_config_is_reported_and_exits(tmp_path, monkeypatch, caplog):
+    from exportExcel.export import start_process
+
+    # No Config/Config.ini below the working directory
+    monkeypatch.chdir(tmp_path)
+    with pytest.raises(SystemExit) as raised:
+        start_process(["--incident-id", "2025"])
+
+    assert raised.value.code == 1
+    messages = [record.getMessage() for record in caplog.records if record.levelname == "ERROR"]
+    assert "Configuration file is empty or not found." in messages
+    assert any("Config/Config.ini" in message for message in messages)
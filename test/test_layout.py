@@ -0,0 +1,30 @@
+
+def test_parallel_preparation_writes_the_same_sheet(tmp_path, mock_db, styles):
+    from openpyxl import load_workbook
+    from exportExcel.excel_writer import export_all_tables
+
+    mock_db["Case_details"].insert_one({
+        "case_id": 1, "incident_id": 2025, "account_no": "ACC1",
+        "contact": [{"mob": "077", "email": "a@b"}], "remark": [{"remark": "called"}, {"remark": "visited"}],
+    })
+    mock_db["Case_payments"].insert_many([
+        {"payment_id": index, "case_id": 1, "bill_paid_amount": index, "money_transaction_id": 100 + index}
+        for index in range(5)
+    ])
+    mock_db["Commissions"].insert_many(
+        [{"money_transaction_id": 100 + index, "commissioned_amount": 1} for index in range(5)]
+    )
+
+    sheets = []
+    for workers in (1, 4):
+        path = export_all_tables(mock_db, 2025, str(tmp_path / str(workers)), "Case_details", styles,
+                                 render_mode="memory", prepare_workers=workers)
+        worksheet = load_workbook(path)["Case Details"]
+        sheets.append((
+            [list(row) for row in worksheet.iter_rows(values_only=True)],
+            sorted(str(cells) for cells in worksheet.merged_cells.ranges),
+        ))
+
+    assert sheets[0] == sheets[1]
+    # Each table is written exactly once
+    assert [row[0] for row in sheets[0][0]].count("Payments") == 1
@@ -0,0 +1,141 @@
+import os
+import subprocess
+import sys
+
+NODE_SCRIPT = """
+import sys
+from pymongo import MongoClient
+from exportExcel.batch import export_distributed
+from exportExcel.excel_styles import load_styles
+
+uri, db_name, run_id, output_path = sys.argv[1:5]
+db = MongoClient(uri)[db_name]
+report, _ = export_distributed(
+    db, run_id, {"case_current_status": "Open"}, output_path, "Case_details",
+    load_styles("Config/styles.ini"), workers=2, shard_size=10, lease_ttl=2
+)
+print(report["exported"])
+"""
+
+
+def _insert_cases(db, count):
+    db["Case_details"].insert_many([
+        {"case_id": index, "incident_id": 9000 + index, "case_current_status": "Open"}
+        for index in range(count)
+    ])
+
+
+def _exported_incident_ids(output_path):
+    # Case_Details_<incident_id>_<date>_<time>.xlsx
+    return [int(name.split("_")[2]) for name in os.listdir(output_path)]
+
+
+def test_crashed_nodes_shard_is_reclaimed_without_duplicates(tmp_path, mock_db, styles):
+    from exportExcel.batch import export_distributed
+    from exportExcel.leases import LeaseCoordinator
+
+    _insert_cases(mock_db, 40)
+    query = {"case_current_status": "Open"}
+
+    # A node leases the first shard, exports three cases and dies without releasing it
+    crashed = LeaseCoordinator(mock_db, "month-end", "Case_details", query, shard_size=10, lease_ttl=0.5)
+    crashed.join()
+    lease = crashed.claim()
+    for case in list(crashed.iter_cases(lease))[:3]:
+        assert crashed.record_progress(lease, case, True)
+    crashed._heartbeat_stop.set()
+
+    report, _ = export_distributed(
+        mock_db, "month-end", query, str(tmp_path), "Case_details", styles, workers=2, shard_size=10, lease_ttl=0.5
+    )
+
+    exported = _exported_incident_ids(tmp_path)
+    assert sorted(exported) == list(range(9003, 9040))
+    assert report["shards"] == 4
+    assert report["exported"] == 40
+    assert report["failed"] == 0
+
+
+def _expire(coordinator, lease, **fields):
+    from datetime import datetime, timedelta, timezone
+
+    past = datetime.now(timezone.utc) - timedelta(seconds=60)
+    coordinator.leases.update_one({"_id": lease["_id"]}, {"$set": dict(fields, expires_at=past)})
+
+
+def test_heartbeat_renews_only_progressing_leases(mock_db):
+    from datetime import datetime, timedelta, timezone
+    from exportExcel.leases import LeaseCoordinator
+
+    _insert_cases(mock_db, 20)
+    node = LeaseCoordinator(mock_db, "month-end", "Case_details", {}, shard_size=10, lease_ttl=60)
+    node.join()
+    node._heartbeat_stop.set()
+    working, hung = node.claim(), node.claim()
+    assert node.record_progress(working, next(iter(node.iter_cases(working))), True)
+    # Both leases are about to expire; the hung shard has not moved since before the last TTL
+    now = datetime.now(timezone.utc)
+    node.leases.update_many({"kind": "lease"}, {"$set": {"expires_at": now + timedelta(seconds=1)}})
+    node.leases.update_one({"_id": hung["_id"]}, {"$set": {"progress_at": now - timedelta(seconds=120)}})
+
+    assert node.renew() == 1
+    expires_at = {lease["_id"]: lease["expires_at"] for lease in node.leases.find({"kind": "lease"})}
+    assert expires_at[working["_id"]] > (now + timedelta(seconds=50)).replace(tzinfo=None)
+    assert expires_at[hung["_id"]] < (now + timedelta(seconds=2)).replace(tzinfo=None)
+
+    # Once expired, the hung shard goes to a live node; its old owner is told to stop
+    _expire(node, hung)
+    other = LeaseCoordinator(mock_db, "month-end", "Case_details", {}, shard_size=10, lease_ttl=60)
+    reclaimed = other._reclaim_expired()
+    assert reclaimed["_id"] == hung["_id"] and reclaimed["attempts"] == 2
+    assert not node.record_progress(hung, next(iter(node.iter_cases(hung))), True)
+
+
+def test_shard_is_given_up_after_max_attempts(tmp_path, mock_db, styles):
+    from exportExcel.batch import export_distributed
+    from exportExcel.leases import LeaseCoordinator
+
+    _insert_cases(mock_db, 30)
+    query = {"case_current_status": "Open"}
+
+    # Every node that takes the first shard dies on its fourth case
+    first = LeaseCoordinator(mock_db, "month-end", "Case_details", query, shard_size=10, max_attempts=2)
+    first.join()
+    first._heartbeat_stop.set()
+    lease = first.claim()
+    exported = list(first.iter_cases(lease))[:3]
+    for case in exported:
+        first.record_progress(lease, case, True)
+    _expire(first, lease)
+    second = LeaseCoordinator(mock_db, "month-end", "Case_details", query, shard_size=10, max_attempts=2)
+    assert second._reclaim_expired()["attempts"] == 2
+    _expire(second, lease)
+
+    report, _ = export_distributed(
+        mock_db, "month-end", query, str(tmp_path), "Case_details", styles, workers=2, shard_size=10,
+        lease_ttl=0.5, max_attempts=2
+    )
+
+    assert sorted(_exported_incident_ids(tmp_path)) == list(range(9010, 9030))
+    assert report["shards"] == 3 and report["exported"] == 23
+    # The cases after the last recorded one are left for a later run
+    assert report["failed_shards"] == [{"index": 0, "last_id": exported[-1]["_id"], "upper": lease["upper"]}]
+    assert mock_db["Export_leases"].find_one({"_id": lease["_id"]})["status"] == "failed"
+
+
+def test_local_processes_split_one_run_against_mongod(tmp_path, repo_root, mongo_uri, live_db):
+    _insert_cases(live_db, 300)
+    nodes = [
+        subprocess.Popen(
+            [sys.executable, "-c", NODE_SCRIPT, mongo_uri, live_db.name, "month-end", str(tmp_path)],
+            cwd=repo_root, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+        )
+        for _ in range(3)
+    ]
+    outputs = [node.communicate(timeout=600) for node in nodes]
+    assert all(node.returncode == 0 for node in nodes), [stderr for _, stderr in outputs]
+
+    exported = _exported_incident_ids(tmp_path)
+    assert len(exported) == len(set(exported)) == 300
+    # Every node reports the run-wide total
+    assert {stdout.strip() for stdout, _ in outputs} == {"300"}
@@ -0,0 +1,92 @@
+import logging
+import subprocess
+import sys
+
+import pytest
+
+# Runs in a child process: fileConfig replaces the logging setup of the whole interpreter
+LOGGING_SCRIPT = """
+import logging, logging.handlers, sys, threading
+from exportExcel import export
+
+log_file_path = sys.argv[1]
+logger = export.setup_logger('Config/logger/loggers.ini', log_file_path)
+file_handler = next(handler for handler in export._queue_listener.handlers
+                    if isinstance(handler, logging.FileHandler))
+
+emitted_on = []
+emit = file_handler.emit
+def recording_emit(record):
+    emitted_on.append(threading.current_thread() is threading.main_thread())
+    emit(record)
+file_handler.emit = recording_emit
+
+# The console handler writes to stdout, so the results go to stderr
+print([type(handler).__name__ for handler in logger.handlers], file=sys.stderr)
+print(file_handler.baseFilename, file=sys.stderr)
+logger.info("first record")
+export.stop_queue_logging()
+print(emitted_on, file=sys.stderr)
+logger = export.setup_logger('Config/logger/loggers.ini', log_file_path)
+for number in range(200):
+    logger.info("record %d before exit", number)
+# No explicit stop: the atexit hook drains the queue
+"""
+
+
+def _run_logging_script(repo_root, log_file_path):
+    return subprocess.run(
+        [sys.executable, "-c", LOGGING_SCRIPT, str(log_file_path)],
+        cwd=repo_root, capture_output=True, text=True, check=True
+    )
+
+
+def test_records_reach_the_file_through_the_listener_thread(repo_root, tmp_path):
+    log_file_path = tmp_path / "logs" / "excel_data_writer.log"
+    handlers, base_filename, emitted_on = _run_logging_script(repo_root, log_file_path).stderr.splitlines()
+
+    assert handlers == "['QueueHandler']"
+    assert base_filename == str(log_file_path)
+    # Emitted once, and not on the thread that logged it
+    assert emitted_on == "[False]"
+    lines = log_file_path.read_text(encoding="utf-8").splitlines()
+    assert "first record" in lines[0]
+    # The listener is stopped at exit only after the queue is drained
+    assert len(lines) == 201 and "record 199 before exit" in lines[-1]
+
+
+def test_log_file_path_comes_from_the_config(repo_root, tmp_path, monkeypatch):
+    from exportExcel import export
+    from exportExcel.errors import ExportError
+
+    (tmp_path / "Config").mkdir()
+    (tmp_path / "Config" / "Config.ini").write_text(
+        "[DATABASE]\nMONGO_URI = mongodb://localhost:1\nDB_NAME = DRS\n"
+        f"[LOG_FILE_PATHS]\nWIN_LOG = {tmp_path}\\app.log\nLIN_LOG = {tmp_path}/app.log\n"
+    )
+    setups = []
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(export, "setup_logger", lambda *paths: setups.append(paths))
+    monkeypatch.setattr(export, "connect_db", lambda *args: (_ for _ in ()).throw(ExportError("no database")))
+
+    with pytest.raises(SystemExit):
+        export.start_process(["--incident-id", "2025"])
+
+    assert setups == [("Config/logger/loggers.ini", export.get_os_path(export.load_config("Config/Config.ini"),
+                                                                      "LOG_FILE_PATHS", "LOG"))]
+    assert setups[0][1] in (f"{tmp_path}\\app.log", f"{tmp_path}/app.log")
+
+
+def test_per_table_messages_are_debug(mock_db, tmp_path, styles, caplog):
+    from exportExcel.excel_writer import export_all_tables
+
+    mock_db["Case_details"].insert_one({"case_id": 1, "incident_id": 2025, "current_arrears_amount": 1500})
+    caplog.set_level(logging.DEBUG, logger="excel_data_writer")
+    export_all_tables(mock_db, 2025, str(tmp_path), "Case_details", styles, render_mode="memory")
+
+    table_records = [record for record in caplog.records
+                     if "table created successfully" in record.getMessage() or "Creating" in record.getMessage()]
+    assert table_records
+    assert {record.levelno for record in table_records} == {logging.DEBUG}
+    # The export itself is still reported at INFO
+    assert any(record.levelno == logging.INFO for record in caplog.records)
@@ -0,0 +1,108 @@
+import pytest
+
+ESTIMATE = {"rows": 100, "sheet_rows": 120, "cells": 1000, "bytes": 400_000, "tables": {}}
+
+
+def test_budget_picks_the_render_path():
+    from exportExcel.memory_guard import choose_render_mode
+
+    assert choose_render_mode(ESTIMATE, memory_budget_bytes=ESTIMATE["bytes"] - 1) == "streaming"
+    assert choose_render_mode(ESTIMATE, memory_budget_bytes=ESTIMATE["bytes"]) == "memory"
+    assert choose_render_mode(ESTIMATE, memory_budget_bytes=ESTIMATE["bytes"] + 1) == "memory"
+    assert choose_render_mode(ESTIMATE) == "memory"
+    # A forced path ignores the budget
+    assert choose_render_mode(ESTIMATE, 1, render_mode="memory") == "memory"
+    assert choose_render_mode(ESTIMATE, None, render_mode="streaming") == "streaming"
+    with pytest.raises(ValueError):
+        choose_render_mode(ESTIMATE, render_mode="fast")
+
+
+def test_forced_memory_mode_streams_a_layout_longer_than_a_sheet(caplog):
+    from exportExcel.memory_guard import choose_render_mode
+
+    assert choose_render_mode(ESTIMATE, render_mode="memory", max_sheet_rows=ESTIMATE["sheet_rows"]) == "memory"
+    assert choose_render_mode(ESTIMATE, render_mode="memory", max_sheet_rows=ESTIMATE["sheet_rows"] - 1) == "streaming"
+    assert "streaming instead of rendering in memory" in caplog.text
+
+
+@pytest.mark.parametrize("memory_budget_mb, render_mode", [(1e-6, "streaming"), (100, "memory")])
+def test_export_records_the_mode_and_peak_memory(mock_db, tmp_path, styles, memory_budget_mb, render_mode):
+    from exportExcel.excel_writer import export_all_tables
+    from exportExcel.metrics import ExportMetrics
+
+    mock_db["Case_details"].insert_one({"case_id": 1, "incident_id": 2025, "current_arrears_amount": 1500})
+    metrics = ExportMetrics(2025)
+    export_all_tables(mock_db, 2025, str(tmp_path), "Case_details", styles, metrics,
+                      memory_budget_mb=memory_budget_mb, trace_memory=True)
+
+    assert metrics.info["render_mode"] == render_mode
+    assert metrics.info["memory_budget_bytes"] == memory_budget_mb * 1024 * 1024
+    assert (metrics.info["estimated_bytes"] > metrics.info["memory_budget_bytes"]) == (render_mode == "streaming")
+    assert metrics.info["process_peak_rss_bytes"] > 0 and metrics.info["peak_traced_bytes"] > 0
+    assert isinstance(metrics.info["rss_growth_bytes"], int)
+    # The logged summary line carries both
+    assert metrics.summary()["render_mode"] == render_mode and metrics.summary()["process_peak_rss_bytes"]
+
+
+def test_forced_memory_export_spills_when_it_does_not_fit_a_sheet(mock_db, tmp_path, styles):
+    from exportExcel.excel_writer import export_all_tables
+    from exportExcel.metrics import ExportMetrics
+
+    mock_db["Case_details"].insert_one({"case_id": 1, "incident_id": 2025, "current_arrears_amount": 1500})
+    metrics = ExportMetrics(2025)
+    export_all_tables(mock_db, 2025, str(tmp_path), "Case_details", styles, metrics,
+                      render_mode="memory", max_sheet_rows=10, summary_sheet=False)
+
+    assert metrics.info["estimated_sheet_rows"] > 10
+    assert metrics.info["render_mode"] == "streaming" and metrics.info["sheets"] > 1
+
+
+def test_rss_is_measured_per_export():
+    from exportExcel.memory_guard import track_memory
+    from exportExcel.metrics import ExportMetrics
+
+    large, small = ExportMetrics(2025), ExportMetrics(2026)
+    with track_memory(large):
+        block = bytearray(64 * 1024 * 1024)
+        block[::4096] = b"x" * len(block[::4096])
+    del block
+    with track_memory(small):
+        pass
+
+    assert large.info["rss_growth_bytes"] >= 32 * 1024 * 1024
+    # The process peak stays at the largest export, the growth does not
+    assert small.info["rss_growth_bytes"] < 32 * 1024 * 1024
+    assert small.info["process_peak_rss_bytes"] >= large.info["rss_growth_bytes"]
+
+
+def test_overlapping_exports_record_no_traced_peak():
+    import threading
+    import tracemalloc
+    from exportExcel.memory_guard import track_memory
+    from exportExcel.metrics import ExportMetrics
+
+    first, second = ExportMetrics(2025), ExportMetrics(2026)
+    started, finish = threading.Event(), threading.Event()
+
+    def overlapping_export():
+        with track_memory(second, trace=True):
+            started.set()
+            finish.wait(5)
+
+    with track_memory(first, trace=True):
+        assert tracemalloc.is_tracing()
+        thread = threading.Thread(target=overlapping_export)
+        thread.start()
+        started.wait(5)
+        # The second export neither starts nor stops the running trace
+        finish.set()
+        thread.join()
+        assert tracemalloc.is_tracing()
+
+    assert not tracemalloc.is_tracing()
+    assert "peak_traced_bytes" not in first.info and "peak_traced_bytes" not in second.info
+
+    alone = ExportMetrics(2027)
+    with track_memory(alone, trace=True):
+        pass
+    assert alone.info["peak_traced_bytes"] >= 0
@@ -0,0 +1,115 @@
+import os
+
+import pytest
+
+
+def test_histogram_buckets_are_cumulative_and_quantiles_take_the_bucket_bound():
+    from exportExcel.metrics import Histogram
+
+    histogram = Histogram(buckets=(0.1, 1.0, 10.0))
+    for value in (0.05, 0.1, 0.5, 0.7, 5.0, 50.0):
+        histogram.observe(value)
+
+    assert histogram.counts == [2, 4, 5]
+    assert histogram.count == 6 and histogram.sum == pytest.approx(56.35)
+    assert histogram.quantile(0.3) == 0.1
+    assert histogram.quantile(0.5) == 1.0
+    assert histogram.quantile(0.8) == 10.0
+    # Past the last bucket
+    assert histogram.quantile(0.99) == float("inf")
+    assert Histogram().quantile(0.5) == 0.0
+    assert histogram.to_dict(include_buckets=True)["buckets"] == {0.1: 2, 1.0: 4, 10.0: 5}
+
+
+def test_aggregator_sums_two_exports():
+    from exportExcel.metrics import ExportMetrics, MetricsAggregator
+
+    summaries = []
+    for incident_id, (rows, seconds, status) in {2025: (10, 0.2, "ok"), 2026: (30, 3.0, "failed")}.items():
+        metrics = ExportMetrics(incident_id)
+        metrics.add_stage("render", seconds)
+        metrics.add_stage("render", seconds)
+        metrics.add_table("Payments", rows, rows * 4)
+        metrics.add_query("Case_payments.find", 0.01, rows, 100, slow={"command": "Case_payments.find"})
+        metrics.info["output_bytes"] = 1000
+        metrics.finish(status)
+        summaries.append(metrics.summary())
+
+    assert summaries[0]["stages"]["render"] == {"count": 2, "seconds": 0.4}
+    assert summaries[0]["rows"] == 10 and summaries[0]["cells"] == 40
+
+    aggregator = MetricsAggregator(buckets=(0.5, 5.0, 10.0))
+    for summary in summaries:
+        aggregator.add(summary)
+    summary = aggregator.summary()
+
+    assert summary["exports"] == {"ok": 1, "failed": 1}
+    assert summary["duration_seconds"]["count"] == 2
+    assert summary["stages"]["render"]["count"] == 2
+    assert summary["stages"]["render"]["p50"] == 0.5 and summary["stages"]["render"]["p99"] == 10.0
+    assert summary["table_rows"] == {"Payments": 40}
+    assert summary["table_cells"] == {"Payments": 160}
+    assert summary["output_bytes"] == 2000
+    assert summary["queries"]["Case_payments.find"] == {
+        "count": 2, "seconds": 0.02, "documents": 40, "reply_bytes": 200, "slow": 2, "exports": 2,
+    }
+
+
+def test_prometheus_exposition_format():
+    from exportExcel.metrics import MetricsAggregator
+
+    aggregator = MetricsAggregator(buckets=(1.0, 5.0))
+    aggregator.add({"status": "ok", "total_seconds": 2.0,
+                    "stages": {'query:"odd"\nstage\\': {"count": 1, "seconds": 0.5}},
+                    "tables": {"Payments": {"rows": 3, "cells": 12}}})
+    lines = aggregator.to_prometheus().splitlines()
+
+    for metric, kind in (("drs_exports_total", "counter"), ("drs_export_duration_seconds", "histogram"),
+                         ("drs_export_stage_duration_seconds", "histogram"),
+                         ("drs_export_last_run_timestamp_seconds", "gauge")):
+        assert any(line.startswith(f"# HELP {metric} ") for line in lines)
+        assert f"# TYPE {metric} {kind}" in lines
+    assert 'drs_exports_total{status="ok"} 1' in lines
+    assert [line for line in lines if line.startswith("drs_export_duration_seconds")] == [
+        'drs_export_duration_seconds_bucket{le="1.0"} 0',
+        'drs_export_duration_seconds_bucket{le="5.0"} 1',
+        'drs_export_duration_seconds_bucket{le="+Inf"} 1',
+        "drs_export_duration_seconds_sum 2.000000",
+        "drs_export_duration_seconds_count 1",
+    ]
+    # Quotes, newlines and backslashes in label values are escaped
+    label = 'stage="query:\\"odd\\"\\nstage\\\\"'
+    assert f'drs_export_stage_duration_seconds_bucket{{{label},le="1.0"}} 1' in lines
+    assert f"drs_export_stage_duration_seconds_count{{{label}}} 1" in lines
+    assert 'drs_export_table_rows_total{table="Payments"} 3' in lines
+
+
+def test_write_prometheus_replaces_the_file_atomically(tmp_path, monkeypatch):
+    from exportExcel.dry_run import read_prometheus
+    from exportExcel.metrics import MetricsAggregator
+
+    textfile_path = str(tmp_path / "metrics" / "drs_export.prom")
+    aggregator = MetricsAggregator()
+    aggregator.add({"status": "ok", "total_seconds": 1.0})
+    aggregator.write_prometheus(textfile_path)
+
+    # The new contents are complete in a temporary file before it is renamed over the old one
+    renames = []
+    replace = os.replace
+
+    def checked_replace(source, target):
+        with open(source, encoding="utf-8") as textfile:
+            renames.append((source, target, textfile.read().count("\n")))
+        with open(target, encoding="utf-8") as textfile:
+            assert 'drs_exports_total{status="ok"} 1' in textfile.read()
+        replace(source, target)
+
+    monkeypatch.setattr(os, "replace", checked_replace)
+    aggregator.add({"status": "ok", "total_seconds": 1.0})
+    aggregator.write_prometheus(textfile_path)
+
+    assert len(renames) == 1
+    source, target, lines = renames[0]
+    assert target == textfile_path and source != textfile_path and lines > 0
+    assert os.listdir(tmp_path / "metrics") == ["drs_export.prom"]
+    assert read_prometheus(textfile_path)[("drs_exports_total", (("status", "ok"),))] == 2
@@ -0,0 +1,45 @@
+import os
+from datetime import datetime
+
+
+def test_portfolio_groups_current_assignments_per_recovery_officer(tmp_path, mock_db, styles, pipeline_lookups):
+    from openpyxl import load_workbook
+    from exportExcel.portfolio import export_portfolio
+
+    mock_db["Case_details"].insert_many([
+        {
+            "case_id": case_id, "incident_id": 2020 + case_id, "case_current_status": "Open",
+            "current_arrears_amount": 1000.0 * case_id,
+            "drc": [
+                # A removed DRC assignment is not part of the portfolio
+                {"drc_id": 9, "drc_name": "Former", "removed_dtm": datetime(2024, 1, 1),
+                 "recovery_officers": [{"ro_id": 90}]},
+                {"drc_id": 1, "drc_name": "DRC One", "recovery_officers": [
+                    {"ro_id": 10, "removed_dtm": datetime(2025, 1, 1)},
+                    {"ro_id": 11 if case_id < 3 else 12, "assigned_dtm": datetime(2025, 2, case_id)},
+                ]},
+            ],
+        }
+        for case_id in (1, 2, 3)
+    ])
+    mock_db["Case_settlements"].insert_many([
+        # Inserted out of order: the latest settlement by created_on gives the status
+        {"case_id": 2, "settlement_status": "Active", "settlement_amount": 300.0, "created_on": datetime(2025, 3, 1)},
+        {"case_id": 2, "settlement_status": "Withdrawn", "settlement_amount": 200.0, "created_on": datetime(2025, 1, 1)},
+    ])
+    mock_db["Case_payments"].insert_many([
+        {"case_id": 2, "bill_paid_amount": 100.0}, {"case_id": 2, "bill_paid_amount": 50.0},
+    ])
+
+    path = export_portfolio(mock_db, "Case_details", "ro", str(tmp_path), styles)
+
+    workbook = load_workbook(path)
+    assert os.path.basename(path).startswith("Portfolio_RO_")
+    assert workbook.sheetnames == ["RO Portfolio"]
+    rows = list(workbook["RO Portfolio"].iter_rows(values_only=True))
+    assert rows[0][0] == "Portfolio by RO"
+    assert rows[2][:8] == (11, 1, "DRC One", 2, 3000, 1, 500, 150)
+    assert rows[3][:8] == (12, 1, "DRC One", 1, 3000, 0, 0, 0)
+    cases = [index for index, row in enumerate(rows) if row[0] == "Cases by RO"][0]
+    assert [row[3] for row in rows[cases + 2:]] == [1, 2, 3]
+    assert rows[cases + 3][9:12] == ("Active", 500, 150)
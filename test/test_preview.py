@@ -0,0 +1,34 @@
+import os
+from datetime import datetime
+
+
+def test_preview_keeps_the_latest_entries_and_marks_cut_tables(tmp_path, mock_db, styles):
+    from openpyxl import load_workbook
+    from exportExcel.excel_writer import export_all_tables
+
+    mock_db["Case_details"].insert_one({
+        "case_id": 1, "incident_id": 2025, "contact": [{"mob": "077"}],
+        "remark": [{"remark": f"remark {index}"} for index in range(8)],
+        "case_status": [{"case_status": "Open"}, {"case_status": "Closed"}],
+    })
+    # Inserted out of order: the preview goes by created_dtm
+    mock_db["Case_payments"].insert_many([
+        {"payment_id": day, "case_id": 1, "bill_paid_amount": day, "created_dtm": datetime(2025, 1, day)}
+        for day in (5, 1, 8, 3, 7, 2, 6, 4)
+    ])
+
+    path = export_all_tables(mock_db, 2025, str(tmp_path), "Case_details", styles, preview_rows=3)
+
+    workbook = load_workbook(path)
+    assert os.path.basename(path).startswith("Case_Preview_2025_")
+    assert workbook.sheetnames == ["Case Details"]
+    rows = [row for row in workbook["Case Details"].iter_rows(values_only=True)]
+    titles = [row[0] for row in rows if row[0] and row[1] is None and isinstance(row[0], str)]
+    assert "Remarks (latest 3 only)" in titles
+    assert "Payments (latest 3 only)" in titles
+    assert "Case Status" in titles
+
+    remarks = [index for index, row in enumerate(rows) if row[0] == "Remarks (latest 3 only)"][0]
+    assert [row[0] for row in rows[remarks + 2:remarks + 5]] == ["remark 5", "remark 6", "remark 7"]
+    payments = [index for index, row in enumerate(rows) if row[0] == "Payments (latest 3 only)"][0]
+    assert [row[0] for row in rows[payments + 2:payments + 6]] == [6, 7, 8, None]
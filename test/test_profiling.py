@@ -0,0 +1,34 @@
+import pytest
+
+
+def test_profiled_export_writes_pstats_and_collapsed_stacks(mock_db, tmp_path, styles):
+    from exportExcel.excel_writer import export_all_tables
+    from exportExcel.profiling import ExportProfiler
+
+    mock_db["Case_details"].insert_one({"case_id": 1, "incident_id": 2025, "current_arrears_amount": 1500})
+    profile_dir = tmp_path / "profiles"
+    export_all_tables(mock_db, 2025, str(tmp_path), "Case_details", styles,
+                      profiler=ExportProfiler(2025, str(profile_dir), top_n=5, trace_memory=False))
+
+    files = {path.name.rsplit("_", 1)[-1]: path for path in profile_dir.iterdir() if path.suffix != ".txt"}
+    assert set(files) >= {"fetch.pstats", "render.pstats", "save.pstats", "fetch.collapsed", "render.collapsed"}
+    report = next(profile_dir.glob("*.txt")).read_text(encoding="utf-8")
+    assert "===== fetch phase" in report and "===== render phase" in report
+
+    lines = files["render.collapsed"].read_text(encoding="utf-8").splitlines()
+    assert lines
+    for line in lines:
+        stack, microseconds = line.rsplit(" ", 1)
+        assert stack and int(microseconds) > 0
+    # Stacks are rebuilt from the caller edges, so the render functions sit below their callers
+    assert any(";" in line and "create_" in line for line in lines)
+
+
+@pytest.mark.parametrize("sample_rate, profiled", [(0, 0), (1, 50)])
+def test_sample_rate_bounds(tmp_path, sample_rate, profiled):
+    from exportExcel.profiling import ProfileSettings
+
+    settings = ProfileSettings(str(tmp_path), sample_rate=sample_rate)
+    profilers = [settings.profiler_for(incident_id) for incident_id in range(50)]
+
+    assert sum(profiler is not None for profiler in profilers) == profiled
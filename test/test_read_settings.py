@@ -0,0 +1,77 @@
+import configparser
+
+import pytest
+
+
+def _config(**sections):
+    config = configparser.ConfigParser()
+    config.read_dict(sections)
+    return config
+
+
+@pytest.fixture
+def db():
+    pymongo = pytest.importorskip("pymongo")
+    # Never connects: the settings only derive new handles
+    client = pymongo.MongoClient("mongodb://localhost:1", connect=False)
+    yield client["DRS"]
+    client.close()
+
+
+def test_secondary_preferred_with_staleness_and_tags(db):
+    from pymongo.read_preferences import SecondaryPreferred
+    from exportExcel.export import read_settings
+
+    export_db, snapshot_reads = read_settings(db, _config(READS={
+        "READ_PREFERENCE": "secondaryPreferred", "MAX_STALENESS_SECONDS": "120",
+        "TAG_SETS": '[{"use": "reporting"}, {}]', "CASE_READ_CONCERN": "majority",
+    }))
+
+    assert export_db.read_preference == SecondaryPreferred(tag_sets=[{"use": "reporting"}, {}], max_staleness=120)
+    assert export_db.read_concern.level == "majority"
+    assert snapshot_reads is False
+    # The coordination handle stays on the primary
+    assert db.read_preference.mode == 0 and db.read_concern.level is None
+
+
+def test_defaults_read_the_primary(db):
+    from pymongo.read_preferences import Primary
+    from exportExcel.export import read_settings
+
+    export_db, snapshot_reads = read_settings(db, _config())
+    assert export_db.read_preference == Primary() and export_db.read_concern.level is None
+    assert snapshot_reads is False
+
+    export_db, snapshot_reads = read_settings(db, _config(READS={"READ_PREFERENCE": "nearest",
+                                                                 "CASE_READ_CONCERN": "Snapshot"}))
+    assert export_db.read_preference.mongos_mode == "nearest" and export_db.read_preference.max_staleness == -1
+    assert snapshot_reads is True
+
+
+@pytest.mark.parametrize("reads", [{"READ_PREFERENCE": "secondaryOnly"}, {"CASE_READ_CONCERN": "linearizable"}])
+def test_invalid_read_settings_raise(db, reads):
+    from exportExcel.export import read_settings
+
+    with pytest.raises(ValueError):
+        read_settings(db, _config(READS=reads))
+
+
+def test_snapshot_settings(repo_root):
+    from exportExcel.config_loader import load_config
+    from exportExcel.export import snapshot_settings
+    from exportExcel.snapshots import DEFAULT_CHUNK_SIZE, DEFAULT_COLLECTIONS
+
+    settings = snapshot_settings(_config(
+        COLLECTIONS={"CASE_PAYMENTS_COLLECTION": "Payments_archive"},
+        SNAPSHOTS={"CHANGE_FIELDS": '{"payments": ["created_dtm"]}', "MAX_ROWS": "10", "OVERLAP_SECONDS": "1.5"},
+    ))
+    assert settings["collections"]["payments"] == "Payments_archive"
+    assert all(settings["collections"][role] == DEFAULT_COLLECTIONS[role]
+               for role in ("cases", "settlements", "commissions"))
+    assert settings["change_fields"] == {"payments": ["created_dtm"]}
+    assert settings["chunk_size"] == DEFAULT_CHUNK_SIZE
+    assert settings["max_rows"] == 10 and settings["overlap_seconds"] == 1.5
+
+    # The shipped configuration uses the built-in change fields
+    shipped = snapshot_settings(load_config(f"{repo_root}/Config/Config.ini"))
+    assert shipped["change_fields"] is None and shipped["snapshot_collection"] == "Export_snapshots"
@@ -0,0 +1,47 @@
+from datetime import datetime
+
+
+def _sheet(path):
+    from openpyxl import load_workbook
+
+    worksheet = load_workbook(path)["Case Details"]
+    cells = [
+        (cell.coordinate, cell.value, cell.font.b, cell.fill.fgColor.rgb, cell.border.left.style, cell.number_format)
+        for row in worksheet.iter_rows() for cell in row
+    ]
+    widths = {letter: dimension.width for letter, dimension in worksheet.column_dimensions.items()}
+    return cells, widths, sorted(str(merged) for merged in worksheet.merged_cells.ranges)
+
+
+def test_re_export_rebuilds_only_the_changed_table(tmp_path, mock_db, styles):
+    from exportExcel.excel_writer import export_all_tables
+    from exportExcel.metrics import ExportMetrics
+    from exportExcel.render_cache import RenderCache
+
+    mock_db["Case_details"].insert_one({
+        "case_id": 1, "incident_id": 2025, "current_arrears_amount": 1500, "contact": [{"mob": "077"}],
+        "remark": [{"remark": "first call", "remark_added_date": datetime(2025, 1, 1)}],
+    })
+    mock_db["Case_payments"].insert_many([
+        {"payment_id": index, "case_id": 1, "bill_paid_amount": 10.5 * index, "bill_paid_date": datetime(2025, 2, index)}
+        for index in range(1, 6)
+    ])
+    cache = RenderCache()
+
+    def export(render_cache):
+        metrics = ExportMetrics(2025)
+        path = export_all_tables(mock_db, 2025, str(tmp_path), "Case_details", styles, metrics,
+                                 render_mode="memory", summary_sheet=False, render_cache=render_cache)
+        return path, metrics.info.get("replayed_tables")
+
+    assert export(cache)[1] == []
+    mock_db["Case_details"].update_one({"case_id": 1}, {"$push": {"remark": {
+        "remark": "a much longer remark that widens the column", "remark_added_date": datetime(2025, 3, 1),
+    }}})
+
+    replayed_path, replayed = export(cache)
+    rebuilt_path, _ = export(None)
+
+    assert "create_remarks_table" not in replayed
+    assert {"create_case_details_table", "create_payments_table"} <= set(replayed)
+    assert _sheet(replayed_path) == _sheet(rebuilt_path)
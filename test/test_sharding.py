@@ -0,0 +1,99 @@
+import threading
+import time
+
+import pytest
+
+
+@pytest.fixture
+def cases(mock_db):
+    collection = mock_db["Case_details"]
+    collection.insert_many([
+        {"_id": case_id, "incident_id": 1000 + case_id, "case_current_status": "Open" if case_id % 3 else "Closed"}
+        for case_id in range(1, 31)
+    ])
+    return collection
+
+
+def _shard_ids(collection, query, shard):
+    from exportExcel.sharding import shard_filter
+
+    return [case["_id"] for case in collection.find(shard_filter(query, shard["lower"], shard["upper"])).sort("_id", 1)]
+
+
+@pytest.mark.parametrize("query", [{}, {"case_current_status": "Open"}])
+@pytest.mark.parametrize("shard_size", [1, 4, 7, 20, 100])
+def test_shards_cover_every_matching_case_once(cases, query, shard_size):
+    from exportExcel.sharding import iter_shards
+
+    matching = [case["_id"] for case in cases.find(query).sort("_id", 1)]
+    shards = list(iter_shards(cases, query, shard_size))
+    shard_ids = [_shard_ids(cases, query, shard) for shard in shards]
+
+    assert [shard["index"] for shard in shards] == list(range(len(shards)))
+    assert [case_id for ids in shard_ids for case_id in ids] == matching
+    assert all(len(ids) == shard_size for ids in shard_ids[:-1])
+    assert 0 < len(shard_ids[-1]) <= shard_size
+    # Each shard starts after the previous one ends
+    assert all(shard["lower"] == previous["upper"] for previous, shard in zip(shards, shards[1:]))
+    # Only a partial last shard is left open-ended
+    assert (shards[-1]["upper"] is None) == (len(matching) % shard_size != 0)
+
+
+def test_no_matching_case_gives_no_shard(cases):
+    from exportExcel.sharding import iter_shards
+
+    assert list(iter_shards(cases, {"case_current_status": "Withdrawn"}, 5)) == []
+    with pytest.raises(ValueError):
+        next(iter_shards(cases, {}, 0))
+
+
+def test_shard_incident_ids(cases):
+    from exportExcel.sharding import iter_shard_incident_ids, iter_shards
+
+    query = {"case_current_status": "Open"}
+    incident_ids = [incident_id for shard in iter_shards(cases, query, 3)
+                    for incident_id in iter_shard_incident_ids(cases, query, shard, batch_size=2)]
+    assert incident_ids == [1000 + case["_id"] for case in cases.find(query).sort("_id", 1)]
+
+
+def test_export_filtered_exports_every_matching_case(cases, tmp_path, styles):
+    from exportExcel.batch import export_filtered
+
+    report, aggregator = export_filtered(cases.database, {"case_current_status": "Open", "_id": {"$lte": 6}},
+                                         str(tmp_path), "Case_details", styles, workers=2, shard_size=2,
+                                         render_mode="memory", summary_sheet=False)
+
+    assert report == {"shards": 2, "exported": 4, "skipped": 0, "failed": 0, "failed_incident_ids": []}
+    assert aggregator.summary()["exports"] == {"ok": 4}
+    assert sorted(path.name.split("_")[2] for path in tmp_path.iterdir()) == ["1001", "1002", "1004", "1005"]
+
+
+def test_export_filtered_bounds_the_pending_shards(cases, tmp_path, monkeypatch):
+    from exportExcel import batch
+
+    workers = 2
+    lock = threading.Lock()
+    progress = {"cut": 0, "finished": 0, "most_pending": 0}
+    iter_shards = batch.iter_shards
+
+    def counted_shards(*args):
+        for shard in iter_shards(*args):
+            with lock:
+                progress["cut"] += 1
+                progress["most_pending"] = max(progress["most_pending"], progress["cut"] - progress["finished"])
+            yield shard
+
+    def slow_export_shard(db, query, shard, *args, **kwargs):
+        time.sleep(0.01)
+        with lock:
+            progress["finished"] += 1
+        return {"exported": len(_shard_ids(cases, query, shard)), "skipped": 0, "failed_incident_ids": []}
+
+    monkeypatch.setattr(batch, "iter_shards", counted_shards)
+    monkeypatch.setattr(batch, "export_shard", slow_export_shard)
+    report, _ = batch.export_filtered(cases.database, {}, str(tmp_path), "Case_details", None,
+                                      workers=workers, shard_size=1)
+
+    assert report["shards"] == progress["cut"] == 30 and report["exported"] == 30
+    # At most two shards per worker are submitted ahead of the finished ones, plus the one just cut
+    assert progress["most_pending"] <= 2 * workers + 1
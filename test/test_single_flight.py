@@ -0,0 +1,54 @@
+import os
+import threading
+import time
+
+
+def test_concurrent_duplicate_exports_share_one_run(tmp_path, monkeypatch, mock_db, styles):
+    from exportExcel import single_flight
+    from exportExcel.metrics import ExportMetrics
+
+    mock_db["Case_details"].insert_one({"case_id": 1, "incident_id": 2025})
+
+    # Hold the first export until every other caller is waiting on it
+    release = threading.Event()
+    runs = []
+    export_all_tables = single_flight.export_all_tables
+
+    def held_export(*args, **kwargs):
+        runs.append(args[1])
+        release.wait(5)
+        return export_all_tables(*args, **kwargs)
+
+    monkeypatch.setattr(single_flight, "export_all_tables", held_export)
+
+    callers = 4
+    results = [None] * callers
+    metrics = [ExportMetrics(2025) for _ in range(callers)]
+
+    def call(index):
+        results[index] = single_flight.export_once(
+            mock_db, 2025, str(tmp_path), "Case_details", styles, metrics[index], render_mode="memory"
+        )
+
+    threads = [threading.Thread(target=call, args=(index,)) for index in range(callers)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        calls = list(single_flight._exports._calls.values())
+        if calls and calls[0].waiters == callers - 1:
+            break
+        time.sleep(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert runs == [2025]
+    assert len(set(results)) == 1 and os.path.exists(results[0])
+    assert sorted(bool(metric.info.get("shared_export")) for metric in metrics) == [False, True, True, True]
+    assert single_flight._exports.in_flight() == 0
+
+    # A later request exports again, and a different option is a different export
+    single_flight.export_once(mock_db, 2025, str(tmp_path), "Case_details", styles, render_mode="memory")
+    single_flight.export_once(mock_db, 2025, str(tmp_path), "Case_details", styles, render_mode="streaming")
+    assert runs == [2025, 2025, 2025]
@@ -0,0 +1,132 @@
+from datetime import datetime, timedelta
+
+NOW = datetime(2025, 1, 1)
+
+
+def _seed(db):
+    db["Arrears_bands"].insert_one({"AB-5_10": "5000-10000"})
+    db["Case_details"].insert_one({
+        "case_id": 1, "incident_id": 2025, "account_no": "ACC1", "bss_arrears_amount": 12345.5,
+        "current_arrears_band": "AB-5_10", "created_dtm": NOW,
+        "remark": [{"remark": "called", "remark_added_by": "u1", "remark_added_date": NOW}],
+    })
+    db["Case_settlements"].insert_one({
+        "settlement_id": 11, "case_id": 1, "settlement_amount": 5000, "status_dtm": NOW,
+        "settlement_plan": [{"installment_seq": seq, "installment_settle_amount": 500, "plan_date": NOW}
+                            for seq in range(3)],
+    })
+    db["Case_payments"].insert_many([
+        {"payment_id": index, "case_id": 1, "bill_paid_amount": 100 + index, "money_transaction_id": 1000 + index,
+         "created_dtm": NOW} for index in range(4)
+    ])
+    db["Commissions"].insert_many([
+        {"money_transaction_id": 1000 + index, "paid_dtm": NOW, "commissioned_amount": 5} for index in range(4)
+    ])
+
+
+def _merged_snapshot(db, incident_id):
+    """
+    The document snapshot_pipeline() should merge for a case, built in Python from the source collections.
+    """
+    from exportExcel.snapshots import (COMMISSION_FIELDS, PAYMENT_FIELDS, SETTLEMENT_FIELDS,
+                                       SETTLEMENT_PLAN_FIELDS, SNAPSHOT_VERSION)
+    from exportExcel.summary_table import case_totals
+
+    row = lambda document, fields: [document.get(field) for field in fields]
+    case = db["Case_details"].find_one({"incident_id": incident_id})
+    settlements = list(db["Case_settlements"].find({"case_id": case["case_id"]}))
+    payments = list(db["Case_payments"].find({"case_id": case["case_id"]}))
+    commissions = list(db["Commissions"].find(
+        {"money_transaction_id": {"$in": [payment["money_transaction_id"] for payment in payments]}}
+    ))
+    return {
+        "_id": incident_id, "incident_id": incident_id, "case_id": case["case_id"], "version": SNAPSHOT_VERSION,
+        "refreshed_at": NOW, "case": case, "arrears_bands": db["Arrears_bands"].find_one({}, {"_id": 0}),
+        "rows": {
+            "settlements": [row(settlement, SETTLEMENT_FIELDS) for settlement in settlements],
+            "settlement_plans": [[settlement.get("settlement_id")] + row(plan, SETTLEMENT_PLAN_FIELDS)
+                                 for settlement in settlements for plan in settlement.get("settlement_plan") or []],
+            "payments": [row(payment, PAYMENT_FIELDS) for payment in payments],
+            "commissions": [row(commission, COMMISSION_FIELDS) for commission in commissions],
+        },
+        "totals": case_totals(db, case["case_id"]),
+    }
+
+
+def _cells(path):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path)
+    return [[list(row) for row in worksheet.iter_rows(values_only=True)] for worksheet in workbook.worksheets]
+
+
+def test_export_from_snapshot_matches_live_export_without_other_reads(tmp_path, mock_db, styles):
+    from exportExcel.excel_writer import export_all_tables
+    from exportExcel.metrics import ExportMetrics
+
+    _seed(mock_db)
+    live_path = export_all_tables(mock_db, 2025, str(tmp_path / "live"), "Case_details", styles)
+
+    mock_db["Export_snapshots"].insert_one(_merged_snapshot(mock_db, 2025))
+    for name in ("Case_details", "Case_settlements", "Case_payments", "Commissions", "Arrears_bands"):
+        mock_db.drop_collection(name)
+    metrics = ExportMetrics(2025)
+    snapshot_path = export_all_tables(mock_db, 2025, str(tmp_path / "snapshot"), "Case_details", styles, metrics,
+                                      snapshot_collection="Export_snapshots")
+
+    assert metrics.info["source"] == "snapshot"
+    assert [stage for stage in metrics.stages if stage.startswith("query:")] == ["query:Export_snapshots.find_one"]
+    assert _cells(snapshot_path) == _cells(live_path)
+
+
+def test_snapshot_pipeline_builds_the_expected_document(live_db):
+    from exportExcel.snapshots import DEFAULT_COLLECTIONS, snapshot_pipeline
+
+    _seed(live_db)
+    # mongomock lacks $reduce, array localField joins and $map rows, so this needs a real server
+    pipeline = snapshot_pipeline([1], "Export_snapshots", DEFAULT_COLLECTIONS, NOW)
+    assert list(pipeline[-1]) == ["$merge"]
+
+    assert list(live_db["Case_details"].aggregate(pipeline[:-1])) == [_merged_snapshot(live_db, 2025)]
+
+
+def test_refreshed_snapshot_exports_like_the_live_collections(tmp_path, live_db, styles):
+    from exportExcel.excel_writer import export_all_tables
+    from exportExcel.metrics import ExportMetrics
+    from exportExcel.snapshots import refresh_snapshots
+
+    _seed(live_db)
+    live_path = export_all_tables(live_db, 2025, str(tmp_path / "live"), "Case_details", styles)
+
+    assert refresh_snapshots(live_db, full=True)["refreshed"] == 1
+    metrics = ExportMetrics(2025)
+    snapshot_path = export_all_tables(live_db, 2025, str(tmp_path / "snapshot"), "Case_details", styles, metrics,
+                                      snapshot_collection="Export_snapshots")
+
+    assert metrics.info["source"] == "snapshot"
+    assert _cells(snapshot_path) == _cells(live_path)
+
+
+def test_touched_case_ids_follow_changes_in_every_collection(mock_db):
+    from exportExcel.snapshots import DEFAULT_CHANGE_FIELDS, DEFAULT_COLLECTIONS, touched_case_ids
+
+    old, new = NOW - timedelta(days=30), NOW + timedelta(days=1)
+    mock_db["Case_details"].insert_many([
+        {"case_id": 1, "created_dtm": old, "remark": [{"remark_added_date": old}, {"remark_added_date": new}]},
+        {"case_id": 2, "created_dtm": old},
+        {"case_id": 3, "created_dtm": old},
+        {"case_id": 4, "created_dtm": old},
+        {"case_id": 5, "created_dtm": old},
+    ])
+    mock_db["Case_settlements"].insert_one({"case_id": 2, "status_dtm": new})
+    mock_db["Case_payments"].insert_many([
+        {"case_id": 3, "money_transaction_id": 30, "created_dtm": new},
+        {"case_id": 4, "money_transaction_id": 40, "created_dtm": old},
+        {"case_id": 5, "money_transaction_id": 50, "created_dtm": old},
+    ])
+    mock_db["Commissions"].insert_many([
+        {"money_transaction_id": 40, "paid_dtm": new},
+        {"money_transaction_id": 50, "paid_dtm": old},
+    ])
+
+    assert touched_case_ids(mock_db, DEFAULT_COLLECTIONS, DEFAULT_CHANGE_FIELDS, NOW) == {1, 2, 3, 4}
@@ -0,0 +1,46 @@
+import subprocess
+import sys
+
+# Cumulative import time budget for `import main`, in microseconds.
+IMPORT_TIME_BUDGET_US = 150_000
+
+# Modules that must only be loaded once an export actually runs.
+DEFERRED_MODULES = ["openpyxl", "pymongo", "bson", "logging.config"]
+
+
+def _import_main(repo_root, *args):
+    return subprocess.run(
+        [sys.executable, *args, "-c", "import main"],
+        cwd=repo_root, capture_output=True, text=True, check=True
+    )
+
+
+def test_main_import_time_within_budget(repo_root):
+    # Warm the bytecode cache so the measurement reflects imports, not compilation
+    _import_main(repo_root)
+    result = _import_main(repo_root, "-X", "importtime")
+
+    cumulative = None
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative_us, module = (field.strip() for field in line[len("import time:"):].split("|"))
+        if module == "main":
+            cumulative = int(cumulative_us)
+
+    assert cumulative is not None, result.stderr
+    assert cumulative < IMPORT_TIME_BUDGET_US, f"import main took {cumulative} us"
+
+
+def test_main_import_has_no_heavy_imports_or_side_effects(repo_root):
+    code = (
+        "import logging, sys, main\n"
+        "print(','.join(m for m in %r if m in sys.modules))\n"
+        "print(len(logging.getLogger('excel_data_writer').handlers))\n"
+    ) % (DEFERRED_MODULES,)
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=repo_root, capture_output=True, text=True, check=True
+    )
+    loaded, handlers = result.stdout.splitlines()
+    assert loaded == ""
+    assert handlers == "0"
@@ -0,0 +1,51 @@
+import os
+
+REMARKS = 100
+
+
+def test_long_table_spills_over_sheets_and_files(mock_db, tmp_path, styles):
+    from openpyxl import load_workbook
+    from exportExcel.excel_writer import export_all_tables
+    from exportExcel.metrics import ExportMetrics
+    from exportExcel.settlements_remarks import REMARKS_HEADERS
+
+    mock_db["Case_details"].insert_one({
+        "case_id": 1, "incident_id": 2025, "current_arrears_amount": 1500,
+        "remark": [{"remark": f"remark {number}", "remark_added_by": "agent"} for number in range(REMARKS)],
+    })
+    metrics = ExportMetrics(2025)
+    path = export_all_tables(mock_db, 2025, str(tmp_path), "Case_details", styles, metrics, render_mode="streaming",
+                             max_sheet_rows=40, max_rows_per_file=70, summary_sheet=False)
+
+    files = metrics.info["output_files"]
+    base, extension = os.path.splitext(path)
+    assert files == [path] + [f"{base}_part{index}{extension}" for index in range(2, len(files) + 1)]
+    assert len(files) > 1 and all(os.path.exists(output_file) for output_file in files)
+
+    remarks = []
+    sheet_count = 0
+    for output_file in files:
+        workbook = load_workbook(output_file)
+        assert workbook.sheetnames == ["Case Details"] + [f"Case Details ({index})"
+                                                          for index in range(2, len(workbook.sheetnames) + 1)]
+        for worksheet in workbook.worksheets:
+            sheet_count += 1
+            rows = [list(row) for row in worksheet.iter_rows(values_only=True)]
+            assert len(rows) <= 40
+            heading, remarks_on_sheet = None, 0
+            for index, row in enumerate(rows):
+                if row[0] in ("Remarks", "Remarks (continued)"):
+                    heading = row[0]
+                    # The sub-headers follow every heading, continuations included
+                    assert rows[index + 1][:3] == REMARKS_HEADERS
+                elif isinstance(row[0], str) and row[0].startswith("remark "):
+                    if not remarks_on_sheet:
+                        # Continuing sheets repeat the heading above their first remark
+                        assert heading == ("Remarks (continued)" if remarks else "Remarks")
+                    remarks_on_sheet += 1
+                    remarks.append(row[0])
+        assert sum(worksheet.max_row for worksheet in workbook.worksheets) <= 70
+
+    assert sheet_count == metrics.info["sheets"] > 2
+    # No row is lost or written twice
+    assert remarks == [f"remark {number}" for number in range(REMARKS)]
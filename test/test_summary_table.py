@@ -0,0 +1,40 @@
+from datetime import datetime
+
+import pytest
+
+
+@pytest.mark.parametrize("render_mode", ["memory", "streaming"])
+def test_summary_sheet_holds_server_totals_as_numbers(tmp_path, render_mode, mock_db, styles):
+    from openpyxl import load_workbook
+    from exportExcel.excel_writer import export_all_tables
+
+    mock_db["Case_details"].insert_one({"case_id": 1, "incident_id": 2025})
+    mock_db["Case_settlements"].insert_many([
+        {"settlement_id": 11, "case_id": 1, "settlement_amount": 600},
+        {"settlement_id": 12, "case_id": 1, "settlement_amount": 400.5},
+    ])
+    mock_db["Case_payments"].insert_many([
+        {"payment_id": 1, "case_id": 1, "bill_paid_amount": 100, "bill_paid_date": datetime(2025, 1, 3),
+         "money_transaction_id": 501},
+        {"payment_id": 2, "case_id": 1, "bill_paid_amount": 50.25, "bill_paid_date": datetime(2025, 1, 20),
+         "money_transaction_id": 502},
+        {"payment_id": 3, "case_id": 1, "bill_paid_amount": 200, "bill_paid_date": datetime(2025, 3, 1),
+         "money_transaction_id": 503},
+        {"payment_id": 4, "case_id": 2, "bill_paid_amount": 999, "bill_paid_date": datetime(2025, 3, 1),
+         "money_transaction_id": 504},
+    ])
+    mock_db["Commissions"].insert_many([
+        {"money_transaction_id": 501, "commissioned_amount": 5},
+        {"money_transaction_id": 503, "commissioned_amount": 10},
+        {"money_transaction_id": 504, "commissioned_amount": 50},
+    ])
+
+    path = export_all_tables(mock_db, 2025, str(tmp_path), "Case_details", styles, render_mode=render_mode)
+
+    rows = list(load_workbook(path)["Summary"].iter_rows(values_only=True))
+    totals = {row[0]: row[1] for row in rows[1:8]}
+    assert totals == {
+        "Settlement Amount": 1000.5, "Paid Amount": 350.25, "Outstanding Balance": 650.25, "Settlements": 2,
+        "Payments": 3, "Commissioned Amount": 15, "Commissions": 2,
+    }
+    assert [row for row in rows[12:]] == [("2025-01", 2, 150.25), ("2025-03", 1, 200)]
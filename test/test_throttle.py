@@ -0,0 +1,127 @@
+import threading
+import time
+
+import pytest
+
+
+class FakeClock:
+    """
+    Stands in for the time module of exportExcel.throttle; sleeping advances the clock.
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    perf_counter = monotonic
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    from exportExcel import throttle
+
+    clock = FakeClock()
+    monkeypatch.setattr(throttle, "time", clock)
+    return clock
+
+
+def test_token_bucket_allows_a_burst_then_the_rate(clock):
+    from exportExcel.throttle import TokenBucket
+
+    bucket = TokenBucket(rate=10, burst=5)
+    assert [bucket.acquire() for _ in range(5)] == [0.0] * 5
+    assert clock.slept == []
+    # The sixth token is due a tenth of a second later, the seventh two tenths
+    assert bucket.acquire() == pytest.approx(0.1)
+    assert bucket.acquire() == pytest.approx(0.1)
+    assert clock.slept == [pytest.approx(0.1)] * 2
+
+    # Idle time refills the bucket, but never beyond the burst
+    clock.now += 60
+    assert [bucket.acquire() for _ in range(5)] == [0.0] * 5
+    assert bucket.acquire() == pytest.approx(0.1)
+    assert TokenBucket(rate=0.5).burst == 1
+
+
+def _complete_queries(throttle, seconds, count=None):
+    from exportExcel.throttle import ADJUST_EVERY
+
+    for _ in range(count or ADJUST_EVERY):
+        throttle._acquire_slot()
+        throttle._release_slot(seconds)
+
+
+def test_slow_queries_lower_the_limit_to_the_minimum():
+    from exportExcel.throttle import DECREASE_FACTOR, QueryThrottle
+
+    throttle = QueryThrottle(max_concurrency=8, min_concurrency=2, target_p95_ms=100)
+    assert throttle.limit == 8
+
+    _complete_queries(throttle, 0.2, count=49)
+    # Nothing changes before a full window of latencies
+    assert throttle.limit == 8
+    _complete_queries(throttle, 0.2, count=1)
+    assert throttle.limit == int(8 * DECREASE_FACTOR) == 6
+    limits = []
+    for _ in range(4):
+        _complete_queries(throttle, 0.2)
+        limits.append(throttle.limit)
+    assert limits == [4, 3, 2, 2]
+
+
+def test_fast_queries_raise_the_limit_by_one_up_to_the_maximum():
+    from exportExcel.throttle import QueryThrottle
+
+    throttle = QueryThrottle(max_concurrency=4, min_concurrency=1, target_p95_ms=100)
+    throttle.limit = 1
+
+    # Between 80% of the target and the target the limit holds
+    _complete_queries(throttle, 0.09)
+    assert throttle.limit == 1
+    limits = []
+    for _ in range(5):
+        _complete_queries(throttle, 0.05)
+        limits.append(throttle.limit)
+    assert limits == [2, 3, 4, 4, 4]
+
+
+def test_in_flight_queries_never_exceed_the_limit():
+    from exportExcel.throttle import QueryThrottle
+
+    throttle = QueryThrottle(max_concurrency=3)
+    lock = threading.Lock()
+    in_flight = {"now": 0, "most": 0}
+
+    def run_queries():
+        for _ in range(5):
+            with throttle.query():
+                with lock:
+                    in_flight["now"] += 1
+                    in_flight["most"] = max(in_flight["most"], in_flight["now"])
+                time.sleep(0.002)
+                with lock:
+                    in_flight["now"] -= 1
+
+    threads = [threading.Thread(target=run_queries) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert in_flight["most"] == 3
+    assert throttle._in_flight == 0
+
+
+def test_adaptive_mode_needs_max_concurrency():
+    from exportExcel.throttle import QueryThrottle
+
+    with pytest.raises(ValueError):
+        QueryThrottle(target_p95_ms=100)
+    assert QueryThrottle(queries_per_second=5).limit is None